@@ -0,0 +1,377 @@
+"""
+Kolumnowy snapshot tabeli listings dla analityk.
+
+Endpointy analityczne (/analysis, /analytics/price-statistics, /trend-by-year,
+/analytics/price-stats-by-category, /analytics/price-mileage) przy każdym
+żądaniu skanowały oferty w SQLite i budowały obiekty wierszy SQLAlchemy.
+Snapshot trzyma potrzebne kolumny w pamięci jako tablice NumPy:
+
+- kolumny liczbowe (cena, przebieg, pojemność, moc) jako float64 (NULL = NaN),
+- kolumny tekstowe, rocznik i data publikacji zakodowane słownikowo
+  (kody + posortowane wartości, -1 = brak wartości) - porządek kodów jest
+  porządkiem wartości, więc filtr zakresu to porównanie kodów,
+- wiersze posortowane po (marka, model, id) z indeksem offsetów: filtr marki
+  lub marki i modelu to wycinek tablic, a nie maska po całej tabeli,
+- permutacja wierszy wg ceny - mediany i kwantyle w grupach bez sortowania cen
+  w żądaniu.
+
+Snapshot jest oznaczony wersją danych (app.data_version). Po imporcie budowany
+jest nowy i podmieniany jednym przypisaniem referencji, a żądanie, które
+zobaczy nowszą wersję danych niż snapshot, przebudowuje go albo - gdy
+przebudowa już trwa w innym wątku - liczy wynik w SQL.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import stats
+from .data_version import get_data_version
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("ANALYTICS_SNAPSHOT", "1") != "0"
+
+# Nazwa w snapshocie -> kolumna tabeli listings
+DICT_COLUMNS = {
+    "brand": Listing.vehicle_brand,
+    "model": Listing.vehicle_model,
+    "generation": Listing.vehicle_generation,
+    "fuel_type": Listing.fuel_type,
+    "transmission": Listing.transmission,
+    "year": Listing.production_year,
+    "publication_date": Listing.offer_publication_date_iso,
+}
+NUMERIC_COLUMNS = {
+    "price": Listing.price_pln,
+    "mileage": Listing.mileage_km,
+    "displacement": Listing.displacement_cm3,
+    "power": Listing.power_hp,
+}
+
+# Wiersze wybrane filtrem: wycinek tablic albo tablica indeksów
+Rows = Union[slice, np.ndarray]
+EMPTY_ROWS = np.empty(0, dtype=np.intp)
+
+# Od jakiego udziału wybranych wierszy grupowanie korzysta z permutacji wg ceny
+# zamiast sortować ceny wybranych wierszy
+PRICE_ORDER_MIN_FRACTION = 0.125
+
+
+class DictColumn:
+    """Kolumna zakodowana słownikowo: kody wierszy (-1 = brak wartości) i posortowane wartości."""
+
+    __slots__ = ("codes", "values", "_lookup")
+
+    def __init__(self, codes: np.ndarray, values: np.ndarray):
+        self.codes = codes
+        self.values = values
+        self._lookup = {value: code for code, value in enumerate(values.tolist())}
+
+    @classmethod
+    def encode(cls, column: pd.Series) -> "DictColumn":
+        codes, uniques = pd.factorize(column, sort=True)
+        # int16: stabilne sortowanie po kodach to w NumPy sortowanie pozycyjne (radix)
+        dtype = np.int16 if len(uniques) < np.iinfo(np.int16).max else np.int32
+        return cls(codes.astype(dtype), np.asarray(uniques))
+
+    def code(self, value: Any) -> Optional[int]:
+        return self._lookup.get(value)
+
+    def code_range(self, low: Any = None, high: Any = None) -> Tuple[int, int]:
+        """Zakres kodów [od, do] wartości w przedziale [low, high] (granice opcjonalne)."""
+        first = int(np.searchsorted(self.values, low, side="left")) if low is not None else 0
+        last = int(np.searchsorted(self.values, high, side="right")) - 1 if high is not None else len(self.values) - 1
+        return first, last
+
+
+class ListingsSnapshot:
+    """Niezmienny, kolumnowy obraz tabeli listings w danej wersji danych."""
+
+    def __init__(
+        self,
+        data_version: str,
+        ids: np.ndarray,
+        numeric: Dict[str, np.ndarray],
+        dicts: Dict[str, DictColumn],
+        build_seconds: float = 0.0,
+    ):
+        self.data_version = data_version
+        self.ids = ids
+        self.numeric = numeric
+        self.dicts = dicts
+        self.n_rows = len(ids)
+        self.build_seconds = build_seconds
+        self.built_at = time.time()
+
+        brand_codes = dicts["brand"].codes
+        model_codes = dicts["model"].codes
+        self._brand_offsets: Dict[int, Tuple[int, int]] = {}
+        self._model_offsets: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if self.n_rows:
+            for start, end in _runs(brand_codes):
+                self._brand_offsets[int(brand_codes[start])] = (start, end)
+            combined = brand_codes.astype(np.int64) * (len(dicts["model"].values) + 1) + model_codes + 1
+            for start, end in _runs(combined):
+                self._model_offsets[(int(brand_codes[start]), int(model_codes[start]))] = (start, end)
+
+        price = numeric["price"]
+        self._price_order = np.argsort(price, kind="stable")[: int(np.count_nonzero(~np.isnan(price)))]
+
+    @classmethod
+    def load(cls, conn: Connection, data_version: str) -> "ListingsSnapshot":
+        """Wczytuje kolumny jednym zapytaniem i sortuje wiersze po (marka, model, id)."""
+        started = time.monotonic()
+        stmt = select(
+            Listing.id.label("id"),
+            *[column.label(name) for name, column in DICT_COLUMNS.items()],
+            *[column.label(name) for name, column in NUMERIC_COLUMNS.items()],
+        )
+        df = pd.read_sql(stmt, conn)
+        dicts = {name: DictColumn.encode(df[name]) for name in DICT_COLUMNS}
+        ids = df["id"].to_numpy(dtype=np.int64)
+        order = np.lexsort((ids, dicts["model"].codes, dicts["brand"].codes))
+        return cls(
+            data_version,
+            ids[order],
+            {name: df[name].to_numpy(dtype=np.float64)[order] for name in NUMERIC_COLUMNS},
+            {name: DictColumn(column.codes[order], column.values) for name, column in dicts.items()},
+            build_seconds=time.monotonic() - started,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.ids, self._price_order, *self.numeric.values(), *(d.codes for d in self.dicts.values())]
+        return int(sum(a.nbytes for a in arrays))
+
+    # ---- filtry ----
+
+    def select(
+        self,
+        brand: Optional[str] = None,
+        model: Optional[str] = None,
+        generation: Optional[str] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None,
+        mileage_max: Optional[float] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        displacement_min: Optional[float] = None,
+        displacement_max: Optional[float] = None,
+        fuel_type: Optional[str] = None,
+    ) -> Rows:
+        """
+        Wiersze spełniające filtry - te same warunki co crud.apply_filters,
+        z datami już w formacie YYYY-MM-DD. Marka i model zawężają wiersze
+        do wycinka z indeksu offsetów, pozostałe filtry to maski na tym wycinku.
+        """
+        start, end = 0, self.n_rows
+        if brand:
+            brand_code = self.dicts["brand"].code(brand)
+            if brand_code is None:
+                return EMPTY_ROWS
+            start, end = self._brand_offsets[brand_code]
+            if model:
+                model_code = self.dicts["model"].code(model)
+                offsets = self._model_offsets.get((brand_code, model_code))
+                if offsets is None:
+                    return EMPTY_ROWS
+                start, end = offsets
+        window = slice(start, end)
+
+        conditions = []
+        if model and not brand:
+            conditions.append(self._equals("model", model, window))
+        if generation:
+            conditions.append(self._equals("generation", generation, window))
+        if fuel_type:
+            conditions.append(self._equals("fuel_type", fuel_type, window))
+        if year_min is not None or year_max is not None:
+            conditions.append(self._between("year", year_min, year_max, window))
+        if date_from or date_to:
+            conditions.append(self._between("publication_date", date_from, date_to, window))
+        if mileage_max is not None:
+            conditions.append(self.numeric["mileage"][window] <= mileage_max)
+        if displacement_min is not None:
+            conditions.append(self.numeric["displacement"][window] >= displacement_min)
+        if displacement_max is not None:
+            conditions.append(self.numeric["displacement"][window] <= displacement_max)
+
+        if not conditions:
+            return window
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask &= condition
+        return np.flatnonzero(mask) + start
+
+    def _equals(self, name: str, value: Any, window: slice) -> np.ndarray:
+        column = self.dicts[name]
+        code = column.code(value)
+        if code is None:
+            return np.zeros(window.stop - window.start, dtype=bool)
+        return column.codes[window] == code
+
+    def _between(self, name: str, low: Any, high: Any, window: slice) -> np.ndarray:
+        column = self.dicts[name]
+        first, last = column.code_range(low, high)
+        codes = column.codes[window]
+        # Kody -1 (NULL) odpadają, bo first >= 0 - jak NULL w porównaniu SQL
+        return (codes >= first) & (codes <= last)
+
+    @staticmethod
+    def count(rows: Rows) -> int:
+        return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+    # ---- agregaty ----
+
+    def analysis(self, rows: Rows) -> Tuple[int, Optional[float], Optional[float], Optional[float]]:
+        """(liczba ofert, średnia, min, max ceny) - jak COUNT/AVG/MIN/MAX w SQL."""
+        prices = self.prices(rows)
+        if not len(prices):
+            return self.count(rows), None, None, None
+        return self.count(rows), float(prices.mean()), float(prices.min()), float(prices.max())
+
+    def prices(self, rows: Rows) -> np.ndarray:
+        prices = self.numeric["price"][rows]
+        return prices[~np.isnan(prices)]
+
+    def grouped_price_stats(
+        self,
+        rows: Rows,
+        group_by: Sequence[str],
+        quantiles: Sequence[float] = stats.DEFAULT_QUANTILES,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Statystyki cen w grupach każdej z kolumn group_by (format jak crud.get_grouped_price_stats)."""
+        n_selected = self.count(rows)
+        if n_selected >= PRICE_ORDER_MIN_FRACTION * self.n_rows and n_selected:
+            # Dużo wierszy: wybieramy je z permutacji wg ceny - ceny są już posortowane
+            selected = np.zeros(self.n_rows, dtype=bool)
+            selected[rows] = True
+            index = self._price_order[selected[self._price_order]]
+            presorted = True
+        else:
+            index = np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows
+            index = index[~np.isnan(self.numeric["price"][index])]
+            presorted = False
+        values = self.numeric["price"][index]
+        return {
+            g: stats.grouped_stats_from_codes(
+                self.dicts[g].codes[index], self.dicts[g].values, values, quantiles, presorted=presorted
+            )
+            for g in group_by
+        }
+
+    def price_mileage(self, rows: Rows, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Pierwsze limit par (cena, przebieg) z obiema wartościami (None = wszystkie)."""
+        price = self.numeric["price"][rows]
+        mileage = self.numeric["mileage"][rows]
+        index = np.flatnonzero(~(np.isnan(price) | np.isnan(mileage)))[:limit]
+        return price[index], mileage[index]
+
+
+def _runs(sorted_codes: np.ndarray):
+    """Przedziały [start, end) kolejnych równych wartości posortowanej tablicy."""
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(sorted_codes)]))
+    return zip(starts.tolist(), ends.tolist())
+
+
+class SnapshotStore:
+    """
+    Aktualne snapshoty (po jednym na bazę) z atomową podmianą.
+
+    Czytelnicy biorą referencję do snapshotu bez blokady - snapshot jest
+    niezmienny, a podmiana to jedno przypisanie. Budowę nowego snapshotu
+    danej bazy wykonuje naraz tylko jeden wątek.
+    """
+
+    def __init__(self, enabled: bool = SNAPSHOT_ENABLED):
+        self.enabled = enabled
+        self._snapshots: Dict[str, ListingsSnapshot] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _source(bind) -> str:
+        engine = bind if isinstance(bind, Engine) else bind.engine
+        return engine.url.render_as_string(hide_password=True)
+
+    def _build_lock(self, source: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(source, threading.Lock())
+
+    def current(self, db: Session) -> Optional[ListingsSnapshot]:
+        """
+        Snapshot zgodny z wersją danych widzianą przez sesję albo None (snapshot
+        wyłączony lub właśnie przebudowywany w innym wątku - wtedy liczymy w SQL).
+        """
+        if not self.enabled:
+            return None
+        conn = db.connection()
+        source = self._source(conn)
+        version = get_data_version(conn)
+        snapshot = self._snapshots.get(source)
+        if snapshot is not None and snapshot.data_version == version:
+            return snapshot
+        build_lock = self._build_lock(source)
+        if not build_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._swap(source, ListingsSnapshot.load(conn, version))
+        finally:
+            build_lock.release()
+
+    def refresh(self, engine: Engine) -> Optional[ListingsSnapshot]:
+        """Buduje snapshot bieżącej wersji danych i podmienia go (wywoływane po imporcie i przy starcie)."""
+        if not self.enabled:
+            return None
+        source = self._source(engine)
+        with self._build_lock(source):
+            with engine.connect() as conn:
+                # Wersja czytana przed danymi: snapshot może być co najwyżej nowszy niż
+                # jego wersja, a wtedy kolejne żądanie i tak go przebuduje
+                version = get_data_version(conn)
+                conn.commit()
+                snapshot = self._snapshots.get(source)
+                if snapshot is not None and snapshot.data_version == version:
+                    return snapshot
+                return self._swap(source, ListingsSnapshot.load(conn, version))
+
+    def _swap(self, source: str, snapshot: ListingsSnapshot) -> ListingsSnapshot:
+        self._snapshots[source] = snapshot
+        logger.info(
+            f"Analytics snapshot {snapshot.data_version}: {snapshot.n_rows} rows, "
+            f"{snapshot.nbytes / 1024 ** 2:.1f} MB, built in {snapshot.build_seconds:.2f}s"
+        )
+        return snapshot
+
+    def clear(self) -> None:
+        self._snapshots = {}
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "snapshots": [
+                {
+                    "data_version": s.data_version,
+                    "rows": s.n_rows,
+                    "memory_mb": round(s.nbytes / 1024 ** 2, 2),
+                    "build_seconds": round(s.build_seconds, 3),
+                    "built_at": s.built_at,
+                }
+                for s in list(self._snapshots.values())
+            ],
+        }
+
+
+snapshot_store = SnapshotStore()
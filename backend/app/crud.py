@@ -1,9 +1,16 @@
 from typing import Optional, List, Tuple
+from collections import OrderedDict
 from datetime import datetime
+import base64
+import json
+import threading
+
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, cast, Integer, text
+from sqlalchemy import and_, or_, select, func
 
-from . import models
+from . import columnar, downsampling, facets, models, stats
+from .data_version import get_data_version
 
 
 def parse_date(date_str: str) -> Optional[datetime]:
@@ -23,60 +30,36 @@ def get_publication_date_range(db: Session) -> Tuple[Optional[str], Optional[str
     """
     Zwraca (min_date, max_date) - najstarszą i najnowszą datę publikacji w bazie.
     Daty w formacie DD.MM.YYYY.
-    Musimy sparsować wszystkie daty, bo sortowanie stringów DD.MM.YYYY nie działa poprawnie.
+    MIN/MAX liczone po zaindeksowanej kolumnie ISO (YYYY-MM-DD), która sortuje się poprawnie.
     """
     from .models import Listing
-    
-    # Pobierz wszystkie unikalne daty
-    stmt = select(Listing.offer_publication_date).where(
-        Listing.offer_publication_date.isnot(None)
-    ).distinct()
-    
-    dates = db.execute(stmt).scalars().all()
-    
-    if not dates:
-        return (None, None)
-    
-    # Parsuj wszystkie daty i znajdź min/max
-    parsed_dates = []
-    for date_str in dates:
-        parsed = parse_date(date_str)
-        if parsed:
-            parsed_dates.append((parsed, date_str))
-    
-    if not parsed_dates:
-        return (None, None)
-    
-    # Znajdź min i max po sparsowanych datach
-    min_date_obj, min_date_str = min(parsed_dates, key=lambda x: x[0])
-    max_date_obj, max_date_str = max(parsed_dates, key=lambda x: x[0])
-    
-    return (min_date_str, max_date_str)
+
+    stmt = select(
+        func.min(Listing.offer_publication_date_iso),
+        func.max(Listing.offer_publication_date_iso),
+    )
+    min_iso, max_iso = db.execute(stmt).one()
+
+    def iso_to_display(iso_date: Optional[str]) -> Optional[str]:
+        if not iso_date:
+            return None
+        return datetime.strptime(iso_date, "%Y-%m-%d").strftime("%d.%m.%Y")
+
+    return (iso_to_display(min_iso), iso_to_display(max_iso))
 
 
 def get_brands(db: Session) -> List[str]:
     """
-    Zwraca listę unikalnych marek (vehicle_brand) z tabeli listings.
+    Zwraca listę unikalnych marek (vehicle_brand) z tabeli listings (katalog facet).
     """
-    stmt = (
-        select(models.Listing.vehicle_brand)
-        .distinct()
-        .order_by(models.Listing.vehicle_brand)
-    )
-    return db.execute(stmt).scalars().all()
+    return facets.facet_store.current(db).brands()
 
 
 def get_models_by_brand(db: Session, brand: str) -> List[str]:
     """
     Zwraca listę unikalnych modeli dla podanej marki.
     """
-    stmt = (
-        select(models.Listing.vehicle_model)
-        .where(models.Listing.vehicle_brand == brand)
-        .distinct()
-        .order_by(models.Listing.vehicle_model)
-    )
-    return db.execute(stmt).scalars().all()
+    return facets.facet_store.current(db).models(brand)
 
 
 def get_generations_by_brand_model(db: Session, brand: str, model: str) -> List[str]:
@@ -84,17 +67,7 @@ def get_generations_by_brand_model(db: Session, brand: str, model: str) -> List[
     Zwraca listę unikalnych generacji dla podanej marki i modelu.
     Zwraca tylko generacje, które mają vehicle_generation != NULL.
     """
-    stmt = (
-        select(models.Listing.vehicle_generation)
-        .where(
-            models.Listing.vehicle_brand == brand,
-            models.Listing.vehicle_model == model,
-            models.Listing.vehicle_generation.isnot(None)
-        )
-        .distinct()
-        .order_by(models.Listing.vehicle_generation)
-    )
-    return db.execute(stmt).scalars().all()
+    return facets.facet_store.current(db).model_values(brand, model, "generations")
 
 
 def get_fuel_types_by_brand_model(db: Session, brand: str, model: str) -> List[str]:
@@ -102,17 +75,7 @@ def get_fuel_types_by_brand_model(db: Session, brand: str, model: str) -> List[s
     Zwraca listę unikalnych typów paliwa (fuel_type) dla podanej marki i modelu.
     Zwraca posortowane wartości.
     """
-    stmt = (
-        select(models.Listing.fuel_type)
-        .where(
-            models.Listing.vehicle_brand == brand,
-            models.Listing.vehicle_model == model,
-            models.Listing.fuel_type.isnot(None)
-        )
-        .distinct()
-        .order_by(models.Listing.fuel_type)
-    )
-    return db.execute(stmt).scalars().all()
+    return facets.facet_store.current(db).model_values(brand, model, "fuel_types")
 
 
 def get_displacements_by_brand_model(db: Session, brand: str, model: str) -> List[float]:
@@ -120,47 +83,36 @@ def get_displacements_by_brand_model(db: Session, brand: str, model: str) -> Lis
     Zwraca listę unikalnych pojemności silnika (displacement_cm3) dla podanej marki i modelu.
     Zwraca posortowane wartości.
     """
-    stmt = (
-        select(models.Listing.displacement_cm3)
-        .where(
-            models.Listing.vehicle_brand == brand,
-            models.Listing.vehicle_model == model,
-            models.Listing.displacement_cm3.isnot(None)
-        )
-        .distinct()
-        .order_by(models.Listing.displacement_cm3)
-    )
-    return [float(d) for d in db.execute(stmt).scalars().all()]
+    return facets.facet_store.current(db).model_values(brand, model, "displacements")
 
 
 def get_fuel_types(db: Session) -> List[str]:
     """
     Zwraca listę unikalnych typów paliwa (fuel_type) z tabeli listings.
     """
-    from .models import Listing
-
-    stmt = (
-        select(Listing.fuel_type)
-        .where(Listing.fuel_type.isnot(None))
-        .distinct()
-        .order_by(Listing.fuel_type)
-    )
-    return db.execute(stmt).scalars().all()
+    return list(facets.facet_store.current(db).fuel_types)
 
 
 def get_transmissions(db: Session) -> List[str]:
     """
     Zwraca listę unikalnych typów skrzyni biegów (transmission) z tabeli listings.
     """
-    from .models import Listing
+    return list(facets.facet_store.current(db).transmissions)
 
-    stmt = (
-        select(Listing.transmission)
-        .where(Listing.transmission.isnot(None))
-        .distinct()
-        .order_by(Listing.transmission)
-    )
-    return db.execute(stmt).scalars().all()
+
+def get_facets(db: Session, brand: Optional[str] = None) -> dict:
+    """
+    Cały katalog wartości filtrów (marka -> model -> generacje, paliwa, skrzynie,
+    pojemności, liczba ofert) albo poddrzewo jednej marki.
+    """
+    catalog = facets.facet_store.current(db)
+    return {
+        "data_version": catalog.data_version,
+        "total": catalog.total,
+        "fuel_types": catalog.fuel_types,
+        "transmissions": catalog.transmissions,
+        "brands": catalog.tree(brand),
+    }
 
 
 def apply_filters(
@@ -200,49 +152,55 @@ def apply_filters(
     if fuel_type:
         stmt = stmt.where(models.Listing.fuel_type == fuel_type)
     
-    # Filtrowanie po dacie publikacji (format DD.MM.YYYY)
-    # Konwertujemy DD.MM.YYYY na YYYYMMDD dla porównania
-    if date_from:
-        date_from_parsed = parse_date(date_from)
-        if date_from_parsed:
-            # Konwertujemy datę do formatu YYYYMMDD dla porównania (jako integer)
-            date_from_int = int(date_from_parsed.strftime("%Y%m%d"))
-            # Konwertujemy kolumnę z DD.MM.YYYY do YYYYMMDD używając substr i || (SQLite)
-            # Format: DD.MM.YYYY -> SUBSTR(date, 7, 4) || SUBSTR(date, 4, 2) || SUBSTR(date, 1, 2)
-            # Używamy text() z operatorem || dla SQLite
-            date_converted = cast(
-                text(
-                    "SUBSTR(offer_publication_date, 7, 4) || "
-                    "SUBSTR(offer_publication_date, 4, 2) || "
-                    "SUBSTR(offer_publication_date, 1, 2)"
-                ),
-                Integer
-            )
-            stmt = stmt.where(
-                models.Listing.offer_publication_date.isnot(None),
-                date_converted >= date_from_int
-            )
-    
-    if date_to:
-        date_to_parsed = parse_date(date_to)
-        if date_to_parsed:
-            date_to_int = int(date_to_parsed.strftime("%Y%m%d"))
-            date_converted = cast(
-                text(
-                    "SUBSTR(offer_publication_date, 7, 4) || "
-                    "SUBSTR(offer_publication_date, 4, 2) || "
-                    "SUBSTR(offer_publication_date, 1, 2)"
-                ),
-                Integer
-            )
-            stmt = stmt.where(
-                models.Listing.offer_publication_date.isnot(None),
-                date_converted <= date_to_int
-            )
+    # Filtrowanie po dacie publikacji (format DD.MM.YYYY).
+    # Porównujemy z kolumną offer_publication_date_iso (YYYY-MM-DD) - sortowalną
+    # leksykograficznie i zaindeksowaną, więc filtr zakresu to index range scan.
+    date_from_iso = iso_date(date_from)
+    if date_from_iso:
+        stmt = stmt.where(models.Listing.offer_publication_date_iso >= date_from_iso)
+
+    date_to_iso = iso_date(date_to)
+    if date_to_iso:
+        stmt = stmt.where(models.Listing.offer_publication_date_iso <= date_to_iso)
     
     return stmt
 
 
+def iso_date(date_str: Optional[str]) -> Optional[str]:
+    """Data filtra DD.MM.YYYY jako YYYY-MM-DD (None, gdy pusta lub nieprawidłowa)."""
+    parsed = parse_date(date_str) if date_str else None
+    return parsed.strftime("%Y-%m-%d") if parsed else None
+
+
+def snapshot_rows(
+    db: Session,
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+):
+    """
+    Odpowiednik apply_filters dla kolumnowego snapshotu (app.columnar).
+    Zwraca (snapshot, wiersze) albo (None, None), gdy snapshot jest niedostępny
+    i wynik trzeba policzyć w SQL.
+    """
+    snapshot = columnar.snapshot_store.current(db)
+    if snapshot is None:
+        return None, None
+    rows = snapshot.select(
+        brand, model, generation, year_min, year_max, mileage_max,
+        iso_date(date_from), iso_date(date_to), displacement_min, displacement_max, fuel_type,
+    )
+    return snapshot, rows
+
+
 def get_analysis(
     db: Session,
     brand: Optional[str],
@@ -260,6 +218,10 @@ def get_analysis(
     """
     Zwraca: liczba ofert, średnia cena, min, max dla zadanych filtrów.
     """
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        return snapshot.analysis(rows)
+
     stmt = select(
         func.count(models.Listing.id),
         func.avg(models.Listing.price_pln),
@@ -287,14 +249,23 @@ def get_price_statistics(
     """
     Zwraca szczegółowe statystyki cen: średnia, mediana, odchylenie standardowe, kwartyle (Q1, Q3).
     """
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        return price_summary(snapshot.prices(rows))
+
     from .models import Listing
     
     stmt = select(Listing.price_pln)
     stmt = apply_filters(stmt, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
     
     prices = [float(p) for p in db.execute(stmt).scalars().all()]
-    
-    if not prices:
+    return price_summary(np.array(prices, dtype=float))
+
+
+def price_summary(prices_array: np.ndarray) -> dict:
+    """Statystyki cen (format get_price_statistics) dla tablicy cen."""
+    n = len(prices_array)
+    if not n:
         return {
             "n_offers": 0,
             "mean": None,
@@ -306,24 +277,14 @@ def get_price_statistics(
             "max": None,
         }
     
-    import numpy as np
-    
-    prices_array = np.array(prices)
-    sorted_prices = np.sort(prices_array)
-    n = len(sorted_prices)
-    
     # Średnia
     mean = float(np.mean(prices_array))
     
-    # Mediana
-    median = float(np.median(prices_array))
-    
     # Odchylenie standardowe
     std_dev = float(np.std(prices_array, ddof=1)) if n > 1 else 0.0
     
-    # Kwartyle
-    q1 = float(np.percentile(sorted_prices, 25))
-    q3 = float(np.percentile(sorted_prices, 75))
+    # Mediana i kwartyle - jedno częściowe sortowanie zamiast trzech
+    q1, median, q3 = (float(v) for v in np.percentile(prices_array, [25, 50, 75]))
     
     # Min i Max
     min_price = float(np.min(prices_array))
@@ -341,6 +302,110 @@ def get_price_statistics(
     }
 
 
+# Kolumny sortowania listy ofert (domyślnie rok); remis rozstrzyga id w tym samym kierunku
+LISTING_SORT_COLUMNS = {
+    "year": models.Listing.production_year,
+    "mileage": models.Listing.mileage_km,
+    "price": models.Listing.price_pln,
+    "brand": models.Listing.vehicle_brand,
+    "model": models.Listing.vehicle_model,
+}
+
+# Liczby ofert dla zestawów filtrów (paginacja) - klucz: (baza, wersja danych, filtry)
+LISTINGS_COUNT_CACHE_SIZE = 256
+_listings_count_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_listings_count_lock = threading.Lock()
+
+
+def count_listings(
+    db: Session,
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+) -> int:
+    """
+    Liczba ofert spełniających filtry. Wynik jest zapamiętywany dla wersji danych,
+    więc kolejne strony tej samej listy nie liczą COUNT(*) od nowa.
+    """
+    filters = (brand, model, generation, year_min, year_max, mileage_max, iso_date(date_from), iso_date(date_to), displacement_min, displacement_max, fuel_type)
+    conn = db.connection()
+    key = (str(conn.engine.url), get_data_version(conn), filters)
+    with _listings_count_lock:
+        if key in _listings_count_cache:
+            _listings_count_cache.move_to_end(key)
+            return _listings_count_cache[key]
+
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        total = snapshot.count(rows)
+    else:
+        stmt = select(func.count(models.Listing.id))
+        stmt = apply_filters(stmt, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+        total = db.execute(stmt).scalar_one()
+
+    with _listings_count_lock:
+        _listings_count_cache[key] = total
+        while len(_listings_count_cache) > LISTINGS_COUNT_CACHE_SIZE:
+            _listings_count_cache.popitem(last=False)
+    return total
+
+
+def _listing_order(sort_by: Optional[str], sort_dir: str):
+    """Kolumna sortowania i klauzule ORDER BY (kolumna, id)."""
+    column = LISTING_SORT_COLUMNS.get(sort_by, models.Listing.production_year)
+    if sort_dir == "asc":
+        return column, (column.asc(), models.Listing.id.asc())
+    return column, (column.desc(), models.Listing.id.desc())
+
+
+def encode_listings_cursor(sort_by: Optional[str], sort_dir: str, listing) -> str:
+    """Kursor (nieprzezroczysty token) wskazujący pozycję za podaną ofertą."""
+    column = LISTING_SORT_COLUMNS.get(sort_by, models.Listing.production_year)
+    payload = {"s": sort_by or "year", "d": sort_dir, "v": getattr(listing, column.key), "id": listing.id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_listings_cursor(token: str, sort_by: Optional[str], sort_dir: str) -> Tuple[object, int]:
+    """
+    Zwraca (wartość kolumny sortowania, id) z kursora.
+
+    Raises:
+        ValueError: token jest nieprawidłowy albo dotyczy innego sortowania
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        value, listing_id = payload["v"], int(payload["id"])
+        cursor_sort, cursor_dir = payload["s"], payload["d"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Nieprawidłowy kursor") from e
+    if cursor_sort != (sort_by or "year") or cursor_dir != sort_dir:
+        raise ValueError("Kursor dotyczy innego sortowania")
+    return value, listing_id
+
+
+def _after_cursor(column, value, listing_id: int, sort_dir: str):
+    """
+    Warunek "za kursorem" dla porządku (kolumna, id). NULL w SQLite jest
+    najmniejszy: przy DESC wartości NULL są na końcu, przy ASC na początku.
+    """
+    Listing = models.Listing
+    if sort_dir == "asc":
+        if value is None:
+            return or_(and_(column.is_(None), Listing.id > listing_id), column.isnot(None))
+        return or_(column > value, and_(column == value, Listing.id > listing_id))
+    if value is None:
+        return and_(column.is_(None), Listing.id < listing_id)
+    return or_(column < value, and_(column == value, Listing.id < listing_id), column.is_(None))
+
+
 def get_listings_filtered(
     db: Session,
     brand: Optional[str],
@@ -358,49 +423,102 @@ def get_listings_filtered(
     offset: int = 0,
     sort_by: Optional[str] = None,
     sort_dir: str = "desc",
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ):
     """
     Zwraca (total, items):
-    - total: łączna liczba rekordów spełniających warunki,
+    - total: łączna liczba rekordów spełniających warunki (None, gdy include_total=False),
     - items: lista obiektów Listing (z paginacją i sortowaniem po CAŁEJ bazie).
+
+    Kolejność to (kolumna sortowania, id), więc strony są stabilne także przy
+    sortowaniu po marce/modelu. Z kursorem (encode_listings_cursor ostatniej
+    oferty poprzedniej strony) strona zaczyna się za tą ofertą - warunek na
+    indeksie zamiast pomijania offset wierszy; offset jest wtedy ignorowany.
     """
     from .models import Listing  # lokalny import
 
     # liczymy łączną liczbę
-    stmt_count = select(func.count(Listing.id))
-    stmt_count = apply_filters(stmt_count, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-    total = db.execute(stmt_count).scalar_one()
+    total = None
+    if include_total:
+        total = count_listings(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
 
     # bazowe zapytanie
     stmt_items = select(Listing)
     stmt_items = apply_filters(stmt_items, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
 
-    # wybór kolumny sortowania
-    order_column = Listing.production_year  # domyślnie rok
-    if sort_by == "mileage":
-        order_column = Listing.mileage_km
-    elif sort_by == "price":
-        order_column = Listing.price_pln
-    elif sort_by == "year":
-        order_column = Listing.production_year
-    elif sort_by == "brand":
-        order_column = Listing.vehicle_brand
-    elif sort_by == "model":
-        order_column = Listing.vehicle_model
-
-    # kierunek sortowania
-    if sort_dir == "asc":
-        stmt_items = stmt_items.order_by(order_column.asc())
-    else:
-        stmt_items = stmt_items.order_by(order_column.desc())
+    # sortowanie: kolumna + id jako rozstrzygnięcie remisów
+    order_column, order_by = _listing_order(sort_by, sort_dir)
+    stmt_items = stmt_items.order_by(*order_by)
 
     # paginacja
-    stmt_items = stmt_items.limit(limit).offset(offset)
+    if cursor:
+        value, listing_id = decode_listings_cursor(cursor, sort_by, sort_dir)
+        stmt_items = stmt_items.where(_after_cursor(order_column, value, listing_id, sort_dir)).limit(limit)
+    else:
+        stmt_items = stmt_items.limit(limit).offset(offset)
     items = db.execute(stmt_items).scalars().all()
 
     return total, items
 
 
+# Kolumny, po których można grupować statystyki cen
+GROUPABLE_COLUMNS = {
+    "year": models.Listing.production_year,
+    "fuel_type": models.Listing.fuel_type,
+    "transmission": models.Listing.transmission,
+    "generation": models.Listing.vehicle_generation,
+    "model": models.Listing.vehicle_model,
+    "brand": models.Listing.vehicle_brand,
+}
+
+
+def get_grouped_price_stats(
+    db: Session,
+    group_by: List[str],
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+    quantiles: Tuple[float, ...] = stats.DEFAULT_QUANTILES,
+) -> dict:
+    """
+    Zwraca statystyki cen (liczba, średnia, mediana, kwantyle) dla każdej grupy
+    każdej z kolumn group_by. Wszystkie grupowania liczone są z JEDNEGO zapytania
+    (jeden skan przefiltrowanych ofert), zamiast osobnego zapytania na grupę.
+
+    Zwraca: {nazwa_kolumny: [ {key, n, mean, median, min, max, quantiles}, ... ]}
+    """
+    unknown = [g for g in group_by if g not in GROUPABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Nieobsługiwane kolumny grupowania: {unknown}")
+
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        return snapshot.grouped_price_stats(rows, group_by, quantiles)
+
+    from .models import Listing
+
+    stmt = select(*[GROUPABLE_COLUMNS[g].label(g) for g in group_by], Listing.price_pln)
+    stmt = apply_filters(stmt, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    stmt = stmt.where(Listing.price_pln.isnot(None))
+
+    rows = db.execute(stmt).all()
+    prices = [row.price_pln for row in rows]
+
+    return {
+        g: stats.grouped_stats([getattr(row, g) for row in rows], prices, quantiles)
+        for g in group_by
+    }
+
+
 def get_trend_by_year(
     db: Session,
     brand: Optional[str],
@@ -418,49 +536,25 @@ def get_trend_by_year(
     """
     Zwraca listę punktów: rok, liczba ofert, średnia cena, mediana ceny.
     """
-    from .models import Listing  # lokalny import, żeby uniknąć pętli
-
-    stmt = select(
-        Listing.production_year.label("year"),
-        func.count(Listing.id).label("n_offers"),
-        func.avg(Listing.price_pln).label("avg_price"),
+    grouped = get_grouped_price_stats(
+        db, ["year"], brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type,
+        quantiles=(),
     )
 
-    stmt = apply_filters(stmt, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-    stmt = stmt.group_by(Listing.production_year).order_by(Listing.production_year)
+    return trend_points(grouped["year"])
 
-    rows = db.execute(stmt).all()
 
-    # Obliczanie mediany dla każdego roku
-    def get_median_for_year(year: int) -> Optional[float]:
-        stmt_median = select(Listing.price_pln)
-        stmt_median = apply_filters(stmt_median, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-        stmt_median = stmt_median.where(
-            Listing.production_year == year,
-            Listing.price_pln.isnot(None)
-        )
-        prices = [float(p) for p in db.execute(stmt_median).scalars().all()]
-        if not prices:
-            return None
-        prices.sort()
-        n = len(prices)
-        if n % 2 == 0:
-            return (prices[n // 2 - 1] + prices[n // 2]) / 2
-        else:
-            return prices[n // 2]
-
-    result = []
-    for row in rows:
-        if row.year is not None and row.avg_price is not None:
-            median = get_median_for_year(int(row.year))
-            result.append({
-                "year": int(row.year),
-                "n_offers": int(row.n_offers),
-                "avg_price": float(row.avg_price),
-                "median_price": median,
-            })
-    
-    return result
+def trend_points(groups: List[dict]) -> List[dict]:
+    """Grupy wg roku (stats.grouped_stats) jako punkty trendu."""
+    return [
+        {
+            "year": int(group["key"]),
+            "n_offers": group["n"],
+            "avg_price": group["mean"],
+            "median_price": group["median"],
+        }
+        for group in groups
+    ]
 
 
 def get_price_mileage_data(
@@ -481,6 +575,14 @@ def get_price_mileage_data(
     """
     Zwraca listę punktów (cena, przebieg) dla wykresu scatter.
     """
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        prices, mileages = snapshot.price_mileage(rows, limit)
+        return [
+            {"price_pln": price, "mileage_km": mileage}
+            for price, mileage in zip(prices.tolist(), mileages.tolist())
+        ]
+
     from .models import Listing
 
     stmt = select(
@@ -506,7 +608,7 @@ def get_price_mileage_data(
     ]
 
 
-def get_price_stats_by_category(
+def get_price_mileage_arrays(
     db: Session,
     brand: Optional[str],
     model: Optional[str],
@@ -519,94 +621,206 @@ def get_price_stats_by_category(
     displacement_min: Optional[float] = None,
     displacement_max: Optional[float] = None,
     fuel_type: Optional[str] = None,
-):
+    transmission: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Zwraca statystyki cen wg paliwa i skrzyni biegów.
+    Zwraca WSZYSTKIE pary (ceny, przebiegi) spełniające filtry jako tablice NumPy
+    - wejście dla redukcji punktów (app.downsampling).
     """
+    if transmission is None:
+        snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+        if snapshot is not None:
+            return snapshot.price_mileage(rows)
+
     from .models import Listing
 
-    # Statystyki wg paliwa
-    stmt_fuel = select(
-        Listing.fuel_type.label("category"),
-        func.avg(Listing.price_pln).label("avg_price"),
-        func.count(Listing.id).label("n_offers"),
-    )
-    stmt_fuel = apply_filters(stmt_fuel, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-    stmt_fuel = stmt_fuel.where(
-        Listing.fuel_type.isnot(None),
+    stmt = select(Listing.price_pln, Listing.mileage_km)
+    stmt = apply_filters(stmt, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if transmission:
+        stmt = stmt.where(Listing.transmission == transmission)
+    stmt = stmt.where(
         Listing.price_pln.isnot(None),
+        Listing.mileage_km.isnot(None),
     )
-    stmt_fuel = stmt_fuel.group_by(Listing.fuel_type).order_by(Listing.fuel_type)
+    rows = db.execute(stmt).all()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    prices, mileages = zip(*rows)
+    return np.array(prices, dtype=float), np.array(mileages, dtype=float)
 
-    rows_fuel = db.execute(stmt_fuel).all()
 
-    # Statystyki wg skrzyni biegów
-    stmt_trans = select(
-        Listing.transmission.label("category"),
-        func.avg(Listing.price_pln).label("avg_price"),
-        func.count(Listing.id).label("n_offers"),
+def get_price_mileage_downsampled(
+    db: Session,
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+    mode: str = "none",
+    target: int = 5000,
+    bins: int = 50,
+    limit: Optional[int] = None,
+    columnar: bool = False,
+) -> dict:
+    """
+    Punkty (cena, przebieg) zredukowane wybranym trybem (downsampling.DOWNSAMPLING_MODES)
+    razem z prawdziwą liczbą punktów spełniających filtry (total).
+    columnar=True zwraca punkty jako kolumny {"price_pln": [...], "mileage_km": [...]}.
+    """
+    prices, mileages = get_price_mileage_arrays(
+        db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type
     )
-    stmt_trans = apply_filters(stmt_trans, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-    stmt_trans = stmt_trans.where(
-        Listing.transmission.isnot(None),
-        Listing.price_pln.isnot(None),
+    return downsampling.downsample_price_mileage(prices, mileages, mode, target, bins, limit, columnar)
+
+
+def get_price_stats_by_category(
+    db: Session,
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+):
+    """
+    Zwraca statystyki cen wg paliwa i skrzyni biegów.
+    """
+    grouped = get_grouped_price_stats(
+        db, ["fuel_type", "transmission"], brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type,
+        quantiles=(),
     )
-    stmt_trans = stmt_trans.group_by(Listing.transmission).order_by(Listing.transmission)
 
-    rows_trans = db.execute(stmt_trans).all()
+    return category_items(grouped["fuel_type"]), category_items(grouped["transmission"])
 
-    # Obliczanie mediany dla każdej kategorii (wymaga osobnych zapytań)
-    def get_median_for_category(category: str, is_fuel: bool = True):
-        stmt_median = select(Listing.price_pln)
-        stmt_median = apply_filters(stmt_median, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
-        stmt_median = stmt_median.where(Listing.price_pln.isnot(None))
-        if is_fuel:
-            stmt_median = stmt_median.where(Listing.fuel_type == category)
-        else:
-            stmt_median = stmt_median.where(Listing.transmission == category)
-        prices = [float(p) for p in db.execute(stmt_median).scalars().all()]
-        if not prices:
-            return None
-        prices.sort()
-        n = len(prices)
-        if n % 2 == 0:
-            return (prices[n // 2 - 1] + prices[n // 2]) / 2
+
+def category_items(groups: List[dict]) -> List[dict]:
+    """Grupy wg kategorii (paliwo, skrzynia) jako pozycje statystyk (bez pustych kategorii)."""
+    return [
+        {
+            "category": str(group["key"]),
+            "avg_price": group["mean"],
+            "median_price": group["median"],
+            "n_offers": group["n"],
+        }
+        for group in groups
+        if group["key"]
+    ]
+
+
+# Panele zakładki analiz liczone przez get_dashboard
+DASHBOARD_FIELDS = ("analysis", "price_statistics", "trend", "by_category", "price_mileage")
+
+
+def get_dashboard(
+    db: Session,
+    fields: List[str],
+    brand: Optional[str],
+    model: Optional[str],
+    generation: Optional[str],
+    year_min: Optional[int],
+    year_max: Optional[int],
+    mileage_max: Optional[float],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+    price_mileage_limit: int = 5000,
+    price_mileage_mode: str = "none",
+    price_mileage_target: int = 5000,
+    price_mileage_bins: int = 50,
+    price_mileage_columnar: bool = False,
+) -> dict:
+    """
+    Zwraca wybrane panele analiz (fields z DASHBOARD_FIELDS) policzone z JEDNEGO
+    wyboru przefiltrowanych ofert - zamiast osobnego skanu na każdy endpoint.
+
+    Zwraca: {panel: wynik} w formatach get_analysis, get_price_statistics,
+    get_trend_by_year, get_price_stats_by_category i get_price_mileage_downsampled
+    (price_mileage_columnar jak columnar w get_price_mileage_downsampled).
+    """
+    unknown = [f for f in fields if f not in DASHBOARD_FIELDS]
+    if unknown:
+        raise ValueError(f"Nieobsługiwane panele: {unknown}")
+
+    group_by = []
+    if "trend" in fields:
+        group_by.append("year")
+    if "by_category" in fields:
+        group_by += ["fuel_type", "transmission"]
+
+    snapshot, rows = snapshot_rows(db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+    if snapshot is not None:
+        n_offers = snapshot.count(rows)
+        prices = snapshot.prices(rows)
+        grouped = snapshot.grouped_price_stats(rows, group_by, quantiles=()) if group_by else {}
+        if "price_mileage" in fields:
+            point_prices, point_mileages = snapshot.price_mileage(rows)
+    else:
+        from .models import Listing
+
+        # Jedno zapytanie o kolumny potrzebne wybranym panelom
+        columns = [Listing.price_pln.label("price")]
+        columns += [GROUPABLE_COLUMNS[g].label(g) for g in group_by]
+        if "price_mileage" in fields:
+            columns.append(Listing.mileage_km.label("mileage"))
+        stmt = apply_filters(select(*columns), brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type)
+        result = db.execute(stmt)
+        names = list(result.keys())
+        rows = result.all()
+        values = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+
+        n_offers = len(rows)
+        all_prices = np.array(values["price"], dtype=float)
+        prices = all_prices[~np.isnan(all_prices)]
+        grouped = {g: stats.grouped_stats(values[g], all_prices, ()) for g in group_by}
+        if "price_mileage" in fields:
+            mileages = np.array(values["mileage"], dtype=float)
+            points = np.flatnonzero(~(np.isnan(all_prices) | np.isnan(mileages)))
+            point_prices, point_mileages = all_prices[points], mileages[points]
+
+    panels = {}
+    if "analysis" in fields:
+        if len(prices):
+            panels["analysis"] = (n_offers, float(prices.mean()), float(prices.min()), float(prices.max()))
         else:
-            return prices[n // 2]
-
-    by_fuel = []
-    for row in rows_fuel:
-        if row.category and row.avg_price is not None:
-            median = get_median_for_category(row.category, is_fuel=True)
-            by_fuel.append({
-                "category": str(row.category),
-                "avg_price": float(row.avg_price),
-                "median_price": median,
-                "n_offers": int(row.n_offers),
-            })
-
-    by_transmission = []
-    for row in rows_trans:
-        if row.category and row.avg_price is not None:
-            median = get_median_for_category(row.category, is_fuel=False)
-            by_transmission.append({
-                "category": str(row.category),
-                "avg_price": float(row.avg_price),
-                "median_price": median,
-                "n_offers": int(row.n_offers),
-            })
-
-    return by_fuel, by_transmission
+            panels["analysis"] = (n_offers, None, None, None)
+    if "price_statistics" in fields:
+        panels["price_statistics"] = price_summary(prices)
+    if "trend" in fields:
+        panels["trend"] = trend_points(grouped["year"])
+    if "by_category" in fields:
+        panels["by_category"] = (category_items(grouped["fuel_type"]), category_items(grouped["transmission"]))
+    if "price_mileage" in fields:
+        panels["price_mileage"] = downsampling.downsample_price_mileage(
+            point_prices, point_mileages, price_mileage_mode, price_mileage_target, price_mileage_bins, price_mileage_limit,
+            price_mileage_columnar,
+        )
+    return panels
 
 
 def get_vehicle_comparison(
     db: Session,
     vehicle_a_filters: dict,
     vehicle_b_filters: dict,
+    price_mileage_mode: str = "none",
+    price_mileage_target: int = 5000,
 ) -> dict:
     """
     Porównuje dwa pojazdy na podstawie filtrów.
-    Zwraca metryki, trend cenowy i dane cena vs przebieg dla obu pojazdów.
+    Zwraca metryki, trend cenowy i dane cena vs przebieg dla obu pojazdów
+    (zredukowane trybem price_mileage_mode, z prawdziwą liczbą punktów).
     """
     from .models import Listing
     from sqlalchemy import func
@@ -740,14 +954,10 @@ def get_vehicle_comparison(
             for row in results
         ]
     
-    def get_price_mileage(filters: dict) -> List[dict]:
-        """Pobiera dane cena vs przebieg dla pojazdu."""
-        stmt = select(
-            Listing.price_pln,
-            Listing.mileage_km,
-        )
-        stmt = apply_filters(
-            stmt,
+    def get_price_mileage(filters: dict) -> dict:
+        """Pobiera dane cena vs przebieg dla pojazdu (po redukcji punktów)."""
+        prices, mileages = get_price_mileage_arrays(
+            db,
             brand=filters.get("brand"),
             model=filters.get("model"),
             generation=filters.get("generation"),
@@ -759,24 +969,11 @@ def get_vehicle_comparison(
             displacement_min=filters.get("displacement_min"),
             displacement_max=filters.get("displacement_max"),
             fuel_type=filters.get("fuel_type"),
+            transmission=filters.get("transmission") or None,
         )
-        
-        if filters.get("transmission"):
-            stmt = stmt.where(Listing.transmission == filters["transmission"])
-        
-        stmt = stmt.where(
-            Listing.mileage_km.isnot(None),
-            Listing.price_pln.isnot(None),
+        return downsampling.downsample_price_mileage(
+            prices, mileages, price_mileage_mode, price_mileage_target
         )
-        
-        results = db.execute(stmt).all()
-        return [
-            {
-                "price_pln": float(row.price_pln),
-                "mileage_km": float(row.mileage_km),
-            }
-            for row in results
-        ]
     
     # Pobierz metryki dla obu pojazdów
     metrics_a = get_metrics(vehicle_a_filters)
@@ -826,6 +1023,9 @@ def get_vehicle_comparison(
         "metrics_a": metrics_a,
         "metrics_b": metrics_b,
         "trend_by_year": trend_combined,
-        "price_mileage_a": price_mileage_a,
-        "price_mileage_b": price_mileage_b,
+        "price_mileage_a": price_mileage_a["points"],
+        "price_mileage_b": price_mileage_b["points"],
+        "price_mileage_total_a": price_mileage_a["total"],
+        "price_mileage_total_b": price_mileage_b["total"],
+        "price_mileage_mode": price_mileage_mode,
     }
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Wersja danych tabeli listings.
+
+Znacznik "<epoka>-<licznik>" zapisany w tabeli app_meta. Licznik rośnie przy
+każdej zmianie ofert (import CSV, zapis/usunięcie przez ORM), a epoka jest
+losowana przy pierwszym utworzeniu wpisu - po odtworzeniu bazy od zera
+znacznik nie powtórzy się, nawet jeśli licznik zacznie liczyć od nowa.
+
+Wersji używają cache wyliczeń (modele wyceny, odpowiedzi analityk): wpis
+z inną wersją danych jest nieaktualny. Znacznik trzymany jest w bazie,
+więc widzą go wszystkie procesy (backend, init_db.py).
+"""
+
+import uuid
+from itertools import chain
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .models import AppMeta, Listing
+
+LISTINGS_VERSION_KEY = "listings_data_version"
+
+
+def _new_epoch() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+def get_data_version(bind) -> str:
+    """Aktualna wersja danych listings (Engine lub Connection). Tworzy wpis, jeśli go brak."""
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return get_data_version(conn)
+    version = bind.execute(
+        select(AppMeta.value).where(AppMeta.key == LISTINGS_VERSION_KEY)
+    ).scalar()
+    if version is None:
+        bind.execute(
+            sqlite_insert(AppMeta.__table__)
+            .values(key=LISTINGS_VERSION_KEY, value=f"{_new_epoch()}-0")
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+        version = bind.execute(
+            select(AppMeta.value).where(AppMeta.key == LISTINGS_VERSION_KEY)
+        ).scalar()
+    return version
+
+
+def bump_data_version(conn: Connection) -> str:
+    """Podbija licznik wersji danych (w transakcji wywołującego). Zwraca nową wersję."""
+    epoch, _, counter = get_data_version(conn).rpartition("-")
+    new_version = f"{epoch or _new_epoch()}-{int(counter or 0) + 1}"
+    conn.execute(
+        AppMeta.__table__.update()
+        .where(AppMeta.__table__.c.key == LISTINGS_VERSION_KEY)
+        .values(value=new_version)
+    )
+    return new_version
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_listing_change(session: Session, flush_context) -> None:
+    """Zmiana ofert przez ORM (np. usunięcie przez admina) zmienia wersję danych."""
+    if any(isinstance(obj, Listing) for obj in chain(session.new, session.dirty, session.deleted)):
+        bump_data_version(session.connection())
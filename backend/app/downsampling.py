@@ -0,0 +1,242 @@
+"""
+Redukcja punktów wykresu cena vs przebieg po stronie serwera (NumPy).
+
+Wykres rozrzutu nie potrzebuje setek tysięcy punktów - JSON ma wtedy
+megabajty, a przeglądarka i tak rysuje je jeden na drugim. Tryby:
+
+- none: pierwsze limit punktów (dotychczasowe zachowanie),
+- sample: losowa próbka target punktów (bez zwracania),
+- stratified: próbka warstwowa po komórkach siatki bins x bins - każda
+  niepusta komórka dostaje co najmniej jeden punkt, więc odstające oferty
+  nie znikają, a reszta przydziału jest proporcjonalna do liczności komórek,
+- lttb: Largest-Triangle-Three-Buckets po osi przebiegu - zachowuje kształt
+  (skrajne wartości ceny w kolejnych przedziałach przebiegu),
+- grid / hexbin: zamiast punktów liczności w komórkach prostokątnych
+  lub heksagonalnych (mapa gęstości).
+
+Próbki są deterministyczne (stałe ziarno), więc te same filtry dają tę samą
+odpowiedź. Każdy tryb zwraca też prawdziwą liczbę punktów (total).
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DOWNSAMPLING_MODES = ("none", "sample", "stratified", "lttb", "grid", "hexbin")
+DENSITY_MODES = ("grid", "hexbin")
+DEFAULT_SEED = 0
+
+
+def random_sample(n: int, target: int, seed: int = DEFAULT_SEED) -> np.ndarray:
+    """Indeksy losowej próbki target z n punktów (rosnąco)."""
+    if target >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n, size=target, replace=False))
+
+
+def _axis_codes(values: np.ndarray, bins: int):
+    """Numer przedziału (0..bins-1) każdej wartości, początek osi i szerokość przedziału."""
+    low, high = float(values.min()), float(values.max())
+    if high == low:
+        return np.zeros(len(values), dtype=np.int64), low, 1.0
+    width = (high - low) / bins
+    return np.minimum(((values - low) / width).astype(np.int64), bins - 1), low, width
+
+
+def _grid_codes(x: np.ndarray, y: np.ndarray, bins: int) -> np.ndarray:
+    """Numer komórki siatki bins x bins dla każdego punktu."""
+    return _axis_codes(x, bins)[0] * bins + _axis_codes(y, bins)[0]
+
+
+def stratified_sample(
+    x: np.ndarray, y: np.ndarray, target: int, bins: int = 50, seed: int = DEFAULT_SEED
+) -> np.ndarray:
+    """Indeksy próbki warstwowej (warstwy = komórki siatki bins x bins), rosnąco."""
+    n = len(x)
+    if target >= n:
+        return np.arange(n)
+    codes = _grid_codes(x, y, bins)
+    all_counts = np.bincount(codes, minlength=bins * bins)
+    cells = np.flatnonzero(all_counts)
+    counts = all_counts[cells]
+    k = len(cells)
+
+    # Przydział: po jednym punkcie na komórkę (jeśli się mieści), reszta
+    # proporcjonalnie do liczności metodą największych reszt
+    quota = np.ones(k, dtype=np.int64) if k < target else np.zeros(k, dtype=np.int64)
+    share = counts - quota
+    remaining = target - int(quota.sum())
+    exact = share * remaining / share.sum()
+    extra = np.floor(exact).astype(np.int64)
+    leftover = remaining - int(extra.sum())
+    if leftover > 0:
+        extra[np.argsort(extra - exact, kind="stable")[:leftover]] += 1
+    all_quota = np.zeros(len(all_counts), dtype=np.int64)
+    all_quota[cells] = quota + extra
+
+    # Losowa kolejność w obrębie komórek: sortowanie po (komórka + losowy ułamek)
+    rng = np.random.default_rng(seed)
+    by_cell = np.argsort(codes + rng.random(n))
+    sorted_codes = codes[by_cell]
+    starts = np.concatenate(([0], np.cumsum(all_counts)[:-1]))
+    rank = np.arange(n) - starts[sorted_codes]
+    return np.sort(by_cell[rank < all_quota[sorted_codes]])
+
+
+def lttb(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    Indeksy punktów wybranych algorytmem Largest-Triangle-Three-Buckets
+    (punkty uporządkowane po x). Z każdego przedziału wybierany jest punkt
+    tworzący największy trójkąt z poprzednio wybranym punktem i średnią
+    następnego przedziału.
+    """
+    n = len(x)
+    if target >= n:
+        return np.arange(n)
+    target = max(target, 3)
+    order = np.argsort(x)
+    xs, ys = x[order], y[order]
+
+    # Przedziały [edges[i], edges[i + 1]) - pierwszy i ostatni punkt są zawsze wybrane
+    every = (n - 2) / (target - 2)
+    edges = (np.floor(np.arange(target - 1) * every) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    selected = np.empty(target, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    # Średnie wszystkich przedziałów naraz; "następnym" dla ostatniego jest ostatni punkt
+    sizes = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(xs, edges) / sizes
+    mean_y = np.add.reduceat(ys, edges) / sizes
+    a = 0
+    for i in range(target - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (xs[a] - mean_x[i + 1]) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (mean_y[i + 1] - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return np.sort(order[selected])
+
+
+def grid_density(x: np.ndarray, y: np.ndarray, bins: int = 50) -> Dict:
+    """Liczności niepustych komórek siatki bins x bins (środki komórek + rozmiar)."""
+    x_codes, x_low, x_width = _axis_codes(x, bins)
+    y_codes, y_low, y_width = _axis_codes(y, bins)
+    counts = np.bincount(x_codes * bins + y_codes, minlength=bins * bins)
+    cells = np.flatnonzero(counts)
+    return {
+        "x": x_low + (cells // bins + 0.5) * x_width,
+        "y": y_low + (cells % bins + 0.5) * y_width,
+        "count": counts[cells],
+        "cell_x": x_width,
+        "cell_y": y_width,
+    }
+
+
+def hexbin_density(x: np.ndarray, y: np.ndarray, bins: int = 50) -> Dict:
+    """
+    Liczności niepustych komórek heksagonalnych (bins komórek w poziomie).
+    Dwie przesunięte siatki prostokątne - punkt trafia do bliższego środka
+    (jak matplotlib.hexbin).
+    """
+    ny = max(1, int(round(bins / np.sqrt(3))))
+    x_min, y_min = float(x.min()), float(y.min())
+    sx = (float(x.max()) - x_min) / bins or 1.0
+    sy = (float(y.max()) - y_min) / ny or 1.0
+    ix = (x - x_min) / sx
+    iy = (y - y_min) / sy
+
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix), np.floor(iy)
+    d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+    d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+    first = d1 < d2
+
+    # Środki komórek w połówkach jednostek siatki: pierwsza siatka w węzłach,
+    # druga przesunięta o pół - klucz komórki to para (2*cx, 2*cy)
+    cx2 = np.where(first, 2 * ix1, 2 * ix2 + 1).astype(np.int64)
+    cy2 = np.where(first, 2 * iy1, 2 * iy2 + 1).astype(np.int64)
+    rows = 2 * ny + 3
+    counts = np.bincount(cx2 * rows + cy2, minlength=(2 * bins + 3) * rows)
+    cells = np.flatnonzero(counts)
+    return {
+        "x": x_min + (cells // rows) / 2 * sx,
+        "y": y_min + (cells % rows) / 2 * sy,
+        "count": counts[cells],
+        "cell_x": float(sx),
+        "cell_y": float(sy),
+    }
+
+
+def downsample_price_mileage(
+    prices: np.ndarray,
+    mileages: np.ndarray,
+    mode: str = "none",
+    target: int = 5000,
+    bins: int = 50,
+    limit: Optional[int] = None,
+    columnar: bool = False,
+) -> Dict:
+    """
+    Redukuje punkty (cena, przebieg) wybranym trybem.
+
+    Args:
+        columnar: punkty i komórki jako kolumny ({"price_pln": [...], "mileage_km": [...]})
+            zamiast listy obiektów - mniejszy JSON i szybsza serializacja
+
+    Returns:
+        {"mode", "total", "points": [{price_pln, mileage_km}],
+         "cells": [{price_pln, mileage_km, count}] | None, "cell_size": {...} | None}
+    """
+    if mode not in DOWNSAMPLING_MODES:
+        raise ValueError(f"Nieobsługiwany tryb: {mode}")
+    total = len(prices)
+    result = {"mode": mode, "total": total, "points": [], "cells": None, "cell_size": None}
+    if not total:
+        if mode in DENSITY_MODES:
+            result["cells"] = cells_columns(prices, mileages, np.empty(0, dtype=np.int64)) if columnar else []
+        if columnar:
+            result["points"] = points_columns(prices, mileages)
+        return result
+
+    if mode in DENSITY_MODES:
+        density = (grid_density if mode == "grid" else hexbin_density)(mileages, prices, bins)
+        if columnar:
+            result["cells"] = cells_columns(density["y"], density["x"], density["count"])
+            result["points"] = points_columns(prices[:0], mileages[:0])
+        else:
+            result["cells"] = [
+                {"mileage_km": mileage, "price_pln": price, "count": count}
+                for mileage, price, count in zip(density["x"].tolist(), density["y"].tolist(), density["count"].tolist())
+            ]
+        result["cell_size"] = {"mileage_km": density["cell_x"], "price_pln": density["cell_y"]}
+        return result
+
+    if mode == "none":
+        index = np.arange(min(total, limit if limit is not None else total))
+    elif mode == "sample":
+        index = random_sample(total, target)
+    elif mode == "stratified":
+        index = stratified_sample(mileages, prices, target, bins)
+    else:
+        index = lttb(mileages, prices, target)
+
+    result["points"] = (points_columns if columnar else points_list)(prices[index], mileages[index])
+    return result
+
+
+def points_list(prices: np.ndarray, mileages: np.ndarray) -> List[Dict[str, float]]:
+    return [
+        {"price_pln": price, "mileage_km": mileage}
+        for price, mileage in zip(prices.tolist(), mileages.tolist())
+    ]
+
+
+def points_columns(prices: np.ndarray, mileages: np.ndarray) -> Dict[str, List[float]]:
+    return {"price_pln": prices.tolist(), "mileage_km": mileages.tolist()}
+
+
+def cells_columns(prices: np.ndarray, mileages: np.ndarray, counts: np.ndarray) -> Dict[str, list]:
+    return {"price_pln": prices.tolist(), "mileage_km": mileages.tolist(), "count": counts.tolist()}
@@ -129,3 +129,14 @@ class DataProcessingError(AutoTradeException):
             error_code="DATA_PROCESSING_ERROR"
         )
 
+
+
+class TooManyRequestsError(AutoTradeException):
+    """Przekroczony limit (np. liczby równoczesnych zadań użytkownika)."""
+    
+    def __init__(self, detail: str = "Zbyt wiele żądań - spróbuj ponownie później"):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            error_code="TOO_MANY_REQUESTS"
+        )
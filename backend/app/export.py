@@ -0,0 +1,159 @@
+"""
+Strumieniowy eksport przefiltrowanych ofert (NDJSON, CSV, Parquet).
+
+Wiersze czytane są kursorem po stronie serwera (yield_per) w paczkach po
+EXPORT_BATCH_SIZE i od razu zamieniane na fragmenty odpowiedzi - bez obiektów
+ORM i modeli Pydantic, a zużycie pamięci nie zależy od liczby eksportowanych
+ofert. Parametr columns ogranicza eksport do wybranych kolumn (projekcja
+w SELECT).
+
+Parquet wymaga pyarrow (opcjonalna zależność) - bez niego PARQUET_AVAILABLE
+= False i format jest niedostępny.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import Boolean, Float, Integer, select
+from sqlalchemy.engine import Engine
+
+from .models import Listing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # pragma: no cover - zależy od środowiska
+    PARQUET_AVAILABLE = False
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_COLUMNS = [column.key for column in Listing.__table__.columns]
+
+EXPORT_FORMATS: Dict[str, Dict[str, str]] = {
+    "ndjson": {"media_type": "application/x-ndjson", "extension": "ndjson"},
+    "csv": {"media_type": "text/csv; charset=utf-8", "extension": "csv"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+}
+
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+    """
+    Lista kolumn z parametru "a,b,c" (pusta = wszystkie, kolejność jak w tabeli).
+
+    Raises:
+        ValueError: nieznana kolumna
+    """
+    if not columns:
+        return list(EXPORT_COLUMNS)
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Nieznane kolumny: {', '.join(unknown)}. Dostępne: {', '.join(EXPORT_COLUMNS)}")
+    return list(dict.fromkeys(selected))
+
+
+def export_statement(columns: List[str]):
+    """SELECT wybranych kolumn w kolejności id (filtry dokłada crud.apply_filters)."""
+    table = Listing.__table__
+    return select(*[table.c[name] for name in columns]).order_by(table.c.id)
+
+
+def _batches(engine: Engine, stmt, batch_size: int) -> Iterator[list]:
+    """Paczki wierszy z kursora po stronie serwera (własne połączenie - strumień trwa dłużej niż żądanie)."""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for partition in result.partitions():
+            yield partition
+
+
+def stream_ndjson(engine: Engine, stmt, columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    for rows in _batches(engine, stmt, batch_size):
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+def stream_csv(engine: Engine, stmt, columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in _batches(engine, stmt, batch_size):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Plik tylko do zapisu dla ParquetWriter: zbiera zapisane bajty do odebrania
+    (drain) i pamięta łączną pozycję - offsety w stopce Parquet są poprawne,
+    choć bufor jest opróżniany po każdej grupie wierszy.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(columns: List[str]):
+    def arrow_type(column):
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        return pa.string()
+
+    table = Listing.__table__
+    return pa.schema([(name, arrow_type(table.c[name])) for name in columns])
+
+
+def stream_parquet(engine: Engine, stmt, columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Jedna grupa wierszy Parquet na paczkę z kursora."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Eksport Parquet wymaga pakietu pyarrow")
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for rows in _batches(engine, stmt, batch_size):
+            values = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values[i], type=field.type) for i, field in enumerate(schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+    "parquet": stream_parquet,
+}
@@ -0,0 +1,159 @@
+"""
+Katalog wartości filtrów (facet): marka -> model -> generacje, paliwa, skrzynie, pojemności.
+
+Listy rozwijane w sidebarze (/brands, /models, /generations, /displacements,
+/fuel-types-by-model, /fuel-types, /transmissions) wykonywały przy każdej
+zmianie wyboru SELECT DISTINCT ... ORDER BY po tabeli listings - dla generacji
+i pojemności bez indeksu. Katalog powstaje z jednego zapytania GROUP BY po
+kombinacjach tych kolumn (kilka tysięcy wierszy zamiast całej tabeli) i jest
+trzymany w pamięci jako drzewo:
+
+    {marka: {model: {"count", "generations", "fuel_types", "transmissions", "displacements"}}}
+
+Katalog jest oznaczony wersją danych (app.data_version) - po imporcie budowany
+jest od razu, a po innej zmianie ofert (usunięcie przez admina) przy
+pierwszym żądaniu, które zobaczy nową wersję.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .data_version import get_data_version
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+
+class FacetCatalog:
+    """Niezmienne drzewo wartości filtrów dla jednej wersji danych."""
+
+    def __init__(self, rows, data_version: str):
+        started = time.perf_counter()
+        self.data_version = data_version
+        tree: Dict[str, Dict[str, Dict]] = {}
+        fuel_types, transmissions = set(), set()
+        total = 0
+        for brand, model, generation, fuel_type, transmission, displacement, count in rows:
+            node = tree.setdefault(brand, {}).setdefault(model, {
+                "count": 0, "generations": set(), "fuel_types": set(),
+                "transmissions": set(), "displacements": set(),
+            })
+            node["count"] += count
+            total += count
+            if generation is not None:
+                node["generations"].add(generation)
+            if fuel_type is not None:
+                node["fuel_types"].add(fuel_type)
+                fuel_types.add(fuel_type)
+            if transmission is not None:
+                node["transmissions"].add(transmission)
+                transmissions.add(transmission)
+            if displacement is not None:
+                node["displacements"].add(float(displacement))
+
+        self._tree = {
+            brand: {
+                model: {key: sorted(value) if isinstance(value, set) else value for key, value in node.items()}
+                for model, node in sorted(brand_models.items())
+            }
+            for brand, brand_models in sorted(tree.items())
+        }
+        self.total = total
+        self.fuel_types = sorted(fuel_types)
+        self.transmissions = sorted(transmissions)
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def load(cls, conn: Connection, data_version: str) -> "FacetCatalog":
+        """Jedno zapytanie GROUP BY po kombinacjach kolumn filtrów."""
+        columns = (
+            Listing.vehicle_brand,
+            Listing.vehicle_model,
+            Listing.vehicle_generation,
+            Listing.fuel_type,
+            Listing.transmission,
+            Listing.displacement_cm3,
+        )
+        stmt = select(*columns, func.count()).group_by(*columns)
+        return cls(conn.execute(stmt).all(), data_version)
+
+    def brands(self) -> List[str]:
+        return list(self._tree)
+
+    def models(self, brand: str) -> List[str]:
+        return list(self._tree.get(brand, {}))
+
+    def model_values(self, brand: str, model: str, key: str) -> list:
+        """Wartości (generations / fuel_types / transmissions / displacements) dla marki i modelu."""
+        node = self._tree.get(brand, {}).get(model)
+        return list(node[key]) if node else []
+
+    def tree(self, brand: Optional[str] = None) -> List[Dict]:
+        """Lista marek z modelami (opcjonalnie tylko jedna marka)."""
+        brands = [brand] if brand is not None else self._tree
+        return [
+            {
+                "brand": name,
+                "count": sum(node["count"] for node in self._tree[name].values()),
+                "models": [{"model": model, **node} for model, node in self._tree[name].items()],
+            }
+            for name in brands
+            if name in self._tree
+        ]
+
+    def has_brand(self, brand: str) -> bool:
+        return brand in self._tree
+
+
+class FacetStore:
+    """Aktualne katalogi (po jednym na bazę); przebudowa pod blokadą, odczyt bez blokady."""
+
+    def __init__(self):
+        self._catalogs: Dict[str, FacetCatalog] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _source(bind) -> str:
+        engine = bind if isinstance(bind, Engine) else bind.engine
+        return engine.url.render_as_string(hide_password=True)
+
+    def _current(self, conn: Connection) -> FacetCatalog:
+        source = self._source(conn)
+        version = get_data_version(conn)
+        catalog = self._catalogs.get(source)
+        if catalog is not None and catalog.data_version == version:
+            return catalog
+        with self._lock:
+            catalog = self._catalogs.get(source)
+            if catalog is None or catalog.data_version != version:
+                catalog = FacetCatalog.load(conn, version)
+                self._catalogs[source] = catalog
+                logger.info(
+                    f"Facet catalog {version}: {len(catalog.brands())} brands, "
+                    f"built in {catalog.build_seconds:.2f}s"
+                )
+            return catalog
+
+    def current(self, db: Session) -> FacetCatalog:
+        """Katalog zgodny z wersją danych widzianą przez sesję."""
+        return self._current(db.connection())
+
+    def refresh(self, engine: Engine) -> FacetCatalog:
+        """Buduje katalog bieżącej wersji danych (wywoływane po imporcie i przy starcie)."""
+        with engine.connect() as conn:
+            catalog = self._current(conn)
+            conn.commit()
+            return catalog
+
+    def clear(self) -> None:
+        self._catalogs = {}
+
+
+facet_store = FacetStore()
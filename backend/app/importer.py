@@ -0,0 +1,286 @@
+"""
+Wspólny importer ofert z CSV do tabeli listings.
+
+Używany przez init_db.py i scraper_integration.import_csv_to_database.
+Kolumny są czyszczone wektorowo w pandas, a zapis odbywa się paczkami przez
+INSERT ... ON CONFLICT(id) DO UPDATE (executemany na poziomie SQLAlchemy Core),
+bez budowania obiektów ORM i bez osobnego SELECT-a dla każdego rekordu.
+"""
+
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+
+from .data_version import bump_data_version
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+# Domyślny rozmiar paczki zapisu (liczba rekordów na jedno executemany)
+DEFAULT_BATCH_SIZE = 5000
+
+# Domyślny rozmiar kawałka CSV w trybie strumieniowym (liczba wierszy na jeden read_csv)
+DEFAULT_CHUNK_SIZE = 50000
+
+# Mapowanie polskich nazw kolumn na angielskie (jeśli plik ma polskie nagłówki)
+POLISH_COLUMN_MAPPING = {
+    "Stan": "Condition",
+    "Marka pojazdu": "Vehicle_brand",
+    "Model pojazdu": "Vehicle_model",
+    "Wersja": "Vehicle_version",
+    "Generacja": "Vehicle_generation",
+    "Rok produkcji": "Production_year",
+    "Przebieg": "Mileage_km",
+    "Moc": "Power_HP",
+    "Pojemność skokowa": "Displacement_cm3",
+    "Rodzaj paliwa": "Fuel_type",
+    "Emisja CO2": "CO2_emissions",
+    "Napęd": "Drive",
+    "Skrzynia biegów": "Transmission",
+    "Typ": "Type",
+    "Liczba drzwi": "Doors_number",
+    "Kolor": "Colour",
+    "Kraj pochodzenia": "Origin_country",
+    "Pierwszy właściciel": "First_owner",
+    "Pierwsza rejestracja": "First_registration_date",
+    "date": "Offer_publication_date",
+    "Location": "Offer_location",
+}
+
+# Kolumny CSV -> kolumny tabeli listings (z jednostką do usunięcia dla wartości liczbowych)
+NUMERIC_COLUMNS = {
+    "Price": ("price_pln", None),
+    "Mileage_km": ("mileage_km", "km"),
+    "Power_HP": ("power_hp", "KM"),
+    "Displacement_cm3": ("displacement_cm3", "cm3"),
+    "CO2_emissions": ("co2_emissions", "g/km"),
+    "Doors_number": ("doors_number", None),
+}
+
+TEXT_COLUMNS = {
+    "Currency": "currency",
+    "Condition": "condition",
+    "Vehicle_brand": "vehicle_brand",
+    "Vehicle_model": "vehicle_model",
+    "Vehicle_version": "vehicle_version",
+    "Vehicle_generation": "vehicle_generation",
+    "Fuel_type": "fuel_type",
+    "Drive": "drive",
+    "Transmission": "transmission",
+    "Type": "type",
+    "Colour": "colour",
+    "Origin_country": "origin_country",
+    "First_registration_date": "first_registration_date",
+    "Offer_publication_date": "offer_publication_date",
+    "Offer_location": "offer_location",
+    "Features": "features",
+}
+
+# Kolumny NOT NULL - rekord bez nich liczony jest jako błąd
+REQUIRED_COLUMNS = ["id", "price_pln", "currency", "vehicle_brand", "vehicle_model", "production_year"]
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Zwraca kolumnę CSV lub pustą kolumnę, jeśli plik jej nie zawiera."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(pd.NA, index=df.index, dtype=object)
+
+
+def _to_number(series: pd.Series, unit: Optional[str]) -> pd.Series:
+    """Konwertuje kolumnę na float, usuwając jednostkę, spacje i przecinek dziesiętny."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    text = series.astype("string")
+    if unit:
+        text = text.str.replace(unit, "", regex=False)
+    text = (
+        text.str.replace(" ", "", regex=False)
+        .str.replace("\xa0", "", regex=False)
+        .str.replace(",", ".", regex=False)
+    )
+    return pd.to_numeric(text, errors="coerce").astype(float)
+
+
+def _to_text(series: pd.Series) -> pd.Series:
+    """Konwertuje kolumnę na tekst (object), z None dla pustych wartości."""
+    return series.astype(object).where(series.notna(), None).map(
+        lambda v: None if v is None else str(v)
+    )
+
+
+def prepare_listings_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Czyści surowy DataFrame z CSV (nagłówki PL lub EN) do kolumn tabeli listings.
+
+    Returns:
+        (frame, skipped, errors):
+        - frame: DataFrame z kolumnami tabeli listings, gotowy do zapisu,
+        - skipped: liczba duplikatów ID w DataFrame (zostaje ostatnie wystąpienie),
+        - errors: liczba rekordów z nieprawidłowym ID lub brakiem wymaganych pól.
+    """
+    df = df.rename(columns=POLISH_COLUMN_MAPPING)
+
+    # Wyrzuć rekordy bez ceny (price_pln jest NOT NULL) - nie liczymy ich jako błędy
+    df = df[_column(df, "Price").notna()]
+
+    out = pd.DataFrame(index=df.index)
+    out["id"] = pd.to_numeric(_column(df, "ID"), errors="coerce")
+    for csv_col, (db_col, unit) in NUMERIC_COLUMNS.items():
+        out[db_col] = _to_number(_column(df, csv_col), unit)
+    out["production_year"] = pd.to_numeric(_column(df, "Production_year"), errors="coerce")
+    for csv_col, db_col in TEXT_COLUMNS.items():
+        out[db_col] = _to_text(_column(df, csv_col))
+
+    first_owner = _column(df, "First_owner").astype("string").str.strip().str.lower()
+    out["first_owner"] = first_owner.map({"yes": True, "no": False}).astype(object)
+    out["first_owner"] = out["first_owner"].where(out["first_owner"].notna(), None)
+
+    out["offer_publication_date_iso"] = pd.to_datetime(
+        out["offer_publication_date"].astype("string").str.strip(), format="%d.%m.%Y", errors="coerce"
+    ).dt.strftime("%Y-%m-%d")
+
+    valid = out[REQUIRED_COLUMNS].notna().all(axis=1)
+    errors = int((~valid).sum())
+    out = out[valid]
+
+    duplicated = out["id"].duplicated(keep="last")
+    skipped = int(duplicated.sum())
+    out = out[~duplicated]
+
+    out["id"] = out["id"].astype("int64")
+    out["production_year"] = out["production_year"].astype("int64")
+    return out, skipped, errors
+
+
+def _frame_to_records(frame: pd.DataFrame) -> list:
+    """DataFrame -> lista słowników z typami Pythona (None zamiast NaN)."""
+    as_object = frame.astype(object)
+    return as_object.where(frame.notna(), None).to_dict("records")
+
+
+def upsert_listings(engine: Engine, frame: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Zapisuje rekordy paczkami przez INSERT ... ON CONFLICT(id) DO UPDATE.
+
+    Returns:
+        (inserted, updated)
+    """
+    table = Listing.__table__
+    columns = list(frame.columns)
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={col: stmt.excluded[col] for col in columns if col != "id"},
+    )
+
+    inserted = 0
+    updated = 0
+    with engine.begin() as conn:
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start:start + batch_size]
+            ids = [int(i) for i in batch["id"]]
+            n_existing = len(conn.execute(select(table.c.id).where(table.c.id.in_(ids))).all())
+            conn.execute(stmt, _frame_to_records(batch))
+            updated += n_existing
+            inserted += len(batch) - n_existing
+        if len(frame):
+            # Zmienione dane - unieważnia cache wyliczeń (modele wyceny, analityki)
+            bump_data_version(conn)
+    return inserted, updated
+
+
+def import_dataframe(
+    df: pd.DataFrame,
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict:
+    """
+    Czyści i zapisuje DataFrame z ofertami. Zwraca statystyki importu.
+    Duplikaty ID w DataFrame są pomijane (zostaje ostatnie wystąpienie).
+    """
+    frame, skipped, errors = prepare_listings_frame(df)
+    inserted, updated = upsert_listings(engine, frame, batch_size)
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": skipped,
+        "errors": errors,
+        "total_processed": inserted + updated,
+    }
+
+
+def _merge_stats(total: Dict, chunk: Dict) -> Dict:
+    """Dodaje statystyki kawałka do statystyk łącznych."""
+    for key, value in chunk.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def count_csv_rows(csv_path: Path, block_size: int = 1024 * 1024) -> int:
+    """
+    Szybkie oszacowanie liczby wierszy danych (liczba znaków nowej linii bez nagłówka),
+    używane do liczenia postępu importu strumieniowego.
+    """
+    lines = 0
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+def import_csv(
+    csv_path: Path,
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    chunksize: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, Dict], None]] = None,
+) -> Dict:
+    """
+    Importuje plik CSV do tabeli listings (insert lub update po ID).
+
+    Args:
+        csv_path: ścieżka do pliku CSV
+        engine: silnik bazy danych
+        batch_size: liczba rekordów na jedno executemany
+        chunksize: jeśli podany, plik czytany jest strumieniowo po tyle wierszy,
+            a każdy kawałek jest od razu zapisywany - pamięć nie rośnie z rozmiarem
+            pliku. Duplikaty ID wewnątrz kawałka liczone są jako skipped; ID
+            powtórzone w dalszym kawałku nadpisuje wcześniejszy rekord przez
+            ON CONFLICT i liczone jest jako updated. W obu trybach w bazie
+            zostaje ostatnie wystąpienie ID w pliku.
+        progress_callback: wywoływany po każdym kawałku z (numer_kawałka, statystyki_łączne)
+
+    Returns:
+        Dict ze statystykami: inserted, updated, skipped, errors, total_processed
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+
+    logger.info(f"Importing CSV from: {csv_path}")
+    if not chunksize:
+        df = pd.read_csv(csv_path, low_memory=False)
+        stats = import_dataframe(df, engine, batch_size)
+        if progress_callback:
+            progress_callback(1, stats)
+        logger.info(f"Import completed! Stats: {stats}")
+        return stats
+
+    stats = {"inserted": 0, "updated": 0, "skipped": 0, "errors": 0, "total_processed": 0}
+    rows_read = 0
+    with pd.read_csv(csv_path, chunksize=chunksize, low_memory=False) as reader:
+        for chunk_no, chunk in enumerate(reader, start=1):
+            rows_read += len(chunk)
+            _merge_stats(stats, import_dataframe(chunk, engine, batch_size))
+            logger.info(f"Chunk {chunk_no}: {rows_read} rows read, stats so far: {stats}")
+            if progress_callback:
+                progress_callback(chunk_no, dict(stats))
+
+    logger.info(f"Import completed! Stats: {stats}")
+    return stats
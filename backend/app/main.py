@@ -4,13 +4,13 @@ import json
 import threading
 import logging
 import os
+from contextlib import asynccontextmanager
 
-import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Depends, Query, HTTPException, status, Request, UploadFile, File
 from fastapi.responses import FileResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -25,7 +25,17 @@ load_dotenv()
 
 from .db import Base, engine, get_db
 from . import schemas, crud
+from .migrations import run_migrations
 from . import exceptions
+from . import valuation as valuation_engine
+from . import valuation_jobs
+from . import columnar
+from . import facets
+from . import export
+from . import downsampling
+from .data_version import get_data_version
+from .response_cache import ResponseCacheMiddleware, response_cache, RESPONSE_CACHE_ENABLED
+from .responses import ORJSONResponse
 
 from sqlalchemy import select, func
 from .models import Listing, User, SavedValuation, SavedComparison
@@ -44,8 +54,9 @@ logger = logging.getLogger(__name__)
 
 
 
-# Tworzymy tabele w bazie (jeśli nie istnieją)
+# Tworzymy tabele w bazie (jeśli nie istnieją) i uzupełniamy schemat istniejącej bazy
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """Middleware z nagłówkami bezpieczeństwa."""
@@ -81,9 +92,23 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         
         return response
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Przy starcie wczytuje w tle katalog filtrów i kolumnowy snapshot ofert dla analityk."""
+    def preload_snapshot():
+        try:
+            facets.facet_store.refresh(engine)
+            columnar.snapshot_store.refresh(engine)
+        except Exception as e:
+            logger.warning(f"Analytics snapshot preload failed: {e}")
+
+    threading.Thread(target=preload_snapshot, name="analytics-snapshot", daemon=True).start()
+    yield
+
+
 # Rate limiter
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI(title="AutoTrade Analytics API")
+app = FastAPI(title="AutoTrade Analytics API", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -128,6 +153,45 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# Endpointy tylko do odczytu, których odpowiedzi zależą wyłącznie od parametrów i danych
+CACHED_PATHS = (
+    "/facets",
+    "/brands",
+    "/models",
+    "/generations",
+    "/displacements",
+    "/fuel-types-by-model",
+    "/fuel-types",
+    "/transmissions",
+    "/publication-date-range",
+    "/analysis",
+    "/listings-filtered",
+    "/trend-by-year",
+    "/analytics/price-statistics",
+    "/analytics/price-mileage",
+    "/analytics/price-stats-by-category",
+    "/analytics/dashboard",
+)
+
+
+def request_data_version(request: Request) -> str:
+    """Wersja danych bazy, z której skorzysta żądanie (z uwzględnieniem nadpisania get_db w testach)."""
+    sessions = request.app.dependency_overrides.get(get_db, get_db)()
+    db = next(sessions)
+    try:
+        return get_data_version(db.get_bind())
+    finally:
+        sessions.close()
+
+
+# Dodany przed SecurityHeadersMiddleware - odpowiedzi z cache też dostają nagłówki bezpieczeństwa
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    paths=CACHED_PATHS,
+    data_version=request_data_version,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
 app.add_middleware(SecurityHeadersMiddleware)
 cors_origins_str = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173")
 origins = [origin.strip() for origin in cors_origins_str.split(",") if origin.strip()]
@@ -146,6 +210,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent  # katalog backend/
 BACKEND_DIR = BASE_DIR  # alias dla czytelności
 MODELS_DIR = BASE_DIR / "models"
 SCRAPER_CONFIG_FILE = BACKEND_DIR / "scraper_config.json"
+UPLOAD_COPY_CHUNK_BYTES = 1024 * 1024  # zapis uploadu CSV na dysk po 1 MB
 
 # === MODEL REGRESJI ===
 # Model jest trenowany na żądanie dla każdej wyceny (dla konkretnej marki/modelu).
@@ -240,6 +305,18 @@ def read_users_me(current_user: User = Depends(get_current_active_user)):
 # @app.post("/valuation/reload-model") - USUNIĘTY
 
 
+@app.get("/facets", response_model=schemas.FacetsResponse)
+def get_facets(
+    brand: Optional[str] = Query(None, description="Tylko poddrzewo tej marki"),
+    db: Session = Depends(get_db),
+):
+    """
+    Katalog wartości filtrów w jednej odpowiedzi: marki, ich modele oraz dla
+    każdego modelu generacje, typy paliwa, skrzynie biegów, pojemności i liczba ofert.
+    """
+    return crud.get_facets(db, brand)
+
+
 @app.get("/brands", response_model=list[str])
 def get_brands(db: Session = Depends(get_db)):
     """
@@ -417,6 +494,9 @@ def get_analysis(
     )
 
 
+LISTING_FIELDS = tuple(schemas.Listing.model_fields)
+
+
 @app.get("/listings-filtered", response_model=schemas.ListingsResponse)
 def get_listings_filtered(
     brand: Optional[str] = None,
@@ -436,15 +516,28 @@ def get_listings_filtered(
         None, description="year | mileage | price | brand | model"
     ),
     sort_dir: str = Query("desc", description="asc | desc"),
+    cursor: Optional[str] = Query(
+        None, description="Kursor next_cursor z poprzedniej strony (zamiast offset)"
+    ),
+    include_total: bool = Query(True, description="Policz łączną liczbę ofert (total)"),
     db: Session = Depends(get_db),
 ):
     """
     Zwraca listę ofert z paginacją i sortowaniem po CAŁEJ bazie
     (sort_by: year/mileage/price, sort_dir: asc/desc).
+
+    Kolejne strony najlepiej pobierać przez cursor=next_cursor (paginacja
+    po kluczu - koszt strony nie rośnie z jej numerem); offset działa jak dotąd.
     """
-    total, items = crud.get_listings_filtered(
-        db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type, limit, offset, sort_by, sort_dir
-    )
+    if cursor and offset:
+        raise exceptions.ValidationError("Podaj cursor albo offset, nie oba naraz", field="cursor")
+    try:
+        total, items = crud.get_listings_filtered(
+            db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type, limit, offset, sort_by, sort_dir,
+            cursor=cursor, include_total=include_total,
+        )
+    except ValueError as e:
+        raise exceptions.ValidationError(str(e), field="cursor")
 
     filters = {
         "brand": brand,
@@ -459,12 +552,59 @@ def get_listings_filtered(
         "displacement_max": displacement_max,
     }
 
-    return schemas.ListingsResponse(
-        filters=filters,
-        limit=limit,
-        offset=offset,
-        total=total,
-        items=items,
+    # Oferty prosto z atrybutów ORM (kolumny tabeli mają typy schematu) - bez modelu Pydantic na ofertę
+    return ORJSONResponse({
+        "filters": filters,
+        "limit": limit,
+        "offset": offset,
+        "total": total,
+        "items": [{field: getattr(item, field) for field in LISTING_FIELDS} for item in items],
+        "next_cursor": crud.encode_listings_cursor(sort_by, sort_dir, items[-1]) if len(items) == limit else None,
+    })
+
+
+@app.get("/listings/export")
+def export_listings(
+    format: str = Query("ndjson", description="ndjson | csv | parquet (wymaga pyarrow)"),
+    columns: Optional[str] = Query(None, description="Kolumny oddzielone przecinkami (domyślnie wszystkie)"),
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    generation: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    mileage_max: Optional[float] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Eksport wszystkich ofert spełniających filtry (jak /listings-filtered) jako
+    strumień NDJSON, CSV albo Parquet, w kolejności id. Zużycie pamięci nie
+    zależy od liczby ofert.
+    """
+    if format not in export.EXPORT_FORMATS:
+        raise exceptions.ValidationError(
+            f"Nieobsługiwany format: {format}. Dostępne: {', '.join(export.EXPORT_FORMATS)}", field="format"
+        )
+    if format == "parquet" and not export.PARQUET_AVAILABLE:
+        raise exceptions.ValidationError("Eksport Parquet wymaga pakietu pyarrow na serwerze", field="format")
+    try:
+        selected = export.parse_columns(columns)
+    except ValueError as e:
+        raise exceptions.ValidationError(str(e), field="columns")
+
+    stmt = crud.apply_filters(
+        export.export_statement(selected),
+        brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type,
+    )
+    spec = export.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export.STREAMERS[format](db.get_bind(), stmt, selected),
+        media_type=spec["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="listings.{spec["extension"]}"'},
     )
 
 
@@ -511,246 +651,119 @@ def get_trend_by_year(
     )
 
 
-def load_training_data(filters: Optional[schemas.ValuationTrainingFilters], db: Session) -> pd.DataFrame:
-    """Pobiera dane do treningu zgodnie z filtrami."""
-    from .models import Listing
-    
-    stmt = select(
-        Listing.vehicle_brand,
-        Listing.vehicle_model,
-        Listing.vehicle_generation,
-        Listing.production_year,
-        Listing.mileage_km,
-        Listing.fuel_type,
-        Listing.transmission,
-        Listing.displacement_cm3,
-        Listing.price_pln,
-    )
-    
-    # Zastosuj filtry używając funkcji pomocniczej
-    if filters:
-        stmt = crud.apply_filters(
-            stmt,
-            brand=filters.brand,
-            model=filters.model,
-            generation=filters.generation,
-            year_min=filters.year_min,
-            year_max=filters.year_max,
-            mileage_max=filters.mileage_max,
-            displacement_min=filters.displacement_min,
-            displacement_max=filters.displacement_max,
-            fuel_type=filters.fuel_type,
-            date_from=filters.date_from,
-            date_to=filters.date_to,
+@app.post("/valuation", response_model=schemas.ValuationResponse)
+def valuation(request: schemas.ValuationRequest, db: Session = Depends(get_db)):
+    """
+    Wycena pojazdu.
+
+    Model trenowany jest na ofertach zgodnych z training_filters (domyślnie:
+    ta sama marka i model) i trafia do cache - kolejna wycena z tymi samymi
+    filtrami i konfiguracją nie trenuje modelu od nowa, dopóki import nie
+    zmieni danych.
+    """
+    return valuation_engine.valuate(request, db)
+
+
+def _check_batch_size(n_vehicles: int) -> None:
+    if n_vehicles > valuation_engine.MAX_BATCH_SIZE:
+        raise exceptions.ValidationError(
+            f"Zbyt wiele pojazdów ({n_vehicles:,}). Maksymalnie {valuation_engine.MAX_BATCH_SIZE:,} w jednym żądaniu.",
+            field="vehicles"
         )
-    
-    # Filtruj tylko kompletne rekordy
-    stmt = stmt.where(
-        Listing.price_pln.isnot(None),
-        Listing.mileage_km.isnot(None),
-        Listing.production_year.isnot(None),
-        Listing.displacement_cm3.isnot(None),
+
+
+@app.post("/valuation/batch", response_model=schemas.ValuationBatchResponse)
+def valuation_batch(
+    request: schemas.ValuationBatchRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Wycena wielu pojazdów w jednym żądaniu (np. lista aut dealera).
+    Jeden model na segment treningowy (domyślnie marka + model), jedna predykcja na segment.
+    """
+    _check_batch_size(len(request.vehicles))
+    results, segments = valuation_engine.valuate_batch(request.vehicles, db)
+    return schemas.ValuationBatchResponse(
+        n_vehicles=len(results),
+        n_failed=sum(1 for r in results if r["error"]),
+        results=results,
+        segments=segments,
     )
+
+
+@app.post("/valuation/batch/csv")
+def valuation_batch_csv(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Wycena wsadowa z pliku CSV (kolumny: brand, model, generation, year, mileage_km,
+    fuel_type, transmission, engine_capacity_cm3). Zwraca ten sam plik z kolumnami
+    predicted_price i error. Modele trenowane są z domyślną konfiguracją.
+    """
+    import pandas as pd
+    from fastapi.responses import Response
     
-    df = pd.read_sql(stmt, db.bind)
-    
-    # Przekształć do formatu modelu
-    if not df.empty:
-        df = df.rename(columns={
-            "vehicle_brand": "brand",
-            "vehicle_model": "model",
-            "vehicle_generation": "generation",
-            "production_year": "year",
-            "displacement_cm3": "engine_capacity_cm3",
-        })
-        df["generation"] = df["generation"].fillna("Unknown")
-        
-        # Podstawowe sanity-checki
-        df = df[(df["year"] >= 1990) & (df["year"] <= 2025)]
-        df = df[(df["mileage_km"] >= 0) & (df["mileage_km"] <= 800_000)]
-        df = df[(df["engine_capacity_cm3"] >= 500) & (df["engine_capacity_cm3"] <= 8000)]
-        df = df[(df["price_pln"] >= 1000) & (df["price_pln"] <= 1_000_000)]
-    
-    return df
-
-
-def train_custom_model(
-    df: pd.DataFrame,
-    model_type: str,
-    features_numeric: List[str],
-    features_categorical: List[str],
-    alpha: Optional[float] = None,
-    n_estimators: Optional[int] = None,
-    max_depth: Optional[int] = None,
-    min_samples_split: Optional[int] = None,
-    min_samples_leaf: Optional[int] = None,
-    test_size: float = 0.2,
-    random_state: int = 42,
-) -> tuple:
-    """Trenuje model z podanymi parametrami i zwraca (model, metrics)."""
-    from sklearn.linear_model import LinearRegression, Ridge, Lasso
-    from sklearn.ensemble import RandomForestRegressor
-    from sklearn.compose import ColumnTransformer
-    from sklearn.pipeline import Pipeline
-    from sklearn.preprocessing import StandardScaler, OneHotEncoder
-    from sklearn.model_selection import train_test_split
-    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-    import numpy as np
-    
-    if df.empty or len(df) < 10:
-        raise ValueError("Za mało danych do treningu modelu (minimum 10 rekordów)")
-    
-    target_col = "price_pln"
-    available_features = features_numeric + features_categorical
-    
-    missing_features = [f for f in available_features if f not in df.columns]
-    if missing_features:
-        raise ValueError(f"Brakujące cechy w danych: {missing_features}")
-    
-    required_cols = available_features + [target_col]
-    df_clean = df[required_cols].dropna()
-    
-    if len(df_clean) < 10:
-        raise ValueError("Za mało danych po usunięciu brakujących wartości")
-    
-    X = df_clean[available_features]
-    y = df_clean[target_col]
-    
-    numeric_transformer = Pipeline([
-        ("scaler", StandardScaler()),
-    ])
-    
-    categorical_transformer = Pipeline([
-        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False)),
-    ])
-    
-    preprocessor = ColumnTransformer([
-        ("num", numeric_transformer, [f for f in features_numeric if f in X.columns]),
-        ("cat", categorical_transformer, [f for f in features_categorical if f in X.columns]),
-    ])
-    if model_type == "linear":
-        regressor = LinearRegression()
-    elif model_type == "ridge":
-        regressor = Ridge(alpha=alpha or 1.0, random_state=random_state)
-    elif model_type == "lasso":
-        regressor = Lasso(alpha=alpha or 1.0, random_state=random_state, max_iter=10000)
-    elif model_type == "random_forest":
-        regressor = RandomForestRegressor(
-            n_estimators=n_estimators or 200,
-            max_depth=max_depth,
-            min_samples_split=min_samples_split or 2,
-            min_samples_leaf=min_samples_leaf or 1,
-            random_state=random_state,
-            n_jobs=-1,
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be a CSV file"
         )
-    else:
-        raise ValueError(f"Nieznany typ modelu: {model_type}")
+    try:
+        df = pd.read_csv(file.file)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise exceptions.ValidationError(f"Nie można odczytać pliku CSV: {e}", field="file")
+    _check_batch_size(len(df))
     
-    model = Pipeline([
-        ("preprocess", preprocessor),
-        ("regressor", regressor),
-    ])
+    requests, row_errors = valuation_engine.requests_from_frame(df)
+    results, _ = valuation_engine.valuate_batch(requests, db)
     
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y,
-        test_size=test_size,
-        random_state=random_state
+    df["predicted_price"] = [
+        round(r["predicted_price"], 2) if r["predicted_price"] is not None else None for r in results
+    ]
+    df["error"] = [row_error or r["error"] for row_error, r in zip(row_errors, results)]
+    filename = Path(file.filename).name.replace('"', "")
+    return Response(
+        content=df.to_csv(index=False),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="wycena_{filename}"'},
     )
-    
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
-    r2 = float(r2_score(y_test, y_pred))
-    rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
-    mae = float(mean_absolute_error(y_test, y_pred))
-    
-    metrics = {
-        "r2": r2,
-        "rmse": rmse,
-        "mae": mae,
-        "n_samples": int(len(df_clean)),
-        "test_size": test_size,
-        "features_numeric": features_numeric,
-        "features_categorical": features_categorical,
-        "target": target_col,
-    }
-    
-    return model, metrics
 
 
-@app.post("/valuation", response_model=schemas.ValuationResponse)
-def valuation(request: schemas.ValuationRequest, db: Session = Depends(get_db)):
-    """Wycena pojazdu."""
-    vehicle_data = pd.DataFrame([
-        {
-            "brand": request.brand,
-            "model": request.model,
-            "generation": request.generation if request.generation else "Unknown",
-            "year": request.year,
-            "mileage_km": request.mileage_km,
-            "fuel_type": request.fuel_type,
-            "transmission": request.transmission,
-            "engine_capacity_cm3": request.engine_capacity_cm3,
-        }
-    ])
-    
-    
-    # Ustaw domyślną konfigurację jeśli nie podano
-    if request.valuation_model_config is None:
-        model_config_obj = schemas.ValuationModelConfig(model_type="random_forest")
-    else:
-        model_config_obj = request.valuation_model_config
-    
-        try:
-            if not request.training_filters or not request.training_filters.brand:
-                raise exceptions.ValidationError(
-                    "Niestandardowy model wymaga podania marki pojazdu. Marka jest automatycznie ustawiana na podstawie wycenianego pojazdu.",
-                    field="training_filters.brand"
-                )
-            
-            df = load_training_data(request.training_filters, db)
-            
-            if df.empty:
-                raise exceptions.NotFoundError(
-                    "Dane do treningu modelu",
-                    resource_id="zgodnie z podanymi filtrami"
-                )
-            
-            if len(df) > 50000:
-                raise exceptions.ValidationError(
-                    f"Zbyt duży zbiór danych ({len(df):,} rekordów). Ogranicz filtry do konkretnego modelu lub dodaj więcej filtrów (maksymalnie 50,000 rekordów).",
-                    field="training_filters"
-                )
-            
-            features_numeric = model_config_obj.features_numeric or ["year", "mileage_km", "engine_capacity_cm3"]
-            features_categorical = model_config_obj.features_categorical or ["brand", "model", "generation", "fuel_type", "transmission"]
-            model, metrics_dict = train_custom_model(
-                df=df,
-                model_type=model_config_obj.model_type,
-                features_numeric=features_numeric,
-                features_categorical=features_categorical,
-                alpha=model_config_obj.alpha,
-                n_estimators=model_config_obj.n_estimators,
-                max_depth=model_config_obj.max_depth,
-                min_samples_split=model_config_obj.min_samples_split,
-                min_samples_leaf=model_config_obj.min_samples_leaf,
-                test_size=model_config_obj.test_size or 0.2,
-                random_state=model_config_obj.random_state or 42,
-            )
-            
-            # Wykonaj wycenę
-            pred = float(model.predict(vehicle_data)[0])
-            metrics = schemas.ValuationModelMetrics(**metrics_dict)
-            
-        except ValueError as e:
-            raise exceptions.ValidationError(str(e))
-        except Exception as e:
-            logger.error(f"Błąd podczas treningu modelu: {e}", exc_info=True)
-            raise exceptions.ModelTrainingError(f"Błąd podczas treningu modelu: {str(e)}")
+@app.post("/valuation/jobs", response_model=schemas.ValuationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_valuation_job(
+    request: schemas.ValuationRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Zleca wycenę w tle (trening modelu w puli procesów, nie w wątku żądania).
+    Zwraca ID zadania, pozycję w kolejce i szacowany czas; wynik: GET /valuation/jobs/{id}.
+    Wycena z modelu obecnego w cache jest zwracana od razu jako zakończone zadanie.
+    """
+    cached = valuation_engine.cached_valuation(request, db)
+    if cached is not None:
+        return valuation_jobs.job_queue.add_completed(current_user.id, cached)
 
-    return schemas.ValuationResponse(
-        predicted_price=pred,
-        model_metrics=metrics,
+    bind = db.get_bind()
+    job, deduplicated = valuation_jobs.job_queue.submit(
+        request,
+        user_id=current_user.id,
+        database_url=bind.url.render_as_string(hide_password=False),
+        data_version=get_data_version(bind),
     )
+    return {**job, "deduplicated": deduplicated}
+
+
+@app.get("/valuation/jobs/{job_id}", response_model=schemas.ValuationJobResponse)
+def get_valuation_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Status zadania wyceny (pozycja w kolejce, ETA, wynik lub błąd)."""
+    job = valuation_jobs.job_queue.get(job_id, current_user.id)
+    if job is None:
+        raise exceptions.NotFoundError("Zadanie wyceny", resource_id=job_id)
+    return job
 
 
 @app.post("/compare/vehicles", response_model=schemas.VehicleComparisonResponse)
@@ -766,12 +779,35 @@ def compare_vehicles(
     vehicle_b_dict = request.vehicle_b.model_dump(exclude_none=True)
     
     comparison_data = crud.get_vehicle_comparison(
-        db, vehicle_a_dict, vehicle_b_dict
+        db, vehicle_a_dict, vehicle_b_dict,
+        price_mileage_mode=request.price_mileage_mode,
+        price_mileage_target=request.price_mileage_target,
     )
     
     return schemas.VehicleComparisonResponse(**comparison_data)
 
 
+DOWNSAMPLING_MODE_DESCRIPTION = (
+    "none (pierwsze limit punktów) | sample | stratified | lttb (punkty) | grid | hexbin (mapa gęstości)"
+)
+
+
+def check_downsampling_mode(mode: str) -> None:
+    if mode not in downsampling.DOWNSAMPLING_MODES:
+        raise exceptions.ValidationError(
+            f"Nieznany tryb: {mode}. Dostępne: {', '.join(downsampling.DOWNSAMPLING_MODES)}",
+            field="mode",
+        )
+
+
+POINTS_SHAPE_DESCRIPTION = "rows - lista punktów | columns - {price_pln: [...], mileage_km: [...]}"
+
+
+def check_points_shape(shape: str) -> None:
+    if shape not in ("rows", "columns"):
+        raise exceptions.ValidationError(f"Nieobsługiwany układ: {shape}. Dostępne: rows, columns", field="shape")
+
+
 @app.get("/analytics/price-mileage", response_model=schemas.PriceMileageResponse)
 def get_price_mileage(
     brand: Optional[str] = None,
@@ -786,14 +822,24 @@ def get_price_mileage(
     displacement_max: Optional[float] = None,
     fuel_type: Optional[str] = None,
     limit: int = Query(100000, ge=1, le=200000),  # Zwiększony limit dla pełnych danych
+    mode: str = Query("none", description=DOWNSAMPLING_MODE_DESCRIPTION),
+    target: int = Query(5000, ge=10, le=50000, description="Docelowa liczba punktów (sample, stratified, lttb)"),
+    bins: int = Query(50, ge=5, le=500, description="Liczba komórek siatki na oś (grid, hexbin, stratified)"),
+    shape: str = Query("rows", description=POINTS_SHAPE_DESCRIPTION),
     db: Session = Depends(get_db),
 ):
     """
     Zwraca dane do wykresu scatter: cena vs przebieg.
     date_from i date_to w formacie DD.MM.YYYY.
+    mode pozwala zredukować punkty po stronie serwera (próbka, LTTB albo mapa gęstości);
+    total to zawsze liczba wszystkich punktów spełniających filtry.
+    shape=columns zwraca punkty (i komórki) jako kolumny - mniejsza odpowiedź.
     """
-    points_raw = crud.get_price_mileage_data(
-        db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type, limit
+    check_downsampling_mode(mode)
+    check_points_shape(shape)
+    sample = crud.get_price_mileage_downsampled(
+        db, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type,
+        mode=mode, target=target, bins=bins, limit=limit, columnar=shape == "columns",
     )
 
     filters = {
@@ -809,10 +855,16 @@ def get_price_mileage(
         "displacement_max": displacement_max,
     }
 
-    return schemas.PriceMileageResponse(
-        filters=filters,
-        points=[schemas.PriceMileagePoint(**p) for p in points_raw],
-    )
+    # Punkty z crud są już typowane (float z NumPy) - bez modeli Pydantic dla każdego punktu
+    return ORJSONResponse({
+        "filters": filters,
+        "points": sample["points"],
+        "mode": mode,
+        "shape": shape,
+        "total": sample["total"],
+        "cells": sample["cells"],
+        "cell_size": sample["cell_size"],
+    })
 
 
 @app.get("/analytics/price-stats-by-category", response_model=schemas.PriceStatsByCategoryResponse)
@@ -858,6 +910,97 @@ def get_price_stats_by_category(
     )
 
 
+@app.get("/analytics/dashboard", response_model=schemas.DashboardResponse)
+def get_analytics_dashboard(
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    generation: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    mileage_max: Optional[float] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    displacement_min: Optional[float] = None,
+    displacement_max: Optional[float] = None,
+    fuel_type: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None,
+        description="Panele oddzielone przecinkami: analysis, price_statistics, trend, by_category, price_mileage (domyślnie wszystkie)",
+    ),
+    limit: int = Query(100000, ge=1, le=200000, description="Maks. liczba punktów panelu price_mileage"),
+    mode: str = Query("none", description=DOWNSAMPLING_MODE_DESCRIPTION),
+    target: int = Query(5000, ge=10, le=50000, description="Docelowa liczba punktów (sample, stratified, lttb)"),
+    bins: int = Query(50, ge=5, le=500, description="Liczba komórek siatki na oś (grid, hexbin, stratified)"),
+    shape: str = Query("rows", description=POINTS_SHAPE_DESCRIPTION),
+    db: Session = Depends(get_db),
+):
+    """
+    Zwraca wszystkie panele zakładki analiz (statystyki, trend, kategorie,
+    punkty cena/przebieg) policzone z jednego wyboru przefiltrowanych ofert.
+    date_from i date_to w formacie DD.MM.YYYY.
+    shape=columns zwraca punkty (i komórki) panelu price_mileage jako kolumny.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(crud.DASHBOARD_FIELDS)
+    unknown = [f for f in selected if f not in crud.DASHBOARD_FIELDS]
+    if unknown:
+        raise exceptions.ValidationError(
+            f"Nieznane panele: {', '.join(unknown)}. Dostępne: {', '.join(crud.DASHBOARD_FIELDS)}",
+            field="fields",
+        )
+
+    check_downsampling_mode(mode)
+    check_points_shape(shape)
+
+    panels = crud.get_dashboard(
+        db, selected, brand, model, generation, year_min, year_max, mileage_max, date_from, date_to, displacement_min, displacement_max, fuel_type,
+        price_mileage_limit=limit,
+        price_mileage_mode=mode,
+        price_mileage_target=target,
+        price_mileage_bins=bins,
+        price_mileage_columnar=shape == "columns",
+    )
+
+    filters = {
+        "brand": brand,
+        "model": model,
+        "generation": generation,
+        "year_min": year_min,
+        "year_max": year_max,
+        "mileage_max": mileage_max,
+        "date_from": date_from,
+        "date_to": date_to,
+        "displacement_min": displacement_min,
+        "displacement_max": displacement_max,
+        "fuel_type": fuel_type,
+    }
+
+    # Panele z crud są już typowane - bez modeli Pydantic (do 100k punktów price_mileage)
+    response = {field: None for field in schemas.DashboardResponse.model_fields}
+    response.update(filters=filters, fields=selected)
+    if "analysis" in panels:
+        n_offers, avg_price, min_price, max_price = panels["analysis"]
+        response["analysis"] = {
+            "n_offers": n_offers, "avg_price": avg_price, "min_price": min_price, "max_price": max_price,
+        }
+    if "price_statistics" in panels:
+        response["price_statistics"] = panels["price_statistics"]
+    if "trend" in panels:
+        response["trend"] = panels["trend"]
+    if "by_category" in panels:
+        response["by_fuel_type"], response["by_transmission"] = panels["by_category"]
+    if "price_mileage" in panels:
+        sample = panels["price_mileage"]
+        response.update(
+            price_mileage=sample["points"],
+            price_mileage_mode=sample["mode"],
+            price_mileage_shape=shape,
+            price_mileage_total=sample["total"],
+            price_mileage_cells=sample["cells"],
+            price_mileage_cell_size=sample["cell_size"],
+        )
+    return ORJSONResponse(response)
+
+
 # ================== ADMIN ENDPOINTS - AKTUALIZACJA BAZY ==================
 
 # Uproszczone: używamy tylko pliku JSON do zarządzania stanem
@@ -871,7 +1014,12 @@ def update_task():
     update_task_with_step("scraping")
 
 
-def update_task_with_step(start_step: str, steps_to_run: Optional[List[str]] = None):
+def update_task_with_step(
+    start_step: str,
+    steps_to_run: Optional[List[str]] = None,
+    resume: bool = False,
+    pretrain_models: bool = False,
+):
     """Wrapper dla update_task z parametrem start_step."""
     # Sprawdź status z pliku (jeden źródło prawdy)
     current_status = load_status()
@@ -880,7 +1028,12 @@ def update_task_with_step(start_step: str, steps_to_run: Optional[List[str]] = N
         return
     
     try:
-        results = run_full_update(start_step=start_step, steps_to_run=steps_to_run)
+        results = run_full_update(
+            start_step=start_step,
+            steps_to_run=steps_to_run,
+            resume=resume,
+            pretrain_models=pretrain_models,
+        )
         logger.info(f"Update completed: {results['status']}")
     except Exception as e:
         logger.error(f"Update failed: {e}")
@@ -909,19 +1062,28 @@ def trigger_full_update(
     start_step = request.start_step or "scraping"
     steps_to_run = request.steps_to_run
     
-    thread = threading.Thread(target=lambda: update_task_with_step(start_step, steps_to_run), daemon=True)
+    resume = request.resume
+    pretrain_models = request.pretrain_models
+    
+    thread = threading.Thread(
+        target=lambda: update_task_with_step(start_step, steps_to_run, resume, pretrain_models),
+        daemon=True,
+    )
     thread.start()
     
     step_names = {
         "scraping": "Scrapowanie",
         "processing": "Przetwarzanie danych",
         "database_update": "Aktualizacja bazy danych",
+        "model_pretraining": "Pretrening modeli wyceny",
     }
     
     return {
         "message": f"Aktualizacja uruchomiona od etapu: {step_names.get(start_step, start_step)}",
         "status": "processing",
         "start_step": start_step,
+        "resume": resume,
+        "pretrain_models": pretrain_models,
         "estimated_duration": "zależy od wybranego etapu",
         "note": "Use /admin/database/update-status to check progress"
     }
@@ -1057,6 +1219,7 @@ def import_csv_endpoint(
     Wymaga uprawnień administratora.
     """
     import tempfile
+    import shutil
     
     # Sprawdź czy plik to CSV
     if not file.filename.endswith('.csv'):
@@ -1071,38 +1234,62 @@ def import_csv_endpoint(
         # Utwórz plik tymczasowy
         with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
             tmp_path = Path(tmp_file.name)
-            # Zapisz zawartość pliku
-            content = file.file.read()
-            tmp_path.write_bytes(content)
-        
-        # Zamknij plik przed importem (ważne w Windows)
-        # Importuj do bazy
-        stats = import_csv_to_database(tmp_path)
+            # Zapisz zawartość pliku kawałkami (bez wczytywania całego uploadu do RAM)
+            shutil.copyfileobj(file.file, tmp_file, UPLOAD_COPY_CHUNK_BYTES)
         
-        # Zapisz do historii
+        # Rekord w historii zakładamy przed importem - postęp każdego kawałka
+        # zapisywany jest w statusie (import_progress)
         from datetime import datetime
         import uuid
-        from app.scraper_integration import save_status
+        from app.scraper_integration import save_status, import_progress_callback
         
         history_record = {
             "id": str(uuid.uuid4()),
-            "status": "completed",
-            "current_step": None,
-            "progress_percent": 100,
+            "status": "running",
+            "current_step": "database_update",
+            "progress_percent": 0,
             "started_at": datetime.utcnow().isoformat(),
-            "completed_at": datetime.utcnow().isoformat(),
+            "completed_at": None,
             "error_message": None,
-            "steps_completed": ["database_update"],
+            "steps_completed": [],
             "steps_failed": [],
             "steps_to_run": ["database_update"],
             "start_step": "database_update",
-            "n_offers_scraped": stats.get("total_processed", 0),
+            "n_offers_scraped": 0,
             "import_type": "csv_upload",
             "import_filename": file.filename,
-            "import_stats": stats
         }
         save_status(history_record)
         
+        # Zamknij plik przed importem (ważne w Windows)
+        # Importuj do bazy
+        try:
+            stats = import_csv_to_database(
+                tmp_path,
+                progress_callback=import_progress_callback(history_record, tmp_path, 0, 99),
+            )
+        except Exception as e:
+            history_record.update({
+                "status": "failed",
+                "completed_at": datetime.utcnow().isoformat(),
+                "error_message": str(e)[:500],
+                "steps_failed": ["database_update"],
+            })
+            save_status(history_record)
+            raise
+        
+        # Zapisz do historii
+        history_record.update({
+            "status": "completed",
+            "current_step": None,
+            "progress_percent": 100,
+            "completed_at": datetime.utcnow().isoformat(),
+            "steps_completed": ["database_update"],
+            "n_offers_scraped": stats.get("total_processed", 0),
+            "import_stats": stats,
+        })
+        save_status(history_record)
+        
         return {
             "message": "CSV imported successfully",
             "stats": stats
@@ -1231,6 +1418,61 @@ def delete_listing(
     return {"message": "Listing deleted successfully"}
 
 
+# === Admin - Cache modeli wyceny ===
+
+@app.get("/admin/valuation/cache")
+def get_valuation_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Statystyki cache modeli wyceny (liczba modeli, rozmiar, trafienia/chybienia).
+    Wymaga uprawnień administratora.
+    """
+    return {
+        **valuation_engine.model_cache.stats(),
+        "jobs": valuation_jobs.job_queue.stats(),
+    }
+
+
+@app.delete("/admin/valuation/cache")
+def clear_valuation_cache(
+    remove_files: bool = Query(False, description="Usuń także modele zapisane na dysku"),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Czyści cache modeli wyceny.
+    Wymaga uprawnień administratora.
+    """
+    valuation_engine.model_cache.clear(remove_files=remove_files)
+    return {"message": "Valuation model cache cleared"}
+
+
+@app.get("/admin/analytics/snapshot")
+def get_analytics_snapshot_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Stan kolumnowego snapshotu ofert używanego przez analityki (wersja danych, wiersze, pamięć).
+    Wymaga uprawnień administratora.
+    """
+    return columnar.snapshot_store.stats()
+
+
+@app.get("/admin/analytics/cache")
+def get_response_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Statystyki cache odpowiedzi analityk (wpisy, rozmiar, hit ratio, odpowiedzi 304).
+    Wymaga uprawnień administratora.
+    """
+    return {**response_cache.stats(), "enabled": RESPONSE_CACHE_ENABLED}
+
+
+@app.delete("/admin/analytics/cache")
+def clear_response_cache(current_user: User = Depends(get_current_admin_user)):
+    """
+    Czyści cache odpowiedzi analityk.
+    Wymaga uprawnień administratora.
+    """
+    response_cache.clear()
+    return {"message": "Response cache cleared"}
+
+
 # === Admin - Konfiguracja scrapera ===
 
 def get_default_scraper_config() -> dict:
@@ -1238,10 +1480,11 @@ def get_default_scraper_config() -> dict:
     return {
         "max_workers": 2,
         "request_timeout": 15,
-        "delay_between_offers_min": 0.8,  # Bezpieczne ustawienie domyślne
-        "delay_between_offers_max": 1.5,  # Bezpieczne ustawienie domyślne
-        "delay_between_pages_min": 1.5,    # Bezpieczne ustawienie domyślne
-        "delay_between_pages_max": 3.0,    # Bezpieczne ustawienie domyślne
+        "max_concurrency": 8,
+        "requests_per_second": 2.0,  # Limit tempa per host - zastępuje stałe opóźnienia
+        "rate_limit_burst": 4,
+        "incremental": False,
+        "stop_after_known_offers": 50,
         "max_offers_per_brand": None,
         "brands_to_scrape": [
             "abarth", "alfa-romeo", "audi", "bmw", "chevrolet", "citroen",
@@ -1368,15 +1611,10 @@ def get_scraper_config_stats(
         }
         total_offers_to_scrape += brand_count_to_scrape
     
-    delay_between_offers_min = config.get("delay_between_offers_min", 0.8)
-    delay_between_offers_max = config.get("delay_between_offers_max", 1.5)
-    delay_between_pages_min = config.get("delay_between_pages_min", 1.5)
-    delay_between_pages_max = config.get("delay_between_pages_max", 3.0)
     max_workers = config.get("max_workers", 2)
+    requests_per_second = config.get("requests_per_second", 2.0)
     
-    avg_delay_between_offers = (delay_between_offers_min + delay_between_offers_max) / 2
     offers_per_page = 25
-    avg_delay_between_pages = (delay_between_pages_min + delay_between_pages_max) / 2
     total_pages = 0
     for brand in brands:
         brand_offers = brand_stats[brand]["to_scrape"]
@@ -1384,15 +1622,10 @@ def get_scraper_config_stats(
             brand_pages = (brand_offers + offers_per_page - 1) // offers_per_page  # Zaokrąglenie w górę
             total_pages += brand_pages
     
-    # Szacunkowy czas: (czas na oferty) + (czas na przejście między stronami)
-    # Uwzględniamy równoległość (max_workers)
-    time_per_offer = avg_delay_between_offers / max_workers  # Równoległe wątki
-    time_for_offers = total_offers_to_scrape * time_per_offer
-    
-    time_per_page = avg_delay_between_pages / max_workers  # Równoległe wątki
-    time_for_pages = total_pages * time_per_page
-    
-    total_time_seconds = time_for_offers + time_for_pages
+    # Szacunkowy czas: wszystkie marki dzielą jeden host, więc tempo ogranicza
+    # limiter token-bucket (requests_per_second), a nie liczba wątków
+    total_requests = total_offers_to_scrape + total_pages
+    total_time_seconds = total_requests / requests_per_second
     estimated_hours = total_time_seconds / 3600
     
     return {
@@ -1407,6 +1640,7 @@ def get_scraper_config_stats(
             "date_from": date_from,
             "date_to": date_to,
             "max_workers": max_workers,
+            "requests_per_second": requests_per_second,
             "max_offers_per_brand": max_offers_per_brand
         }
     }
@@ -1440,6 +1674,38 @@ def get_scraper_logs(
 
 # ================== ZAPISANE WYCENY I PORÓWNANIA ==================
 
+# Pola przedziału ceny przechowywane razem z metrykami w SavedValuation.model_metrics (JSON)
+PRICE_RANGE_FIELDS = ("price_p10", "price_p90", "interval_method")
+
+
+def saved_valuation_response(v: SavedValuation) -> schemas.SavedValuationResponse:
+    """Zapisana wycena -> odpowiedź API (metryki i przedział ceny z kolumny JSON)."""
+    if v.model_metrics:
+        metrics_data = json.loads(v.model_metrics)
+        metrics = schemas.ValuationModelMetrics(**metrics_data)
+    else:
+        metrics_data = {}
+        metrics = schemas.ValuationModelMetrics(
+            r2=0, rmse=0, mae=0, n_samples=0, test_size=0, features_numeric=[], features_categorical=[], target=""
+        )
+    return schemas.SavedValuationResponse(
+        id=v.id,
+        title=v.title,
+        brand=v.brand,
+        model=v.model,
+        generation=v.generation,
+        year=v.year,
+        mileage_km=v.mileage_km,
+        fuel_type=v.fuel_type,
+        transmission=v.transmission,
+        engine_capacity_cm3=v.engine_capacity_cm3,
+        predicted_price=v.predicted_price,
+        **{field: metrics_data.get(field) for field in PRICE_RANGE_FIELDS},
+        model_metrics=metrics,
+        created_at=v.created_at.isoformat()
+    )
+
+
 @app.post("/saved/valuations", response_model=schemas.SavedValuationResponse)
 def save_valuation(
     valuation: schemas.SaveValuationRequest,
@@ -1459,27 +1725,16 @@ def save_valuation(
         transmission=valuation.transmission,
         engine_capacity_cm3=valuation.engine_capacity_cm3,
         predicted_price=valuation.predicted_price,
-        model_metrics=json.dumps(valuation.model_metrics.dict())
+        model_metrics=json.dumps({
+            **valuation.model_metrics.model_dump(),
+            **{field: getattr(valuation, field) for field in PRICE_RANGE_FIELDS},
+        })
     )
     db.add(saved)
     db.commit()
     db.refresh(saved)
     
-    return schemas.SavedValuationResponse(
-        id=saved.id,
-        title=saved.title,
-        brand=saved.brand,
-        model=saved.model,
-        generation=saved.generation,
-        year=saved.year,
-        mileage_km=saved.mileage_km,
-        fuel_type=saved.fuel_type,
-        transmission=saved.transmission,
-        engine_capacity_cm3=saved.engine_capacity_cm3,
-        predicted_price=saved.predicted_price,
-        model_metrics=schemas.ValuationModelMetrics(**json.loads(saved.model_metrics)),
-        created_at=saved.created_at.isoformat()
-    )
+    return saved_valuation_response(saved)
 
 
 @app.get("/saved/valuations", response_model=List[schemas.SavedValuationResponse])
@@ -1492,26 +1747,7 @@ def get_saved_valuations(
         SavedValuation.user_id == current_user.id
     ).order_by(SavedValuation.created_at.desc()).all()
     
-    return [
-        schemas.SavedValuationResponse(
-            id=v.id,
-            title=v.title,
-            brand=v.brand,
-            model=v.model,
-            generation=v.generation,
-            year=v.year,
-            mileage_km=v.mileage_km,
-            fuel_type=v.fuel_type,
-            transmission=v.transmission,
-            engine_capacity_cm3=v.engine_capacity_cm3,
-            predicted_price=v.predicted_price,
-            model_metrics=schemas.ValuationModelMetrics(**json.loads(v.model_metrics)) if v.model_metrics else schemas.ValuationModelMetrics(
-                r2=0, rmse=0, mae=0, n_samples=0, test_size=0, features_numeric=[], features_categorical=[], target=""
-            ),
-            created_at=v.created_at.isoformat()
-        )
-        for v in valuations
-    ]
+    return [saved_valuation_response(v) for v in valuations]
 
 
 @app.delete("/saved/valuations/{valuation_id}")
@@ -0,0 +1,111 @@
+"""
+Proste migracje schematu bazy SQLite.
+
+Base.metadata.create_all() tworzy tylko brakujące tabele - nie dodaje kolumn
+ani indeksów do istniejących tabel. Te funkcje uzupełniają schemat istniejącej
+bazy (autotrade.sqlite) i są bezpieczne do wielokrotnego uruchamiania.
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .models import Listing, publication_date_to_iso
+
+logger = logging.getLogger(__name__)
+
+
+def _column_names(engine: Engine, table: str) -> set:
+    return {col["name"] for col in inspect(engine).get_columns(table)}
+
+
+def migrate_publication_date_iso(engine: Engine) -> int:
+    """
+    Dodaje kolumnę listings.offer_publication_date_iso (YYYY-MM-DD) z indeksem
+    i uzupełnia ją dla istniejących rekordów na podstawie offer_publication_date (DD.MM.YYYY).
+
+    Returns:
+        Liczba uzupełnionych rekordów
+    """
+    if not inspect(engine).has_table("listings"):
+        return 0
+
+    with engine.begin() as conn:
+        if "offer_publication_date_iso" not in _column_names(engine, "listings"):
+            logger.info("Adding column listings.offer_publication_date_iso")
+            conn.execute(text("ALTER TABLE listings ADD COLUMN offer_publication_date_iso VARCHAR(10)"))
+
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_listings_offer_publication_date_iso "
+            "ON listings (offer_publication_date_iso)"
+        ))
+
+        # Backfill: DD.MM.YYYY -> YYYY-MM-DD tą samą funkcją co walidator modelu
+        # (strptime - akceptuje też 5.1.2024 i odrzuca nieistniejące daty).
+        # Konwertujemy tylko unikalne wartości.
+        pending = conn.execute(text(
+            "SELECT DISTINCT offer_publication_date FROM listings "
+            "WHERE offer_publication_date_iso IS NULL AND offer_publication_date IS NOT NULL"
+        )).scalars().all()
+        params = [
+            {"raw": raw, "iso": iso}
+            for raw, iso in ((raw, publication_date_to_iso(raw)) for raw in pending)
+            if iso is not None
+        ]
+        backfilled = 0
+        if params:
+            result = conn.execute(text(
+                "UPDATE listings SET offer_publication_date_iso = :iso "
+                "WHERE offer_publication_date = :raw AND offer_publication_date_iso IS NULL"
+            ), params)
+            backfilled = result.rowcount or 0
+
+    if backfilled:
+        logger.info(f"Backfilled offer_publication_date_iso for {backfilled} listings")
+    return backfilled
+
+
+# Pojedyncze indeksy zastąpione indeksami złożonymi z Listing.__table_args__
+# (są ich prefiksem, więc tylko spowalniały zapis)
+OBSOLETE_LISTING_INDEXES = (
+    "ix_listings_vehicle_brand",
+    "ix_listings_production_year",
+    "ix_listings_fuel_type",
+)
+
+
+def migrate_listing_indexes(engine: Engine) -> list:
+    """
+    Doprowadza indeksy tabeli listings do zestawu z modelu: tworzy brakujące
+    (w tym indeksy złożone) i usuwa zastąpione. Po utworzeniu indeksów
+    odświeża statystyki planera (ANALYZE).
+
+    Returns:
+        Nazwy utworzonych indeksów
+    """
+    if not inspect(engine).has_table("listings"):
+        return []
+
+    existing = {index["name"] for index in inspect(engine).get_indexes("listings")}
+    columns = _column_names(engine, "listings")
+    created = []
+    with engine.begin() as conn:
+        for index in Listing.__table__.indexes:
+            if index.name not in existing and {c.name for c in index.columns} <= columns:
+                logger.info(f"Creating index {index.name}")
+                index.create(conn)
+                created.append(index.name)
+        for name in OBSOLETE_LISTING_INDEXES:
+            if name in existing:
+                logger.info(f"Dropping index {name}")
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        if created:
+            conn.execute(text("ANALYZE listings"))
+    return created
+
+
+def run_migrations(engine: Engine) -> None:
+    """Uruchamia wszystkie migracje schematu (idempotentne)."""
+    migrate_publication_date_iso(engine)
+    migrate_listing_indexes(engine)
@@ -0,0 +1,244 @@
+"""
+Cache wytrenowanych modeli wyceny.
+
+Wpis identyfikuje para (klucz modelu, wersja danych): klucz to skrót
+znormalizowanych filtrów treningu i konfiguracji modelu, a wersja danych
+(app.data_version) zmienia się przy każdym imporcie - model wytrenowany na
+starych danych nigdy nie zostanie zwrócony.
+
+- pamięć: LRU ograniczone liczbą wpisów i łącznym rozmiarem (bajty po serializacji),
+- dysk (opcjonalnie): pliki joblib w katalogu persist_dir, przetrwają restart
+  i są współdzielone z modelami trenowanymi wcześniej (pretrening segmentów),
+- ten sam model trenowany jest tylko raz, nawet gdy równolegle przyjdzie
+  wiele identycznych wycen (pozostałe czekają na wynik pierwszej),
+- statystyki trafień (hits / disk_hits / misses) dla panelu admina.
+"""
+
+import io
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE_SUFFIX = ".joblib"
+
+
+def _model_size_bytes(entry: Dict) -> int:
+    """Rozmiar wpisu po serializacji (przybliżenie zajętej pamięci)."""
+    buffer = io.BytesIO()
+    pickle.dump(entry, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    return buffer.tell()
+
+
+class ModelCache:
+    """
+    Cache modeli: {"model", "metrics", "data_version", "created_at"}.
+
+    Args:
+        max_entries: maksymalna liczba modeli w pamięci
+        max_bytes: maksymalny łączny rozmiar modeli w pamięci
+        persist_dir: katalog na pliki modeli (None = bez zapisu na dysk)
+        max_disk_entries: maksymalna liczba plików w persist_dir (najstarsze są usuwane)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 32,
+        max_bytes: int = 512 * 1024 * 1024,
+        persist_dir: Optional[Path] = None,
+        max_disk_entries: int = 256,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # ---- pliki ----
+
+    def _path(self, key: str, data_version: str) -> Optional[Path]:
+        if self.persist_dir is None:
+            return None
+        return self.persist_dir / f"{data_version}__{key}{MODEL_FILE_SUFFIX}"
+
+    def _load_from_disk(self, key: str, data_version: str) -> Optional[Dict]:
+        path = self._path(key, data_version)
+        if path is None or not path.exists():
+            return None
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            logger.warning(f"Could not load cached model {path}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, entry: Dict) -> None:
+        path = self._path(key, entry["data_version"])
+        if path is None:
+            return
+        try:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            joblib.dump(entry, tmp_path)
+            tmp_path.replace(path)
+            self._prune_disk(entry["data_version"])
+        except Exception as e:
+            logger.warning(f"Could not persist model {path}: {e}")
+
+    def _prune_disk(self, data_version: str) -> None:
+        """Usuwa pliki z innych wersji danych i najstarsze ponad max_disk_entries."""
+        files = sorted(self.persist_dir.glob(f"*{MODEL_FILE_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        current = []
+        for path in files:
+            if path.name.startswith(f"{data_version}__"):
+                current.append(path)
+            else:
+                path.unlink(missing_ok=True)
+        for path in current[:max(0, len(current) - self.max_disk_entries)]:
+            path.unlink(missing_ok=True)
+
+    # ---- pamięć ----
+
+    def _remember(self, cache_key: Tuple[str, str], entry: Dict, size: int) -> None:
+        """Dodaje wpis do LRU (wywoływane pod self._lock)."""
+        # Modele z innych wersji danych są już nieosiągalne - zwalniamy pamięć od razu
+        for stale_key in [k for k in self._entries if k[1] != cache_key[1]]:
+            self._drop(stale_key)
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        self._sizes[cache_key] = size
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or sum(self._sizes.values()) > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._evictions += 1
+
+    def _drop(self, cache_key: Tuple[str, str]) -> None:
+        self._entries.pop(cache_key, None)
+        self._sizes.pop(cache_key, None)
+
+    def _lookup(self, cache_key: Tuple[str, str]) -> Optional[Dict]:
+        """Wpis z pamięci lub z dysku (liczy trafienia). Wywoływane pod self._lock."""
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+            self._hits += 1
+            return entry
+        entry = self._load_from_disk(*cache_key)
+        if entry is not None:
+            self._remember(cache_key, entry, self._path(*cache_key).stat().st_size)
+            self._disk_hits += 1
+        return entry
+
+    # ---- API ----
+
+    def get(self, key: str, data_version: str) -> Optional[Dict]:
+        """Wpis dla klucza i wersji danych (None, jeśli brak)."""
+        with self._lock:
+            return self._lookup((key, data_version))
+
+    @staticmethod
+    def _make_entry(data_version: str, model, metrics: Dict) -> Dict:
+        return {
+            "model": model,
+            "metrics": metrics,
+            "data_version": data_version,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+
+    def put(self, key: str, data_version: str, model, metrics: Dict) -> Dict:
+        """Zapisuje model w pamięci i (jeśli włączone) na dysku."""
+        entry = self._make_entry(data_version, model, metrics)
+        size = _model_size_bytes(entry)
+        with self._lock:
+            self._remember((key, data_version), entry, size)
+        self._save_to_disk(key, entry)
+        return entry
+
+    def persist(self, key: str, data_version: str, model, metrics: Dict) -> Optional[Path]:
+        """
+        Zapisuje model tylko na dysku (bez zajmowania pamięci), np. w procesie
+        pretreningu - backend wczyta go przy pierwszej wycenie. Zwraca ścieżkę pliku.
+        """
+        entry = self._make_entry(data_version, model, metrics)
+        self._save_to_disk(key, entry)
+        path = self._path(key, data_version)
+        return path if path is not None and path.exists() else None
+
+    def get_or_train(
+        self,
+        key: str,
+        data_version: str,
+        train: Callable[[], Tuple[object, Dict]],
+    ) -> Tuple[Dict, bool]:
+        """
+        Zwraca (wpis, czy_z_cache). Przy braku wpisu wywołuje train() -> (model, metrics).
+        Równoległe wywołania z tym samym kluczem czekają na jeden trening.
+        Wyjątek z train() nie jest zapamiętywany.
+        """
+        cache_key = (key, data_version)
+        with self._lock:
+            entry = self._lookup(cache_key)
+            if entry is not None:
+                return entry, True
+            key_lock = self._key_locks.setdefault(cache_key, threading.Lock())
+
+        with key_lock:
+            # Ktoś mógł wytrenować model, gdy czekaliśmy na blokadę
+            with self._lock:
+                entry = self._lookup(cache_key)
+                if entry is not None:
+                    return entry, True
+                self._misses += 1
+            try:
+                model, metrics = train()
+                return self.put(key, data_version, model, metrics), False
+            finally:
+                with self._lock:
+                    self._key_locks.pop(cache_key, None)
+
+    def clear(self, remove_files: bool = False) -> None:
+        """Czyści pamięć (i opcjonalnie pliki na dysku) oraz statystyki."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._hits = self._disk_hits = self._misses = self._evictions = 0
+        if remove_files and self.persist_dir is not None and self.persist_dir.exists():
+            for path in self.persist_dir.glob(f"*{MODEL_FILE_SUFFIX}"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        """Statystyki cache (liczba wpisów, rozmiar, trafienia)."""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            disk_files = (
+                len(list(self.persist_dir.glob(f"*{MODEL_FILE_SUFFIX}")))
+                if self.persist_dir is not None and self.persist_dir.exists() else 0
+            )
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": round((self._hits + self._disk_hits) / lookups, 4) if lookups else None,
+                "persist_dir": str(self.persist_dir) if self.persist_dir else None,
+                "disk_entries": disk_files,
+            }
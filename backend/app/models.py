@@ -1,11 +1,38 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text, Index
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
+from typing import Optional
 from .db import Base
 
 
+def publication_date_to_iso(date_str: Optional[str]) -> Optional[str]:
+    """
+    Konwertuje datę publikacji z formatu DD.MM.YYYY na ISO (YYYY-MM-DD).
+    Zwraca None jeśli data jest pusta lub nieprawidłowa.
+    """
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(str(date_str).strip(), "%d.%m.%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
 class Listing(Base):
     __tablename__ = "listings"
+    # Indeksy złożone dopasowane do filtrów apply_filters: równość na prefiksie
+    # (marka, model, generacja / paliwo), zakres na roku, a cena i przebieg
+    # w indeksie - zapytania analityk czytają tylko indeks (covering), bez
+    # odwołań do wierszy tabeli. Zastępują pojedyncze indeksy marki, rocznika
+    # i paliwa (usuwane migracją migrate_listing_indexes).
+    __table_args__ = (
+        Index(
+            "ix_listings_brand_model_generation_year_price_mileage",
+            "vehicle_brand", "vehicle_model", "vehicle_generation", "production_year", "price_pln", "mileage_km",
+        ),
+        Index("ix_listings_year_price_mileage", "production_year", "price_pln", "mileage_km"),
+        Index("ix_listings_fuel_year_price_mileage", "fuel_type", "production_year", "price_pln", "mileage_km"),
+    )
 
     # z CSV: Index
     id = Column(Integer, primary_key=True, index=True)
@@ -18,17 +45,17 @@ class Listing(Base):
     condition = Column(String, nullable=True)       # Condition (New/Used)
 
     # opis samochodu
-    vehicle_brand = Column(String, index=True, nullable=False)
+    vehicle_brand = Column(String, nullable=False)
     vehicle_model = Column(String, index=True, nullable=False)
     vehicle_version = Column(String, nullable=True)
     vehicle_generation = Column(String, nullable=True)
 
-    production_year = Column(Integer, index=True, nullable=False)
+    production_year = Column(Integer, nullable=False)
     mileage_km = Column(Float, index=True, nullable=True)
     power_hp = Column(Float, nullable=True)
     displacement_cm3 = Column(Float, nullable=True)
 
-    fuel_type = Column(String, index=True, nullable=True)
+    fuel_type = Column(String, nullable=True)
     co2_emissions = Column(Float, nullable=True)
 
     drive = Column(String, nullable=True)           # Front wheels etc.
@@ -42,12 +69,28 @@ class Listing(Base):
     first_owner = Column(Boolean, nullable=True)    # Yes / No / None
     first_registration_date = Column(String, nullable=True)
     offer_publication_date = Column(String, nullable=True)
+    # Znormalizowana data publikacji (YYYY-MM-DD) - sortowalna, z indeksem dla filtrów zakresu
+    offer_publication_date_iso = Column(String(10), index=True, nullable=True)
 
     offer_location = Column(String, nullable=True)
 
     # lista wyposażenia jako tekst
     features = Column(String, nullable=True)
 
+    @validates("offer_publication_date")
+    def _sync_publication_date_iso(self, key, value):
+        """Utrzymuje offer_publication_date_iso zgodne z datą DD.MM.YYYY."""
+        self.offer_publication_date_iso = publication_date_to_iso(value)
+        return value
+
+
+class AppMeta(Base):
+    """Metadane aplikacji (klucz -> wartość), np. wersja danych tabeli listings."""
+    __tablename__ = "app_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
 
 # ================== MODELE AUTENTYKACJI I ZAPISANYCH ELEMENTÓW ==================
 
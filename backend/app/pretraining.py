@@ -0,0 +1,206 @@
+"""
+Pretrening modeli wyceny dla segmentów (marka, model) po aktualizacji bazy.
+
+Dla każdego segmentu z co najmniej min_samples kompletnymi ofertami model
+z domyślną konfiguracją jest trenowany w puli procesów i zapisywany na dysku
+w katalogu cache modeli (backend/models/valuation_cache/) pod tym samym
+kluczem, którego użyje /valuation - wycena z domyślną konfiguracją wczytuje
+gotowy model zamiast trenować go w żądaniu.
+
+Metryki segmentów trafiają do manifestu segments.json w tym samym katalogu.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import schemas
+from . import valuation as valuation_engine
+from .data_version import get_data_version
+from .model_cache import ModelCache
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_SAMPLES = int(os.getenv("VALUATION_PRETRAIN_MIN_SAMPLES", "50"))
+DEFAULT_WORKERS = int(os.getenv("VALUATION_PRETRAIN_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MANIFEST_FILE = "segments.json"
+
+
+def segment_cache_key(brand: str, model: str) -> str:
+    """Klucz cache modelu segmentu - taki sam jak dla /valuation bez filtrów i konfiguracji."""
+    filters = schemas.ValuationTrainingFilters(brand=brand, model=model)
+    return valuation_engine.model_cache_key(
+        valuation_engine.normalize_filters(filters),
+        valuation_engine.normalize_model_config(None),
+    )
+
+
+def find_segments(engine: Engine, min_samples: int, max_segments: Optional[int] = None) -> List[Tuple[str, str, int]]:
+    """
+    Segmenty (marka, model, liczba ofert) z co najmniej min_samples kompletnymi
+    ofertami, od największych. Segmenty większe niż MAX_TRAINING_ROWS są pomijane
+    (wycena i tak odrzuca takie zbiory).
+    """
+    n_offers = func.count(Listing.id)
+    stmt = (
+        select(Listing.vehicle_brand, Listing.vehicle_model, n_offers)
+        .where(
+            Listing.vehicle_brand.isnot(None),
+            Listing.vehicle_model.isnot(None),
+            Listing.price_pln.isnot(None),
+            Listing.mileage_km.isnot(None),
+            Listing.production_year.isnot(None),
+            Listing.displacement_cm3.isnot(None),
+        )
+        .group_by(Listing.vehicle_brand, Listing.vehicle_model)
+        .having(n_offers >= min_samples, n_offers <= valuation_engine.MAX_TRAINING_ROWS)
+        .order_by(n_offers.desc(), Listing.vehicle_brand, Listing.vehicle_model)
+    )
+    if max_segments is not None:
+        stmt = stmt.limit(max_segments)
+    with engine.connect() as conn:
+        return [(brand, model, int(n)) for brand, model, n in conn.execute(stmt)]
+
+
+def _train_segment(
+    database_url: str,
+    brand: str,
+    model: str,
+    data_version: str,
+    persist_dir: str,
+    max_disk_entries: int,
+) -> Dict:
+    """Worker puli procesów: trenuje i zapisuje model jednego segmentu."""
+    started = time.monotonic()
+    result = {"brand": brand, "model": model}
+    engine = create_engine(database_url, connect_args={"timeout": 30})
+    try:
+        filters = schemas.ValuationTrainingFilters(brand=brand, model=model)
+        with Session(engine) as db:
+            trained, metrics = valuation_engine.train_for_filters(
+                filters, valuation_engine.normalize_model_config(None), db, n_jobs=1
+            )
+        cache = ModelCache(persist_dir=Path(persist_dir), max_disk_entries=max_disk_entries)
+        path = cache.persist(segment_cache_key(brand, model), data_version, trained, metrics)
+        result.update(
+            status="ok",
+            n_samples=metrics["n_samples"],
+            r2=round(metrics["r2"], 4),
+            mae=round(metrics["mae"], 2),
+            file=path.name if path else None,
+        )
+    except Exception as e:
+        result.update(status="failed", error=str(e)[:200])
+    finally:
+        engine.dispose()
+    result["seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+
+def _write_manifest(persist_dir: Path, manifest: Dict) -> None:
+    persist_dir.mkdir(parents=True, exist_ok=True)
+    path = persist_dir / MANIFEST_FILE
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    tmp_path.replace(path)
+
+
+def pretrain_segment_models(
+    engine: Engine,
+    min_samples: int = DEFAULT_MIN_SAMPLES,
+    max_workers: int = DEFAULT_WORKERS,
+    persist_dir: Optional[Path] = None,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict:
+    """
+    Trenuje modele segmentów w puli procesów i zapisuje je w katalogu cache modeli.
+
+    Args:
+        engine: Silnik bazy (workery łączą się z tą samą bazą przez URL)
+        min_samples: Minimalna liczba kompletnych ofert w segmencie
+        max_workers: Liczba procesów
+        persist_dir: Katalog modeli (domyślnie katalog cache wyceny)
+        progress_callback: Funkcja (podsumowanie) wywoływana po każdym segmencie
+        should_stop: Funkcja zwracająca True, gdy pretrening ma zostać przerwany
+
+    Returns:
+        Podsumowanie: liczby segmentów, błędy, wersja danych, czas
+    """
+    cache = valuation_engine.model_cache
+    persist_dir = Path(persist_dir or cache.persist_dir or valuation_engine.MODEL_CACHE_DIR)
+    data_version = get_data_version(engine)
+    # Więcej segmentów niż mieści katalog cache oznaczałoby kasowanie świeżych modeli
+    segments = find_segments(engine, min_samples, max_segments=cache.max_disk_entries)
+    summary = {
+        "data_version": data_version,
+        "min_samples": min_samples,
+        "segments_total": len(segments),
+        "segments_done": 0,
+        "segments_failed": 0,
+        "failures": [],
+        "cancelled": False,
+        "started_at": datetime.utcnow().isoformat(),
+        "seconds": None,
+    }
+    logger.info(f"Pretraining {len(segments)} segment models (min_samples={min_samples}, workers={max_workers})")
+    if progress_callback:
+        progress_callback(summary)
+
+    started = time.monotonic()
+    results = []
+    if segments:
+        database_url = engine.url.render_as_string(hide_password=False)
+        # spawn: workery nie dziedziczą wątków ani połączeń procesu backendu
+        with ProcessPoolExecutor(
+            max_workers=max(1, min(max_workers, len(segments))),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _train_segment, database_url, brand, model, data_version,
+                    str(persist_dir), cache.max_disk_entries,
+                )
+                for brand, model, _ in segments
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                summary["segments_done"] += 1
+                if result["status"] != "ok":
+                    summary["segments_failed"] += 1
+                    summary["failures"].append({k: result[k] for k in ("brand", "model", "error")})
+                if progress_callback:
+                    progress_callback(summary)
+                if should_stop and should_stop():
+                    summary["cancelled"] = True
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+
+    summary["seconds"] = round(time.monotonic() - started, 2)
+    _write_manifest(persist_dir, {
+        "data_version": data_version,
+        "created_at": datetime.utcnow().isoformat(),
+        "model_config": valuation_engine.normalize_model_config(None),
+        "segments": sorted(
+            (r for r in results if r["status"] == "ok"),
+            key=lambda r: (r["brand"], r["model"]),
+        ),
+    })
+    logger.info(
+        f"Pretraining finished: {summary['segments_done'] - summary['segments_failed']} models, "
+        f"{summary['segments_failed']} failed, {summary['seconds']}s"
+    )
+    return summary
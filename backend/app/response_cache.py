@@ -0,0 +1,216 @@
+"""
+Cache odpowiedzi endpointów tylko do odczytu (listy filtrów, analityki).
+
+Dane zmieniają się wyłącznie przy imporcie (init_db.py, import CSV,
+aktualizacja bazy) albo usunięciu oferty przez admina - a wtedy zmienia się
+wersja danych (app.data_version). Identyczne żądania GET nie muszą więc
+za każdym razem liczyć wyniku od nowa:
+
+- klucz: ścieżka + posortowane parametry zapytania,
+- LRU ograniczone liczbą wpisów i łącznym rozmiarem treści, wpisy wygasają po TTL,
+- zmiana wersji danych unieważnia cały cache,
+- ETag (skrót treści) + If-None-Match: przeglądarka dostaje 304 bez treści,
+- statystyki trafień (hit ratio) dla panelu admina.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Nagłówki odpowiedzi zapisywane w cache (reszta, np. Content-Length, liczona jest od nowa)
+STORED_HEADERS = ("content-type",)
+
+
+def cache_key(path: str, query_items: Iterable[Tuple[str, str]]) -> str:
+    """Klucz wpisu: ścieżka + parametry posortowane po nazwie i wartości."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(query_items))
+    return f"{path}?{query}"
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Czy nagłówek If-None-Match obejmuje ETag (lista, '*' i słabe W/ porównywane jak w RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+class ResponseCache:
+    """
+    LRU odpowiedzi: {"body", "headers", "status_code", "etag", "expires"}.
+
+    Args:
+        max_entries: maksymalna liczba wpisów
+        max_bytes: maksymalny łączny rozmiar treści
+        ttl_seconds: czas życia wpisu
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds)
+        self.data_version: Optional[str] = None
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def sync_version(self, data_version: str) -> None:
+        """Nowa wersja danych unieważnia wszystkie wpisy."""
+        with self._lock:
+            if data_version != self.data_version:
+                if self._entries:
+                    self._invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self.data_version = data_version
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str], status_code: int = 200,
+            data_version: Optional[str] = None) -> Dict:
+        """
+        Zapisuje odpowiedź i zwraca wpis do wysłania.
+
+        data_version to wersja danych odczytana przed policzeniem odpowiedzi -
+        jeśli w międzyczasie cache przeszedł na nowszą wersję, odpowiedź może
+        być nieaktualna i nie jest zapisywana (wpis wraca tylko do wysłania).
+        """
+        entry = {
+            "body": body,
+            "headers": headers,
+            "status_code": status_code,
+            "etag": etag_for(body),
+            "expires": time.monotonic() + self.ttl_seconds,
+        }
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if data_version is not None and data_version != self.data_version:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._not_modified += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry["body"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "data_version": self.data_version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "not_modified": self._not_modified,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Obsługuje z cache żądania GET do ścieżek z `paths`.
+
+    Args:
+        cache: cache odpowiedzi
+        paths: ścieżki endpointów tylko do odczytu
+        data_version: funkcja (request) -> aktualna wersja danych (wywoływana w puli wątków)
+    """
+
+    def __init__(self, app, cache: ResponseCache, paths: Iterable[str], data_version: Callable[[Request], str], enabled: bool = True):
+        super().__init__(app)
+        self.cache = cache
+        self.paths = frozenset(paths)
+        self.data_version = data_version
+        self.enabled = enabled
+
+    async def dispatch(self, request: Request, call_next):
+        if not self.enabled or request.method != "GET" or request.url.path not in self.paths:
+            return await call_next(request)
+
+        version = await run_in_threadpool(self.data_version, request)
+        self.cache.sync_version(version)
+        key = cache_key(request.url.path, request.query_params.multi_items())
+        entry = self.cache.get(key)
+        cache_status = "HIT"
+        if entry is None:
+            cache_status = "MISS"
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            headers = {k: v for k, v in response.headers.items() if k.lower() in STORED_HEADERS}
+            entry = self.cache.put(key, body, headers, response.status_code, data_version=version)
+
+        headers = {
+            **entry["headers"],
+            "ETag": entry["etag"],
+            # Przeglądarka trzyma odpowiedź, ale przed użyciem pyta serwer (If-None-Match -> 304)
+            "Cache-Control": "no-cache",
+            "X-Cache": cache_status,
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            self.cache.record_not_modified()
+            headers.pop("content-type", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], status_code=entry["status_code"], headers=headers)
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300")),
+)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
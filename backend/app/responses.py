@@ -0,0 +1,24 @@
+"""
+Szybka ścieżka odpowiedzi JSON dla dużych wyników (punkty cena/przebieg, listy ofert).
+
+Domyślnie FastAPI buduje z wyniku modele Pydantic (walidacja każdego punktu),
+zamienia je przez jsonable_encoder na słowniki i serializuje standardowym json.
+Wyniki crud są już poprawnie typowane, więc endpointy mogą zwrócić
+ORJSONResponse z gotowym słownikiem: bez ponownej walidacji, a serializacja
+orjson (w C, także tablic NumPy) jest kilkukrotnie szybsza. response_model
+endpointu zostaje - opisuje odpowiedź w dokumentacji OpenAPI.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse serializowana przez orjson (NaN/inf jako null, tablice NumPy wprost)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal, Union
 from pydantic import BaseModel, Field, field_validator, ConfigDict
 from datetime import datetime
 
@@ -68,8 +68,9 @@ class ListingsResponse(BaseModel):
     filters: dict
     limit: int
     offset: int
-    total: int
+    total: Optional[int] = None
     items: List[Listing]
+    next_cursor: Optional[str] = None  # kursor następnej strony (None na ostatniej)
 
 
 class TrendPoint(BaseModel):
@@ -110,6 +111,7 @@ class ValuationModelConfig(BaseModel):
     max_depth: Optional[int] = None
     min_samples_split: Optional[int] = None
     min_samples_leaf: Optional[int] = None
+    learning_rate: Optional[float] = None  # tylko hist_gbm
     test_size: Optional[float] = None
     random_state: Optional[int] = None
 
@@ -143,6 +145,9 @@ class ValuationModelMetrics(BaseModel):
     features_numeric: List[str]
     features_categorical: List[str]
     target: str
+    # Kwantyle reszt (cena rzeczywista - przewidziana) na zbiorze testowym
+    residual_p10: Optional[float] = None
+    residual_p90: Optional[float] = None
 
 
 class ValuationResponse(BaseModel):
@@ -150,7 +155,58 @@ class ValuationResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
 
     predicted_price: float
+    # Przedział ceny P10-P90 z tego samego modelu (tree_quantiles / residual_quantiles)
+    price_p10: Optional[float] = None
+    price_p90: Optional[float] = None
+    interval_method: Optional[str] = None
     model_metrics: ValuationModelMetrics
+    from_cache: bool = False  # model pochodzi z cache (bez ponownego treningu)
+
+
+class ValuationBatchRequest(BaseModel):
+    vehicles: List[ValuationRequest] = Field(..., min_length=1)
+
+
+class ValuationBatchItem(BaseModel):
+    index: int  # pozycja pojazdu na liście wejściowej
+    predicted_price: Optional[float] = None
+    price_p10: Optional[float] = None
+    price_p90: Optional[float] = None
+    segment: Optional[str] = None  # klucz segmentu treningowego (patrz segments)
+    error: Optional[str] = None
+
+
+class ValuationBatchSegment(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    segment: str
+    filters: Dict[str, object]
+    model_type: str
+    n_vehicles: int
+    from_cache: Optional[bool] = None
+    model_metrics: Optional[ValuationModelMetrics] = None
+    error: Optional[str] = None
+
+
+class ValuationBatchResponse(BaseModel):
+    n_vehicles: int
+    n_failed: int
+    results: List[ValuationBatchItem]
+    segments: List[ValuationBatchSegment]
+
+
+class ValuationJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, done, failed
+    position: Optional[int] = None  # pozycja w kolejce (0 = w trakcie)
+    eta_seconds: Optional[float] = None  # szacowany czas do wyniku
+    deduplicated: bool = False  # dołączono do identycznego zadania w toku
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[ValuationResponse] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
 
 
 # === Analizy zaawansowane ===
@@ -160,9 +216,31 @@ class PriceMileagePoint(BaseModel):
     mileage_km: float
 
 
+class PriceMileageCell(BaseModel):
+    """Komórka mapy gęstości (tryby grid/hexbin): środek komórki i liczba ofert."""
+    price_pln: float
+    mileage_km: float
+    count: int
+
+
+class PriceMileageColumns(BaseModel):
+    """Punkty w układzie kolumnowym (shape=columns): i-ty punkt to (price_pln[i], mileage_km[i])."""
+    price_pln: List[float]
+    mileage_km: List[float]
+
+
+class PriceMileageCellColumns(PriceMileageColumns):
+    count: List[int]
+
+
 class PriceMileageResponse(BaseModel):
     filters: Dict[str, object]
-    points: List[PriceMileagePoint]
+    points: Union[List[PriceMileagePoint], PriceMileageColumns]
+    mode: str = "none"
+    shape: Literal["rows", "columns"] = "rows"
+    total: Optional[int] = None  # liczba wszystkich punktów spełniających filtry
+    cells: Optional[Union[List[PriceMileageCell], PriceMileageCellColumns]] = None
+    cell_size: Optional[Dict[str, float]] = None
 
 
 class PriceStatsByCategory(BaseModel):
@@ -178,6 +256,65 @@ class PriceStatsByCategoryResponse(BaseModel):
     by_transmission: List[PriceStatsByCategory]
 
 
+class FacetModel(BaseModel):
+    model: str
+    count: int
+    generations: List[str]
+    fuel_types: List[str]
+    transmissions: List[str]
+    displacements: List[float]
+
+
+class FacetBrand(BaseModel):
+    brand: str
+    count: int
+    models: List[FacetModel]
+
+
+class FacetsResponse(BaseModel):
+    """Katalog wartości filtrów: marka -> model -> generacje, paliwa, skrzynie, pojemności."""
+    data_version: str
+    total: int
+    fuel_types: List[str]
+    transmissions: List[str]
+    brands: List[FacetBrand]
+
+
+class DashboardAnalysis(BaseModel):
+    n_offers: int
+    avg_price: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+class DashboardPriceStatistics(BaseModel):
+    n_offers: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std_dev: Optional[float] = None
+    q1: Optional[float] = None
+    q3: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class DashboardResponse(BaseModel):
+    """Panele zakładki analiz z jednego wyboru ofert; niewybrane panele mają wartość None."""
+    filters: Dict[str, object]
+    fields: List[str]
+    analysis: Optional[DashboardAnalysis] = None
+    price_statistics: Optional[DashboardPriceStatistics] = None
+    trend: Optional[List[TrendPoint]] = None
+    by_fuel_type: Optional[List[PriceStatsByCategory]] = None
+    by_transmission: Optional[List[PriceStatsByCategory]] = None
+    price_mileage: Optional[Union[List[PriceMileagePoint], PriceMileageColumns]] = None
+    price_mileage_mode: Optional[str] = None
+    price_mileage_shape: Optional[Literal["rows", "columns"]] = None
+    price_mileage_total: Optional[int] = None
+    price_mileage_cells: Optional[Union[List[PriceMileageCell], PriceMileageCellColumns]] = None
+    price_mileage_cell_size: Optional[Dict[str, float]] = None
+
+
 # === Porównania pojazdów ===
 
 class VehicleFilter(BaseModel):
@@ -232,6 +369,9 @@ class ComparisonTrendPoint(BaseModel):
 class CompareVehiclesRequest(BaseModel):
     vehicle_a: VehicleFilter
     vehicle_b: VehicleFilter
+    # Redukcja punktów cena vs przebieg (app.downsampling; tryby zwracające punkty)
+    price_mileage_mode: Literal["none", "sample", "stratified", "lttb"] = "stratified"
+    price_mileage_target: int = Field(5000, ge=10, le=50000)
 
 
 class VehicleComparisonResponse(BaseModel):
@@ -242,6 +382,9 @@ class VehicleComparisonResponse(BaseModel):
     trend_by_year: List[ComparisonTrendPoint]
     price_mileage_a: List[PriceMileagePoint]
     price_mileage_b: List[PriceMileagePoint]
+    price_mileage_total_a: Optional[int] = None
+    price_mileage_total_b: Optional[int] = None
+    price_mileage_mode: str = "none"
 
 
 # === Admin - Status aktualizacji bazy ===
@@ -264,17 +407,25 @@ class UpdateStatusResponse(BaseModel):
 class StartUpdateRequest(BaseModel):
     start_step: Optional[str] = Field(
         default="scraping",
-        description="Etap od którego zacząć: scraping, processing, database_update"
+        description="Etap od którego zacząć: scraping, processing, database_update, model_pretraining"
     )
     steps_to_run: Optional[List[str]] = Field(
         default=None,
-        description="Lista etapów do wykonania (None = wszystkie od start_step). Możliwe wartości: scraping, processing, database_update. Uwaga: kopiowanie pliku CSV jest teraz częścią etapu 'processing'."
+        description="Lista etapów do wykonania (None = wszystkie od start_step). Możliwe wartości: scraping, processing, database_update, model_pretraining. Uwaga: kopiowanie pliku CSV jest teraz częścią etapu 'processing'."
+    )
+    resume: bool = Field(
+        default=False,
+        description="Wznów przerwane scrapowanie z checkpointów (ukończone marki są pomijane, pozostałe kontynuowane od ostatniej strony)"
+    )
+    pretrain_models: bool = Field(
+        default=False,
+        description="Po aktualizacji bazy wytrenuj modele wyceny dla segmentów (marka, model) - etap 'model_pretraining'"
     )
     
     @field_validator('start_step')
     @classmethod
     def validate_start_step(cls, v: Optional[str]) -> Optional[str]:
-        valid_steps = ["scraping", "processing", "database_update"]
+        valid_steps = ["scraping", "processing", "database_update", "model_pretraining"]
         if v and v not in valid_steps:
             raise ValueError(f'start_step musi być jednym z: {", ".join(valid_steps)}')
         return v
@@ -339,6 +490,9 @@ class SaveValuationRequest(BaseModel):
     transmission: str
     engine_capacity_cm3: float
     predicted_price: float
+    price_p10: Optional[float] = None
+    price_p90: Optional[float] = None
+    interval_method: Optional[str] = None
     model_metrics: ValuationModelMetrics
 
 
@@ -356,6 +510,9 @@ class SavedValuationResponse(BaseModel):
     transmission: str
     engine_capacity_cm3: float
     predicted_price: float
+    price_p10: Optional[float] = None
+    price_p90: Optional[float] = None
+    interval_method: Optional[str] = None
     model_metrics: ValuationModelMetrics
     created_at: str
 
@@ -377,10 +534,11 @@ class SavedComparisonResponse(BaseModel):
 class ScraperConfig(BaseModel):
     max_workers: int = Field(default=2, ge=1, le=10, description="Liczba równoległych wątków")
     request_timeout: int = Field(default=15, ge=5, le=60, description="Timeout żądań HTTP (sekundy)")
-    delay_between_offers_min: float = Field(default=0.8, ge=0.1, le=5.0, description="Minimalne opóźnienie między ofertami (sekundy) - bezpieczne ustawienie domyślne")
-    delay_between_offers_max: float = Field(default=1.5, ge=0.1, le=5.0, description="Maksymalne opóźnienie między ofertami (sekundy) - bezpieczne ustawienie domyślne")
-    delay_between_pages_min: float = Field(default=1.5, ge=0.5, le=10.0, description="Minimalne opóźnienie między stronami (sekundy) - bezpieczne ustawienie domyślne")
-    delay_between_pages_max: float = Field(default=3.0, ge=0.5, le=10.0, description="Maksymalne opóźnienie między stronami (sekundy) - bezpieczne ustawienie domyślne")
+    max_concurrency: int = Field(default=8, ge=1, le=64, description="Maksymalna liczba równoczesnych żądań HTTP (wszystkie marki razem)")
+    requests_per_second: float = Field(default=2.0, gt=0, le=50.0, description="Średnia liczba żądań na sekundę do jednego hosta (token bucket)")
+    rate_limit_burst: int = Field(default=4, ge=1, le=100, description="Ile żądań może pójść naraz ponad średnie tempo (pojemność token bucket)")
+    incremental: bool = Field(default=False, description="Tryb przyrostowy - pomijaj oferty, które już są w bazie")
+    stop_after_known_offers: int = Field(default=50, ge=1, description="Tryb przyrostowy: zakończ markę po tylu kolejnych znanych ofertach")
     max_offers_per_brand: Optional[int] = Field(default=None, ge=1, description="Limit ofert na markę (None = bez limitu)")
     brands_to_scrape: List[str] = Field(default_factory=lambda: [
         "abarth", "alfa-romeo", "audi", "bmw", "chevrolet", "citroen",
@@ -413,19 +571,3 @@ class ScraperConfig(BaseModel):
                     raise
                 # Jeśli błąd parsowania, nie waliduj zakresu (będzie błąd w parsowaniu)
         return v
-    
-    @field_validator('delay_between_offers_max')
-    @classmethod
-    def validate_offers_delay(cls, v: float, info) -> float:
-        if 'delay_between_offers_min' in info.data and info.data['delay_between_offers_min'] is not None:
-            if v < info.data['delay_between_offers_min']:
-                raise ValueError('delay_between_offers_max musi być większe lub równe delay_between_offers_min')
-        return v
-    
-    @field_validator('delay_between_pages_max')
-    @classmethod
-    def validate_pages_delay(cls, v: float, info) -> float:
-        if 'delay_between_pages_min' in info.data and info.data['delay_between_pages_min'] is not None:
-            if v < info.data['delay_between_pages_min']:
-                raise ValueError('delay_between_pages_max musi być większe lub równe delay_between_pages_min')
-        return v
\ No newline at end of file
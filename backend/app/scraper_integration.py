@@ -12,12 +12,9 @@ import threading
 import time
 from pathlib import Path
 from typing import Dict, Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import uuid
-import pandas as pd
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +40,7 @@ TARGET_CSV = BACKEND_DIR / "data" / "car_sale_ads.csv"
 STATUS_FILE = BACKEND_DIR / "update_status.json"  # Status w pliku (przetrwa restart)
 HISTORY_FILE = BACKEND_DIR / "update_history.json"  # Historia wszystkich scrapów
 SCRAPER_LOG_FILE = BACKEND_DIR / "scraper.log"  # Plik z logami scrapera
+KNOWN_IDS_FILE = SCRAPER_DIR / "known_ids.npy"  # Indeks ID ofert z bazy (tryb przyrostowy)
 
 
 def save_status(status_data: Dict):
@@ -162,7 +160,12 @@ def is_process_running() -> bool:
             return False
 
 
-def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[str]] = None) -> Dict:
+def run_full_update(
+    start_step: str = "scraping",
+    steps_to_run: Optional[List[str]] = None,
+    resume: bool = False,
+    pretrain_models: bool = False,
+) -> Dict:
     """
     Uruchamia pełny proces aktualizacji (może trwać 2 dni).
     Status jest zapisywany do pliku po każdym kroku.
@@ -170,6 +173,8 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
     Args:
         start_step: Etap od którego zacząć (scraping, processing, database_update)
         steps_to_run: Lista etapów do wykonania (None = wszystkie od start_step)
+        resume: Wznów scrapowanie z checkpointów w scraped_data/ zamiast zaczynać od nowa
+        pretrain_models: Po aktualizacji bazy wytrenuj modele wyceny segmentów (marka, model)
     
     Returns:
         Dict ze statusem procesu
@@ -187,10 +192,16 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
     
     # Jeśli steps_to_run nie jest podane, wykonaj wszystkie od start_step
     # Uwaga: "copying" jest teraz częścią "processing"
+    # "model_pretraining" jest opcjonalny - tylko na żądanie (pretrain_models lub steps_to_run)
     all_steps = ["scraping", "processing", "database_update"]
     if steps_to_run is None:
-        start_index = all_steps.index(start_step) if start_step in all_steps else 0
-        steps_to_run = all_steps[start_index:]
+        if start_step == "model_pretraining":
+            steps_to_run = ["model_pretraining"]
+        else:
+            start_index = all_steps.index(start_step) if start_step in all_steps else 0
+            steps_to_run = all_steps[start_index:]
+    if pretrain_models and "model_pretraining" not in steps_to_run:
+        steps_to_run = list(steps_to_run) + ["model_pretraining"]
     
     # Zapisz timestamp rozpoczęcia (do sprawdzania które pliki zostały zescrapowane)
     scraping_start_time = datetime.utcnow()
@@ -207,6 +218,7 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
         "steps_failed": [],
         "steps_to_run": steps_to_run,
         "start_step": start_step,
+        "resume": resume,
         "n_offers_scraped": None,  # Będzie wypełnione po scrapowaniu
         "last_updated": None,
         "cancelled": False,  # Flaga anulowania w statusie
@@ -217,7 +229,7 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
     
     # Mapowanie etapów na funkcje (usunięto model_training - model trenowany na żądanie dla konkretnej marki/modelu)
     # Uwaga: "copying" jest teraz częścią "processing"
-    steps_order = ["scraping", "processing", "database_update"]
+    steps_order = ["scraping", "processing", "database_update", "model_pretraining"]
     start_index = steps_order.index(start_step) if start_step in steps_order else 0
     
     # Oznacz poprzednie kroki jako ukończone jeśli zaczynamy od późniejszego etapu
@@ -343,6 +355,10 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
             # ZAPISZ KONFIGURACJĘ DO PLIKU W KATALOGU SCRAPERA (NAD PISZ!)
             # TO JEST KRYTYCZNE - PLIK MUSI BYĆ W KATALOGU SCRAPERA!
             if config_data:
+                # Flaga wznowienia dotyczy tylko tego uruchomienia - nie trafia do konfiguracji backendu
+                config_data["resume"] = resume
+                if resume:
+                    logger.info("Resuming scraping from checkpoints in scraped_data/")
                 try:
                     # Prosty zapis bezpośrednio do pliku
                     logger.info(f"Zapisuję konfigurację do: {scraper_config_path}")
@@ -389,6 +405,17 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
                 logger.error(f"✗✗✗ {error_msg}")
                 raise ValueError(error_msg)
             
+            # TRYB PRZYROSTOWY: przekaż scraperowi ID ofert, które już są w bazie
+            if config_data.get("incremental"):
+                from app.db import engine
+                try:
+                    n_known = export_known_ids(engine, KNOWN_IDS_FILE)
+                    logger.info(f"Incremental mode: exported {n_known} known IDs to {KNOWN_IDS_FILE}")
+                except Exception as e:
+                    # Bez indeksu scraper pobierze wszystkie oferty (jak w trybie pełnym)
+                    logger.error(f"Could not export known IDs, scraper will run a full scrape: {e}")
+                    KNOWN_IDS_FILE.unlink(missing_ok=True)
+            
             # UPEWNIJ SIĘ, ŻE PLIK ISTNIEJE PRZED URUCHOMIENIEM SCRAPERA!
             if not scraper_config_path.exists():
                 error_msg = f"KRYTYCZNY BŁĄD: Plik konfiguracyjny nie istnieje: {scraper_config_path}"
@@ -667,28 +694,9 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
                         logger.warning(f"Could not load config to count offers: {e}")
                 
                 scraped_data_dir = SCRAPER_DIR / "scraped_data"
-                total_offers = 0
                 
                 if scraped_data_dir.exists() and brands_to_scrape:
-                    # Policz tylko z plików dla marek które były scrapowane
-                    for brand in brands_to_scrape:
-                        brand_csv = scraped_data_dir / f"{brand.lower()}.csv"
-                        if brand_csv.exists():
-                            # Sprawdź czy plik został zmodyfikowany po rozpoczęciu scrapowania
-                            file_mtime = datetime.fromtimestamp(brand_csv.stat().st_mtime)
-                            # Uwzględnij małą tolerancję (1 sekunda) dla różnic w czasie
-                            if file_mtime >= scraping_start_time.replace(second=scraping_start_time.second - 1):
-                                try:
-                                    # Policz wiersze w pliku (bez nagłówka)
-                                    with open(brand_csv, "r", encoding="utf-8") as f:
-                                        n_lines = sum(1 for _ in f) - 1  # -1 dla nagłówka
-                                        total_offers += max(0, n_lines)
-                                        logger.info(f"Counted {max(0, n_lines)} offers from {brand_csv.name} (modified: {file_mtime})")
-                                except Exception as e:
-                                    logger.warning(f"Could not count offers in {brand_csv}: {e}")
-                            else:
-                                logger.info(f"Skipped {brand_csv.name} - not modified during this scraping (mtime: {file_mtime}, start: {scraping_start_time})")
-                    
+                    total_offers = count_offers_scraped(scraped_data_dir, brands_to_scrape, scraping_start_time)
                     status["n_offers_scraped"] = total_offers
                     logger.info(f"Total scraped offers in this run: {status['n_offers_scraped']} from {len(brands_to_scrape)} brands")
                 else:
@@ -788,30 +796,59 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
             status["progress_percent"] = 90
             save_status(status)
             
-            result = subprocess.run(
-                [str(backend_python), "init_db.py"],
-                cwd=BACKEND_DIR,
-                capture_output=True,
-                text=True,
-                timeout=3600 * 4  # 4h timeout
-            )
-            
-            if result.returncode != 0:
+            # Import w procesie backendu (zamiast podprocesu init_db.py) - postęp
+            # każdego kawałka trafia do statusu/historii
+            # Przy pretreningu import zajmuje 90-95%, pretrening 95-99%
+            import_end_percent = 95 if "model_pretraining" in steps_to_run else 99
+            try:
+                stats = import_csv_to_database(
+                    TARGET_CSV,
+                    progress_callback=import_progress_callback(status, TARGET_CSV, 90, import_end_percent),
+                )
+            except Exception as e:
+                logger.exception("Database update failed")
                 status["status"] = "failed"
                 status["current_step"] = "database_update"
-                error_msg = result.stderr[:500] if result.stderr else "Unknown error"
-                status["error_message"] = f"Database update failed: {error_msg}"
+                status["error_message"] = f"Database update failed: {str(e)[:500]}"
                 status["steps_failed"].append("database_update")
                 save_status(status)
                 return status
+            status["import_stats"] = stats
             
             status["steps_completed"].append("database_update")
-            status["progress_percent"] = 100  # Zmieniono z 90 na 100 - to ostatni krok
+            status["progress_percent"] = import_end_percent if "model_pretraining" in steps_to_run else 100
             save_status(status)
         
-        # Krok 5: Trenowanie modelu - USUNIĘTY
-        # Model jest teraz trenowany na żądanie dla konkretnej marki/modelu podczas wyceny
-        # To znacznie przyspiesza aktualizację bazy danych i zmniejsza zużycie zasobów
+        # Krok 4 (opcjonalny): Pretrening modeli wyceny dla segmentów (marka, model)
+        # Wycena z domyślną konfiguracją wczyta gotowy model zamiast trenować go w żądaniu
+        if "model_pretraining" in steps_to_run:
+            logger.info("=" * 60)
+            logger.info("Step 4/4: Pretraining valuation models per segment")
+            logger.info("=" * 60)
+            
+            status["current_step"] = "model_pretraining"
+            status["progress_percent"] = 95
+            save_status(status)
+            
+            try:
+                summary = pretrain_models_with_progress(status, 95, 99)
+            except Exception as e:
+                logger.exception("Model pretraining failed")
+                status["status"] = "failed"
+                status["current_step"] = "model_pretraining"
+                status["error_message"] = f"Model pretraining failed: {str(e)[:500]}"
+                status["steps_failed"].append("model_pretraining")
+                save_status(status)
+                return status
+            
+            if summary["cancelled"]:
+                status["status"] = "cancelled"
+                status["cancelled"] = False  # Reset flagi
+                status["completed_at"] = datetime.utcnow().isoformat()
+                save_status(status)
+                return status
+            status["steps_completed"].append("model_pretraining")
+            save_status(status)
         
         # Sukces!
         status["status"] = "completed"
@@ -840,173 +877,155 @@ def run_full_update(start_step: str = "scraping", steps_to_run: Optional[List[st
     return status
 
 
-def bool_from_yes_no(value):
-    """Konwertuje 'yes'/'no' na boolean."""
-    if isinstance(value, str) and value.strip().lower() == "yes":
-        return True
-    if isinstance(value, str) and value.strip().lower() == "no":
-        return False
-    return None
+def export_known_ids(engine, path: Path = KNOWN_IDS_FILE) -> int:
+    """
+    Zapisuje ID wszystkich ofert z bazy do kompaktowego pliku .npy (int64),
+    z którego scraper w trybie przyrostowym wczytuje zbiór znanych ofert.
+    
+    Returns:
+        Liczba zapisanych ID
+    """
+    import numpy as np
+    from sqlalchemy import select
+    from app.models import Listing
+    
+    with engine.connect() as conn:
+        ids = np.fromiter(conn.execute(select(Listing.id)).scalars(), dtype=np.int64)
+    
+    # Zapis do pliku tymczasowego i podmiana - scraper nigdy nie zobaczy połowy pliku
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, ids)
+    tmp_path.replace(path)
+    return len(ids)
 
 
-def import_csv_to_database(csv_path: Path) -> Dict:
+def count_offers_scraped(scraped_data_dir: Path, brands: List[str], since: datetime) -> int:
     """
-    Importuje plik CSV do bazy danych.
+    Liczba ofert dopisanych przez scraper w bieżącym uruchomieniu.
     
-    Args:
-        csv_path: Ścieżka do pliku CSV do importu
+    Dla każdej marki czyta {marka}.checkpoint.json i sumuje rows_written_run
+    (wiersze dopisane do CSV w tym uruchomieniu - przy wznowieniu bez wierszy
+    z przerwanego). Pomijane są checkpointy zapisane przed startem scrapowania
+    (np. marki ukończone wcześniej, których scraper nie uruchamiał ponownie).
+    """
+    # Mała tolerancja (1 sekunda) dla różnic w czasie
+    threshold = since - timedelta(seconds=1)
+    total_offers = 0
+    for brand in brands:
+        checkpoint_file = scraped_data_dir / f"{brand}.checkpoint.json"
+        if not checkpoint_file.exists():
+            continue
+        try:
+            with open(checkpoint_file, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            updated_at = datetime.fromisoformat(checkpoint["updated_at"])
+        except Exception as e:
+            logger.warning(f"Could not read checkpoint {checkpoint_file}: {e}")
+            continue
+        if updated_at < threshold:
+            logger.info(f"Skipped {brand} - checkpoint not updated during this scraping (updated: {updated_at}, start: {since})")
+            continue
+        n_offers = int(checkpoint.get("rows_written_run", 0))
+        total_offers += n_offers
+        logger.info(f"Counted {n_offers} offers scraped for {brand} in this run")
+    return total_offers
+
+
+def import_progress_callback(status: Dict, csv_path: Path, start_percent: int, end_percent: int):
+    """
+    Zwraca progress_callback dla importu CSV, który po każdym kawałku zapisuje
+    w statusie (i historii) statystyki importu oraz postęp procentowy
+    w przedziale start_percent..end_percent.
+    """
+    from app.importer import count_csv_rows
     
-    Returns:
-        Dict ze statystykami importu
+    try:
+        total_rows = count_csv_rows(csv_path)
+    except OSError:
+        total_rows = 0
+    
+    def callback(chunk_no: int, stats: Dict) -> None:
+        rows_done = stats["total_processed"] + stats["skipped"] + stats["errors"]
+        fraction = min(rows_done / total_rows, 1.0) if total_rows else 0.0
+        status["progress_percent"] = int(start_percent + (end_percent - start_percent) * fraction)
+        status["import_progress"] = {
+            "chunks_done": chunk_no,
+            "rows_done": rows_done,
+            "rows_total": total_rows,
+            "stats": stats,
+        }
+        save_status(status)
+    
+    return callback
+
+
+def pretrain_models_with_progress(status: Dict, start_percent: int, end_percent: int) -> Dict:
     """
-    # Import lokalny aby uniknąć cyklicznych zależności
-    from app.db import SessionLocal
-    from app.models import Listing
+    Pretrening modeli segmentów (app.pretraining) z postępem zapisywanym
+    w statusie (i historii) pod kluczem "pretraining". Anulowanie aktualizacji
+    przerywa pretrening po bieżącym segmencie.
+    """
+    from app.db import engine
+    from app.pretraining import pretrain_segment_models
     
-    logger.info(f"Importing CSV from: {csv_path}")
-    
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV file not found: {csv_path}")
-    
-    # Wczytaj CSV
-    df = pd.read_csv(csv_path, low_memory=False)
-    
-    # Mapowanie polskich nazw kolumn na angielskie (jeśli plik ma polskie nagłówki)
-    column_mapping = {
-        "Stan": "Condition",
-        "Marka pojazdu": "Vehicle_brand",
-        "Model pojazdu": "Vehicle_model",
-        "Wersja": "Vehicle_version",
-        "Generacja": "Vehicle_generation",
-        "Rok produkcji": "Production_year",
-        "Przebieg": "Mileage_km",
-        "Moc": "Power_HP",
-        "Pojemność skokowa": "Displacement_cm3",
-        "Rodzaj paliwa": "Fuel_type",
-        "Emisja CO2": "CO2_emissions",
-        "Napęd": "Drive",
-        "Skrzynia biegów": "Transmission",
-        "Typ": "Type",
-        "Liczba drzwi": "Doors_number",
-        "Kolor": "Colour",
-        "Kraj pochodzenia": "Origin_country",
-        "Pierwszy właściciel": "First_owner",
-        "Pierwsza rejestracja": "First_registration_date",
-        "date": "Offer_publication_date",
-        "Location": "Offer_location",
-    }
+    def callback(summary: Dict) -> None:
+        # Flaga anulowania ustawiona w pliku nie może zostać nadpisana zapisem statusu
+        if is_cancelled():
+            status["cancelled"] = True
+        total = summary["segments_total"]
+        fraction = summary["segments_done"] / total if total else 1.0
+        status["progress_percent"] = int(start_percent + (end_percent - start_percent) * fraction)
+        status["pretraining"] = dict(summary)
+        save_status(status)
     
-    # Zmień nazwy kolumn jeśli są polskie
-    df = df.rename(columns=column_mapping)
+    summary = pretrain_segment_models(
+        engine,
+        progress_callback=callback,
+        should_stop=lambda: status.get("cancelled", False) or is_cancelled(),
+    )
+    status["pretraining"] = summary
+    return summary
+
+
+def import_csv_to_database(
+    csv_path: Path,
+    chunksize: Optional[int] = None,
+    progress_callback=None,
+) -> Dict:
+    """
+    Importuje plik CSV do bazy danych (wspólny importer z app.importer).
     
-    # Wyrzuć rekordy bez ceny
-    before = len(df)
-    df = df[~pd.isna(df["Price"])].copy()
-    after = len(df)
-    logger.info(f"Records in CSV: {before}, after removing records without price: {after}")
+    Plik czytany jest strumieniowo (po chunksize wierszy), więc zużycie pamięci
+    nie zależy od rozmiaru pliku.
     
-    db: Session = SessionLocal()
+    Args:
+        csv_path: Ścieżka do pliku CSV do importu
+        chunksize: Liczba wierszy na kawałek (domyślnie DEFAULT_CHUNK_SIZE)
+        progress_callback: Opcjonalna funkcja (numer_kawałka, statystyki) wywoływana po każdym kawałku
     
-    # Statystyki
-    inserted = 0
-    updated = 0
-    skipped = 0
-    errors = 0
-    seen_ids = set()
+    Returns:
+        Dict ze statystykami importu
+    """
+    # Import lokalny aby uniknąć cyklicznych zależności
+    from app.db import engine
+    from app.importer import import_csv, DEFAULT_CHUNK_SIZE
     
-    # Pobierz wszystkie istniejące ID z bazy
-    logger.info("Checking existing records in database...")
-    existing_ids = {row[0] for row in db.query(Listing.id).all()}
-    logger.info(f"Found {len(existing_ids)} existing records in database.")
+    from app.columnar import snapshot_store
+    from app.facets import facet_store
     
-    logger.info("Importing/updating records...")
-    for idx, row in df.iterrows():
-        try:
-            offer_id = int(row["ID"])
-            
-            # Sprawdź czy to duplikat w samym CSV
-            if offer_id in seen_ids:
-                logger.warning(f"Duplicate ID {offer_id} in CSV (line {idx + 2}), skipping...")
-                skipped += 1
-                continue
-            seen_ids.add(offer_id)
-            
-            listing = Listing(
-                id=offer_id,
-                price_pln=float(row["Price"]),
-                currency=str(row["Currency"]),
-                condition=str(row["Condition"]) if not pd.isna(row["Condition"]) else None,
-                vehicle_brand=str(row["Vehicle_brand"]),
-                vehicle_model=str(row["Vehicle_model"]),
-                vehicle_version=None if pd.isna(row["Vehicle_version"]) else str(row["Vehicle_version"]),
-                vehicle_generation=None if pd.isna(row["Vehicle_generation"]) else str(row["Vehicle_generation"]),
-                production_year=int(row["Production_year"]),
-                mileage_km=None if pd.isna(row["Mileage_km"]) else float(str(row["Mileage_km"]).replace(" km", "").replace(" ", "").replace(",", ".")),
-                power_hp=None if pd.isna(row["Power_HP"]) else float(str(row["Power_HP"]).replace(" KM", "").replace(" ", "").replace(",", ".")),
-                displacement_cm3=None if pd.isna(row["Displacement_cm3"]) else float(str(row["Displacement_cm3"]).replace(" cm3", "").replace(" ", "").replace(",", ".")),
-                fuel_type=None if pd.isna(row["Fuel_type"]) else str(row["Fuel_type"]),
-                co2_emissions=None if pd.isna(row["CO2_emissions"]) else float(row["CO2_emissions"]),
-                drive=None if pd.isna(row["Drive"]) else str(row["Drive"]),
-                transmission=None if pd.isna(row["Transmission"]) else str(row["Transmission"]),
-                type=None if pd.isna(row["Type"]) else str(row["Type"]),
-                doors_number=None if pd.isna(row["Doors_number"]) else float(row["Doors_number"]),
-                colour=None if pd.isna(row["Colour"]) else str(row["Colour"]),
-                origin_country=None if pd.isna(row["Origin_country"]) else str(row["Origin_country"]),
-                first_owner=bool_from_yes_no(row["First_owner"]) if not pd.isna(row["First_owner"]) else None,
-                first_registration_date=None if pd.isna(row["First_registration_date"]) else str(row["First_registration_date"]),
-                offer_publication_date=None if pd.isna(row["Offer_publication_date"]) else str(row["Offer_publication_date"]),
-                offer_location=None if pd.isna(row["Offer_location"]) else str(row["Offer_location"]),
-                features=None if pd.isna(row["Features"]) else str(row["Features"]),
-            )
-            
-            # Sprawdź czy rekord już istnieje w bazie
-            if offer_id in existing_ids:
-                # Aktualizuj istniejący rekord
-                existing = db.query(Listing).filter(Listing.id == offer_id).first()
-                if existing:
-                    for key, value in listing.__dict__.items():
-                        if key != '_sa_instance_state' and key != 'id':
-                            setattr(existing, key, value)
-                    updated += 1
-            else:
-                # Dodaj nowy rekord
-                db.add(listing)
-                existing_ids.add(offer_id)
-                inserted += 1
-            
-            # Commit co 1000 rekordów
-            if (inserted + updated) % 1000 == 0:
-                db.commit()
-                logger.info(f"Processed {inserted + updated} records... (new: {inserted}, updated: {updated})")
-                
-        except ValueError as e:
-            errors += 1
-            logger.error(f"Error in line {idx + 2}: Invalid ID value - {e}")
-            continue
-        except Exception as e:
-            errors += 1
-            logger.error(f"Error in line {idx + 2}: {e}")
-            continue
+    stats = import_csv(
+        csv_path,
+        engine,
+        chunksize=chunksize or DEFAULT_CHUNK_SIZE,
+        progress_callback=progress_callback,
+    )
     
-    # Finalny commit
+    # Sidebar i analityki mają od razu gotowy katalog filtrów i snapshot nowej wersji danych
     try:
-        db.commit()
-        stats = {
-            "inserted": inserted,
-            "updated": updated,
-            "skipped": skipped,
-            "errors": errors,
-            "total_processed": inserted + updated
-        }
-        logger.info(f"Import completed! Stats: {stats}")
-        return stats
+        facet_store.refresh(engine)
+        snapshot_store.refresh(engine)
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error during database commit: {e}")
-        raise
-    finally:
-        db.close()
-        # Wymuś zamknięcie wszystkich uchwytów do pliku (ważne w Windows)
-        import gc
-        gc.collect()
-
+        logger.warning(f"Analytics snapshot refresh failed after import: {e}")
+    
+    return stats
@@ -0,0 +1,115 @@
+"""
+Silnik statystyk grupowanych (count / średnia / mediana / kwantyle).
+
+Zamiast osobnego zapytania o ceny dla każdej grupy (rok, paliwo, skrzynia),
+pobieramy raz pary (klucz grupy, cena) i liczymy wszystkie statystyki
+w jednym przebiegu po posortowanych danych w NumPy.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _sorted_quantile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """
+    Kwantyl z interpolacją liniową (jak np.percentile) liczony dla wielu
+    posortowanych segmentów naraz. sorted_values jest posortowane w obrębie grup.
+    """
+    pos = (counts - 1) * q
+    lower = np.floor(pos).astype(np.int64)
+    upper = np.ceil(pos).astype(np.int64)
+    frac = pos - lower
+    low_vals = sorted_values[starts + lower]
+    high_vals = sorted_values[starts + upper]
+    return low_vals + (high_vals - low_vals) * frac
+
+
+def grouped_stats(
+    keys: Sequence[Any],
+    values: Sequence[Any],
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> List[Dict[str, Any]]:
+    """
+    Liczy statystyki wartości (np. cen) dla każdej grupy w jednym przebiegu.
+
+    Args:
+        keys: klucze grup (rok, kategoria...). Wiersze z kluczem None/NaN są pomijane.
+        values: wartości liczbowe. Wiersze z wartością None/NaN są pomijane.
+        quantiles: kwantyle do policzenia (0-1).
+
+    Returns:
+        Lista słowników posortowana po kluczu:
+        {"key", "n", "mean", "median", "min", "max", "quantiles": {q: wartość}}
+    """
+    keys_series = pd.Series(keys, dtype=object)
+    values_arr = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+    valid = keys_series.notna().to_numpy() & ~np.isnan(values_arr)
+    if not valid.any():
+        return []
+
+    codes, uniques = pd.factorize(keys_series[valid], sort=True)
+    return grouped_stats_from_codes(codes, uniques, values_arr[valid], quantiles)
+
+
+def grouped_stats_from_codes(
+    codes: np.ndarray,
+    labels: Sequence[Any],
+    values: np.ndarray,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    presorted: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Jak grouped_stats, ale dla kluczy już zakodowanych: codes[i] to indeks
+    klucza w labels (posortowanych), -1 = brak klucza. Grupy bez wierszy
+    są pomijane.
+
+    presorted=True oznacza, że values są posortowane rosnąco - wtedy zamiast
+    lexsort po (grupa, wartość) wystarcza stabilne sortowanie po samych kodach.
+    """
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    valid = (codes >= 0) & ~np.isnan(values)
+    if not valid.all():
+        codes = codes[valid]
+        values = values[valid]
+    if not len(values):
+        return []
+
+    # Sortowanie po (grupa, wartość) - mediany i kwantyle czytamy bezpośrednio z indeksów
+    order = np.argsort(codes, kind="stable") if presorted else np.lexsort((values, codes))
+    sorted_codes = codes[order]
+    sorted_vals = values[order]
+
+    all_counts = np.bincount(sorted_codes, minlength=len(labels))
+    all_starts = np.zeros(len(all_counts), dtype=np.int64)
+    np.cumsum(all_counts[:-1], out=all_starts[1:])
+    present = np.flatnonzero(all_counts)
+    counts = all_counts[present]
+    starts = all_starts[present]
+
+    sums = np.add.reduceat(sorted_vals, starts)
+    means = sums / counts
+    mins = sorted_vals[starts]
+    maxs = sorted_vals[starts + counts - 1]
+    medians = _sorted_quantile(sorted_vals, starts, counts, 0.5)
+    quantile_values = {q: _sorted_quantile(sorted_vals, starts, counts, q) for q in quantiles}
+
+    result = []
+    for i, group in enumerate(present.tolist()):
+        key = labels[group]
+        result.append({
+            "key": key.item() if hasattr(key, "item") else key,
+            "n": int(counts[i]),
+            "mean": float(means[i]),
+            "median": float(medians[i]),
+            "min": float(mins[i]),
+            "max": float(maxs[i]),
+            "quantiles": {q: float(v[i]) for q, v in quantile_values.items()},
+        })
+    return result
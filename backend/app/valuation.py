@@ -0,0 +1,577 @@
+"""
+Silnik wyceny pojazdów: dane treningowe, trening modelu i cache modeli.
+
+Model trenowany jest dla filtrów treningu (zwykle marka + model wycenianego
+auta) i konfiguracji modelu. Wytrenowany model trafia do ModelCache pod
+kluczem (znormalizowane filtry + konfiguracja, wersja danych), więc kolejne
+wyceny z tymi samymi ustawieniami nie trenują modelu od nowa, dopóki import
+nie zmieni danych.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import crud, exceptions, schemas
+from .data_version import get_data_version
+from .model_cache import ModelCache
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent  # katalog backend/
+
+DEFAULT_MODEL_TYPE = "hist_gbm"
+DEFAULT_FEATURES_NUMERIC = ["year", "mileage_km", "engine_capacity_cm3"]
+DEFAULT_FEATURES_CATEGORICAL = ["brand", "model", "generation", "fuel_type", "transmission"]
+DEFAULT_TEST_SIZE = 0.2
+DEFAULT_RANDOM_STATE = 42
+MAX_TRAINING_ROWS = 50000
+
+# Parametry istotne dla danego typu modelu z wartościami domyślnymi (pozostałe
+# nie wpływają na wynik, więc nie mogą rozróżniać kluczy cache).
+# hist_gbm: n_estimators = liczba iteracji boostingu (max_iter)
+MODEL_PARAMS = {
+    "linear": {},
+    "ridge": {"alpha": 1.0},
+    "lasso": {"alpha": 1.0},
+    "random_forest": {"n_estimators": 200, "max_depth": None, "min_samples_split": 2, "min_samples_leaf": 1},
+    "hist_gbm": {"n_estimators": 200, "learning_rate": 0.1, "max_depth": None, "min_samples_leaf": 20},
+}
+LINEAR_MODEL_TYPES = ("linear", "ridge", "lasso")
+# Przedział ceny zwracany z wyceną (percentyle)
+INTERVAL_LOW, INTERVAL_HIGH = 10, 90
+
+# Limit kategorii na cechę w hist_gbm (reszta łączona w kategorię "rzadkie")
+HIST_GBM_MAX_CATEGORIES = 254
+
+# Cache modeli - konfiguracja przez zmienne środowiskowe
+MODEL_CACHE_DIR = Path(os.getenv("VALUATION_CACHE_DIR", str(BACKEND_DIR / "models" / "valuation_cache")))
+model_cache = ModelCache(
+    max_entries=int(os.getenv("VALUATION_CACHE_SIZE", "32")),
+    max_bytes=int(os.getenv("VALUATION_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    persist_dir=MODEL_CACHE_DIR if os.getenv("VALUATION_CACHE_PERSIST", "1") == "1" else None,
+    max_disk_entries=int(os.getenv("VALUATION_CACHE_DISK_ENTRIES", "256")),
+)
+
+
+def load_training_data(filters: Optional[schemas.ValuationTrainingFilters], db: Session) -> pd.DataFrame:
+    """Pobiera dane do treningu zgodnie z filtrami."""
+    stmt = select(
+        Listing.vehicle_brand,
+        Listing.vehicle_model,
+        Listing.vehicle_generation,
+        Listing.production_year,
+        Listing.mileage_km,
+        Listing.fuel_type,
+        Listing.transmission,
+        Listing.displacement_cm3,
+        Listing.price_pln,
+    )
+
+    # Zastosuj filtry używając funkcji pomocniczej
+    if filters:
+        stmt = crud.apply_filters(
+            stmt,
+            brand=filters.brand,
+            model=filters.model,
+            generation=filters.generation,
+            year_min=filters.year_min,
+            year_max=filters.year_max,
+            mileage_max=filters.mileage_max,
+            displacement_min=filters.displacement_min,
+            displacement_max=filters.displacement_max,
+            fuel_type=filters.fuel_type,
+            date_from=filters.date_from,
+            date_to=filters.date_to,
+        )
+
+    # Filtruj tylko kompletne rekordy
+    stmt = stmt.where(
+        Listing.price_pln.isnot(None),
+        Listing.mileage_km.isnot(None),
+        Listing.production_year.isnot(None),
+        Listing.displacement_cm3.isnot(None),
+    )
+
+    df = pd.read_sql(stmt, db.get_bind())
+
+    # Przekształć do formatu modelu
+    if not df.empty:
+        df = df.rename(columns={
+            "vehicle_brand": "brand",
+            "vehicle_model": "model",
+            "vehicle_generation": "generation",
+            "production_year": "year",
+            "displacement_cm3": "engine_capacity_cm3",
+        })
+        df["generation"] = df["generation"].fillna("Unknown")
+
+        # Podstawowe sanity-checki
+        df = df[(df["year"] >= 1990) & (df["year"] <= 2025)]
+        df = df[(df["mileage_km"] >= 0) & (df["mileage_km"] <= 800_000)]
+        df = df[(df["engine_capacity_cm3"] >= 500) & (df["engine_capacity_cm3"] <= 8000)]
+        df = df[(df["price_pln"] >= 1000) & (df["price_pln"] <= 1_000_000)]
+
+    return df
+
+
+def train_custom_model(
+    df: pd.DataFrame,
+    model_type: str,
+    features_numeric: List[str],
+    features_categorical: List[str],
+    alpha: Optional[float] = None,
+    n_estimators: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    min_samples_split: Optional[int] = None,
+    min_samples_leaf: Optional[int] = None,
+    learning_rate: Optional[float] = None,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    n_jobs: int = -1,
+) -> tuple:
+    """
+    Trenuje model z podanymi parametrami i zwraca (model, metrics).
+    n_jobs - liczba wątków lasu losowego (1 w workerach pretreningu).
+    """
+    from sklearn.linear_model import LinearRegression, Ridge, Lasso
+    from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    import numpy as np
+
+    if df.empty or len(df) < 10:
+        raise ValueError("Za mało danych do treningu modelu (minimum 10 rekordów)")
+
+    target_col = "price_pln"
+    available_features = features_numeric + features_categorical
+
+    missing_features = [f for f in available_features if f not in df.columns]
+    if missing_features:
+        raise ValueError(f"Brakujące cechy w danych: {missing_features}")
+
+    required_cols = available_features + [target_col]
+    df_clean = df[required_cols].dropna()
+
+    if len(df_clean) < 10:
+        raise ValueError("Za mało danych po usunięciu brakujących wartości")
+
+    X = df_clean[available_features]
+    y = df_clean[target_col]
+
+    numeric_cols = [f for f in features_numeric if f in X.columns]
+    categorical_cols = [f for f in features_categorical if f in X.columns]
+
+    if model_type == "hist_gbm":
+        # Natywne kategorie: kody porządkowe zamiast one-hot (brak szerokiej macierzy);
+        # nieznana kategoria -> NaN, traktowana przez model jak brak wartości
+        preprocessor = ColumnTransformer([
+            ("cat", OrdinalEncoder(
+                handle_unknown="use_encoded_value",
+                unknown_value=np.nan,
+                encoded_missing_value=np.nan,
+                max_categories=HIST_GBM_MAX_CATEGORIES,
+            ), categorical_cols),
+            ("num", "passthrough", numeric_cols),
+        ])
+    else:
+        # Modele liniowe dostają rzadką macierz one-hot (solvery sklearn obsługują ją
+        # bezpośrednio); las losowy - gęstą jak dotychczas
+        sparse = model_type in LINEAR_MODEL_TYPES
+        preprocessor = ColumnTransformer(
+            [
+                ("num", Pipeline([("scaler", StandardScaler())]), numeric_cols),
+                ("cat", Pipeline([
+                    ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse)),
+                ]), categorical_cols),
+            ],
+            sparse_threshold=1.0 if sparse else 0.0,
+        )
+
+    if model_type == "linear":
+        regressor = LinearRegression()
+    elif model_type == "ridge":
+        regressor = Ridge(alpha=alpha or 1.0, random_state=random_state)
+    elif model_type == "lasso":
+        regressor = Lasso(alpha=alpha or 1.0, random_state=random_state, max_iter=10000)
+    elif model_type == "random_forest":
+        regressor = RandomForestRegressor(
+            n_estimators=n_estimators or 200,
+            max_depth=max_depth,
+            min_samples_split=min_samples_split or 2,
+            min_samples_leaf=min_samples_leaf or 1,
+            random_state=random_state,
+            n_jobs=n_jobs,
+        )
+    elif model_type == "hist_gbm":
+        regressor = HistGradientBoostingRegressor(
+            max_iter=n_estimators or 200,
+            learning_rate=learning_rate or 0.1,
+            max_depth=max_depth,
+            min_samples_leaf=min_samples_leaf or 20,
+            categorical_features=[True] * len(categorical_cols) + [False] * len(numeric_cols),
+            random_state=random_state,
+        )
+    else:
+        raise ValueError(f"Nieznany typ modelu: {model_type}")
+
+    model = Pipeline([
+        ("preprocess", preprocessor),
+        ("regressor", regressor),
+    ])
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y,
+        test_size=test_size,
+        random_state=random_state
+    )
+
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    r2 = float(r2_score(y_test, y_pred))
+    rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+    mae = float(mean_absolute_error(y_test, y_pred))
+    # Kwantyle reszt na zbiorze testowym - przedział ceny bez dodatkowego treningu
+    residual_low, residual_high = np.percentile(np.asarray(y_test) - y_pred, [INTERVAL_LOW, INTERVAL_HIGH])
+
+    metrics = {
+        "r2": r2,
+        "rmse": rmse,
+        "mae": mae,
+        "n_samples": int(len(df_clean)),
+        "test_size": test_size,
+        "features_numeric": features_numeric,
+        "features_categorical": features_categorical,
+        "target": target_col,
+        "residual_p10": float(residual_low),
+        "residual_p90": float(residual_high),
+    }
+
+    return model, metrics
+
+
+# ================== CACHE MODELI ==================
+
+
+def resolve_training_filters(request: schemas.ValuationRequest) -> schemas.ValuationTrainingFilters:
+    """
+    Filtry treningu dla wyceny. Bez filtrów model trenowany jest na ofertach
+    tej samej marki i modelu co wyceniane auto.
+    """
+    if request.training_filters is None:
+        return schemas.ValuationTrainingFilters(brand=request.brand, model=request.model)
+    if not request.training_filters.brand:
+        raise exceptions.ValidationError(
+            "Niestandardowy model wymaga podania marki pojazdu. Marka jest automatycznie ustawiana na podstawie wycenianego pojazdu.",
+            field="training_filters.brand"
+        )
+    return request.training_filters
+
+
+def normalize_filters(filters: schemas.ValuationTrainingFilters) -> Dict:
+    """Filtry w postaci kanonicznej (bez pustych wartości, przycięte teksty)."""
+    normalized = {}
+    for name, value in filters.model_dump().items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        normalized[name] = value
+    return normalized
+
+
+def normalize_model_config(config: Optional[schemas.ValuationModelConfig]) -> Dict:
+    """
+    Efektywne parametry treningu (argumenty train_custom_model): wartości
+    domyślne uzupełnione, parametry bez znaczenia dla typu modelu pominięte.
+    Dwie konfiguracje dające ten sam model mają tę samą postać.
+    """
+    if config is None:
+        config = schemas.ValuationModelConfig(model_type=DEFAULT_MODEL_TYPE)
+    if config.model_type not in MODEL_PARAMS:
+        raise exceptions.ValidationError(f"Nieznany typ modelu: {config.model_type}", field="valuation_model_config.model_type")
+
+    normalized = {
+        "model_type": config.model_type,
+        "features_numeric": list(config.features_numeric or DEFAULT_FEATURES_NUMERIC),
+        "features_categorical": list(config.features_categorical or DEFAULT_FEATURES_CATEGORICAL),
+        "test_size": config.test_size or DEFAULT_TEST_SIZE,
+        "random_state": config.random_state if config.random_state is not None else DEFAULT_RANDOM_STATE,
+    }
+    for param, default in MODEL_PARAMS[config.model_type].items():
+        value = getattr(config, param)
+        normalized[param] = value if value is not None else default
+    return normalized
+
+
+def model_cache_key(filters: Dict, model_config: Dict) -> str:
+    """Skrót znormalizowanych filtrów i konfiguracji - klucz w cache modeli."""
+    payload = json.dumps({"filters": filters, "config": model_config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def train_for_filters(
+    filters: schemas.ValuationTrainingFilters,
+    model_config: Dict,
+    db: Session,
+    **train_kwargs,
+) -> Tuple[object, Dict]:
+    """
+    Wczytuje dane treningowe i trenuje model. Zwraca (model, metrics).
+    train_kwargs - dodatkowe argumenty train_custom_model spoza klucza cache (np. n_jobs).
+    """
+    df = load_training_data(filters, db)
+
+    if df.empty:
+        raise exceptions.NotFoundError(
+            "Dane do treningu modelu",
+            resource_id="zgodnie z podanymi filtrami"
+        )
+
+    if len(df) > MAX_TRAINING_ROWS:
+        raise exceptions.ValidationError(
+            f"Zbyt duży zbiór danych ({len(df):,} rekordów). Ogranicz filtry do konkretnego modelu lub dodaj więcej filtrów (maksymalnie {MAX_TRAINING_ROWS:,} rekordów).",
+            field="training_filters"
+        )
+
+    return train_custom_model(df=df, **model_config, **train_kwargs)
+
+
+def get_or_train_model(
+    filters: schemas.ValuationTrainingFilters,
+    config: Optional[schemas.ValuationModelConfig],
+    db: Session,
+) -> Tuple[object, Dict, bool]:
+    """
+    Model dla filtrów i konfiguracji - z cache albo świeżo wytrenowany.
+
+    Returns:
+        (model, metrics, from_cache)
+    """
+    model_config = normalize_model_config(config)
+    key = model_cache_key(normalize_filters(filters), model_config)
+    data_version = get_data_version(db.get_bind())
+    entry, from_cache = model_cache.get_or_train(
+        key, data_version, lambda: train_for_filters(filters, model_config, db)
+    )
+    return entry["model"], entry["metrics"], from_cache
+
+
+def _vehicle_row(request: schemas.ValuationRequest) -> Dict:
+    return {
+        "brand": request.brand,
+        "model": request.model,
+        "generation": request.generation if request.generation else "Unknown",
+        "year": request.year,
+        "mileage_km": request.mileage_km,
+        "fuel_type": request.fuel_type,
+        "transmission": request.transmission,
+        "engine_capacity_cm3": request.engine_capacity_cm3,
+    }
+
+
+def vehicle_frame(request: schemas.ValuationRequest) -> pd.DataFrame:
+    """Wyceniane auto jako jednowierszowy DataFrame w formacie cech modelu."""
+    return pd.DataFrame([_vehicle_row(request)])
+
+
+def predict_with_interval(model, metrics: Dict, frame: pd.DataFrame) -> Tuple:
+    """
+    Predykcja z przedziałem P10-P90 z tego samego modelu (bez ponownego treningu).
+
+    - random_forest: percentyle predykcji poszczególnych drzew,
+    - pozostałe modele: predykcja + kwantyle reszt ze zbioru testowego
+      (residual_p10 / residual_p90 w metrykach).
+
+    Returns:
+        (predykcje, dolne granice, górne granice, metoda) - granice None, gdy
+        model z cache nie ma zapisanych kwantyli reszt
+    """
+    import numpy as np
+
+    predictions = model.predict(frame)
+    regressor = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(regressor, "estimators_"):
+        X = model[:-1].transform(frame)
+        per_tree = np.stack([tree.predict(X) for tree in regressor.estimators_])
+        low, high = np.percentile(per_tree, [INTERVAL_LOW, INTERVAL_HIGH], axis=0)
+        return predictions, low, high, "tree_quantiles"
+    if metrics.get("residual_p10") is None or metrics.get("residual_p90") is None:
+        return predictions, None, None, None
+    return (
+        predictions,
+        predictions + metrics["residual_p10"],
+        predictions + metrics["residual_p90"],
+        "residual_quantiles",
+    )
+
+
+def _single_response(model, metrics: Dict, request: schemas.ValuationRequest, from_cache: bool) -> schemas.ValuationResponse:
+    predictions, low, high, method = predict_with_interval(model, metrics, vehicle_frame(request))
+    return schemas.ValuationResponse(
+        predicted_price=float(predictions[0]),
+        price_p10=float(low[0]) if low is not None else None,
+        price_p90=float(high[0]) if high is not None else None,
+        interval_method=method,
+        model_metrics=schemas.ValuationModelMetrics(**metrics),
+        from_cache=from_cache,
+    )
+
+
+def valuate(request: schemas.ValuationRequest, db: Session) -> schemas.ValuationResponse:
+    """
+    Wycena pojazdu: model z cache (lub świeżo wytrenowany) i predykcja.
+    Błędy danych zamieniane są na wyjątki aplikacji (ValidationError, ModelTrainingError).
+    """
+    training_filters = resolve_training_filters(request)
+    try:
+        model, metrics_dict, from_cache = get_or_train_model(
+            training_filters, request.valuation_model_config, db
+        )
+        return _single_response(model, metrics_dict, request, from_cache)
+    except exceptions.AutoTradeException:
+        raise
+    except ValueError as e:
+        raise exceptions.ValidationError(str(e))
+    except Exception as e:
+        logger.error(f"Błąd podczas treningu modelu: {e}", exc_info=True)
+        raise exceptions.ModelTrainingError(f"Błąd podczas treningu modelu: {str(e)}")
+
+
+def cached_valuation(request: schemas.ValuationRequest, db: Session) -> Optional[schemas.ValuationResponse]:
+    """Wycena tylko z modelu już obecnego w cache (pamięć lub dysk); None, jeśli wymaga treningu."""
+    model_config = normalize_model_config(request.valuation_model_config)
+    key = model_cache_key(normalize_filters(resolve_training_filters(request)), model_config)
+    entry = model_cache.get(key, get_data_version(db.get_bind()))
+    if entry is None:
+        return None
+    return _single_response(entry["model"], entry["metrics"], request, from_cache=True)
+
+
+# ================== WYCENA WSADOWA ==================
+
+MAX_BATCH_SIZE = int(os.getenv("VALUATION_BATCH_MAX", "5000"))
+BATCH_CSV_COLUMNS = [
+    "brand", "model", "generation", "year", "mileage_km",
+    "fuel_type", "transmission", "engine_capacity_cm3",
+]
+
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, exceptions.AutoTradeException):
+        return str(e.detail)
+    if isinstance(e, ValueError):
+        return f"Błąd walidacji: {e}"
+    return f"Błąd podczas treningu modelu: {e}"
+
+
+def valuate_batch(
+    requests: List[Optional[schemas.ValuationRequest]],
+    db: Session,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Wycena wielu pojazdów: pojazdy grupowane są według segmentu treningowego
+    (filtry + konfiguracja modelu), dla każdego segmentu model jest wczytywany
+    z cache albo trenowany raz, a ceny całego segmentu liczone jednym
+    model.predict(DataFrame).
+
+    Błąd segmentu (np. za mało danych) trafia do wyników jego pojazdów
+    i nie przerywa wyceny pozostałych. Pozycje None (np. niepoprawne wiersze
+    CSV) są pomijane - wynik dla nich uzupełnia wywołujący.
+
+    Returns:
+        (wyniki w kolejności wejścia, podsumowanie segmentów)
+    """
+    results: List[Dict] = [
+        {"index": i, "predicted_price": None, "price_p10": None, "price_p90": None, "segment": None, "error": None}
+        for i in range(len(requests))
+    ]
+    groups: Dict[str, Dict] = {}
+    for i, request in enumerate(requests):
+        if request is None:
+            continue
+        try:
+            filters = resolve_training_filters(request)
+            model_config = normalize_model_config(request.valuation_model_config)
+        except exceptions.AutoTradeException as e:
+            results[i]["error"] = _error_message(e)
+            continue
+        key = model_cache_key(normalize_filters(filters), model_config)
+        group = groups.setdefault(key, {"filters": filters, "config": model_config, "indices": []})
+        group["indices"].append(i)
+        results[i]["segment"] = key
+
+    data_version = get_data_version(db.get_bind())
+    segments = []
+    for key, group in groups.items():
+        segment = {
+            "segment": key,
+            "filters": normalize_filters(group["filters"]),
+            "model_type": group["config"]["model_type"],
+            "n_vehicles": len(group["indices"]),
+            "from_cache": None,
+            "model_metrics": None,
+            "error": None,
+        }
+        try:
+            entry, from_cache = model_cache.get_or_train(
+                key, data_version,
+                lambda group=group: train_for_filters(group["filters"], group["config"], db),
+            )
+            frame = pd.DataFrame([_vehicle_row(requests[i]) for i in group["indices"]])
+            predictions, low, high, _ = predict_with_interval(entry["model"], entry["metrics"], frame)
+        except Exception as e:
+            if not isinstance(e, (exceptions.AutoTradeException, ValueError)):
+                logger.error(f"Batch valuation failed for segment {segment['filters']}: {e}", exc_info=True)
+            segment["error"] = _error_message(e)
+            for i in group["indices"]:
+                results[i]["error"] = segment["error"]
+        else:
+            segment["from_cache"] = from_cache
+            segment["model_metrics"] = entry["metrics"]
+            for j, i in enumerate(group["indices"]):
+                results[i]["predicted_price"] = float(predictions[j])
+                if low is not None:
+                    results[i]["price_p10"] = float(low[j])
+                    results[i]["price_p90"] = float(high[j])
+        segments.append(segment)
+
+    return results, segments
+
+
+def requests_from_frame(df: pd.DataFrame) -> Tuple[List[Optional[schemas.ValuationRequest]], List[Optional[str]]]:
+    """
+    Wiersze CSV -> ValuationRequest. Zwraca (żądania, błędy walidacji);
+    dla niepoprawnego wiersza żądanie to None, a błąd opisuje przyczynę.
+    """
+    from pydantic import ValidationError as PydanticValidationError
+
+    missing = [c for c in BATCH_CSV_COLUMNS if c != "generation" and c not in df.columns]
+    if missing:
+        raise exceptions.ValidationError(f"Brakujące kolumny w pliku CSV: {', '.join(missing)}", field="file")
+
+    columns = [c for c in BATCH_CSV_COLUMNS if c in df.columns]
+    requests: List[Optional[schemas.ValuationRequest]] = []
+    errors: List[Optional[str]] = []
+    for row in df[columns].to_dict("records"):
+        data = {k: v for k, v in row.items() if not pd.isna(v)}
+        try:
+            requests.append(schemas.ValuationRequest.model_validate(data))
+            errors.append(None)
+        except PydanticValidationError as e:
+            requests.append(None)
+            errors.append("; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+    return requests, errors
@@ -0,0 +1,284 @@
+"""
+Kolejka zadań wyceny wykonywanych w puli procesów.
+
+Trening modelu (sklearn) trwa sekundy i obciąża CPU, więc POST /valuation/jobs
+nie trenuje modelu w wątku żądania - dodaje zadanie do kolejki i od razu
+zwraca jego ID, pozycję w kolejce i szacowany czas. Wynik odbiera się przez
+GET /valuation/jobs/{id}.
+
+- pula procesów ma stałą liczbę workerów, a kolejka oczekujących ograniczony rozmiar,
+- identyczne żądania w toku (te same parametry i wersja danych) współdzielą jedno zadanie,
+- użytkownik może mieć jednocześnie najwyżej per_user_limit zadań w toku,
+- ETA liczona jest ze średniego czasu ostatnich zadań.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from . import exceptions, schemas
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def _run_valuation(database_url: str, request_data: Dict) -> Dict:
+    """Worker: wycena w osobnym procesie. Nie rzuca wyjątków - błąd wraca jako słownik."""
+    from . import valuation as valuation_engine
+
+    engine = create_engine(database_url, connect_args={"timeout": 30})
+    try:
+        request = schemas.ValuationRequest.model_validate(request_data)
+        with Session(engine) as db:
+            response = valuation_engine.valuate(request, db)
+        return {"ok": True, "result": response.model_dump()}
+    except exceptions.AutoTradeException as e:
+        return {"ok": False, "error": e.detail, "error_code": e.error_code}
+    except Exception as e:
+        logger.error(f"Valuation job failed: {e}", exc_info=True)
+        return {"ok": False, "error": str(e)[:500], "error_code": "MODEL_TRAINING_ERROR"}
+    finally:
+        engine.dispose()
+
+
+def _process_pool(max_workers: int) -> Executor:
+    # spawn: workery nie dziedziczą wątków ani połączeń procesu backendu
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def job_key(request: schemas.ValuationRequest, data_version: str) -> str:
+    """Klucz deduplikacji: parametry wyceny + wersja danych."""
+    payload = request.model_dump_json() + "|" + data_version
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ValuationJobQueue:
+    """
+    Kolejka FIFO zadań wyceny nad pulą procesów.
+
+    Do puli trafia najwyżej max_workers zadań naraz, reszta czeka w kolejce
+    (dzięki temu znana jest pozycja każdego zadania). Zakończone zadania są
+    przechowywane przez job_ttl_seconds.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queued: int = 100,
+        per_user_limit: int = 2,
+        job_ttl_seconds: int = 3600,
+        initial_duration_seconds: float = 10.0,
+        executor_factory: Callable[[int], Executor] = _process_pool,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queued = max(1, int(max_queued))
+        self.per_user_limit = max(1, int(per_user_limit))
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self._jobs: Dict[str, Dict] = {}
+        self._in_flight: Dict[str, str] = {}  # klucz deduplikacji -> ID zadania
+        self._waiting: "deque[str]" = deque()
+        self._running: Dict[str, float] = {}  # ID zadania -> start (monotonic)
+        self._avg_duration = float(initial_duration_seconds)
+        # RLock: callback zakończenia może wykonać się od razu w submit() (gotowy Future)
+        self._lock = threading.RLock()
+        self._deduplicated = 0
+
+    # ---- zgłaszanie ----
+
+    def submit(
+        self,
+        request: schemas.ValuationRequest,
+        user_id: int,
+        database_url: str,
+        data_version: str,
+    ) -> Tuple[Dict, bool]:
+        """
+        Dodaje zadanie (albo dołącza do identycznego w toku). Zwraca (widok zadania, czy_zduplikowane).
+
+        Raises:
+            TooManyRequestsError: limit zadań użytkownika lub pełna kolejka
+        """
+        key = job_key(request, data_version)
+        with self._lock:
+            self._prune()
+            existing_id = self._in_flight.get(key)
+            if existing_id is not None and user_id in self._jobs[existing_id]["user_ids"]:
+                return self._view(self._jobs[existing_id]), True
+
+            self._check_user_limit(user_id)
+            if existing_id is not None:
+                job = self._jobs[existing_id]
+                job["user_ids"].add(user_id)
+                self._deduplicated += 1
+                return self._view(job), True
+
+            if len(self._waiting) >= self.max_queued:
+                raise exceptions.TooManyRequestsError(
+                    "Kolejka wycen jest pełna - spróbuj ponownie za chwilę"
+                )
+            job = self._new_job(key, user_id, JOB_QUEUED)
+            job["request"] = request.model_dump()
+            job["database_url"] = database_url
+            self._in_flight[key] = job["id"]
+            self._waiting.append(job["id"])
+            self._dispatch()
+            return self._view(job), False
+
+    def add_completed(self, user_id: int, result: schemas.ValuationResponse) -> Dict:
+        """Rejestruje zadanie od razu zakończone (wycena z modelu w cache, bez kolejki)."""
+        with self._lock:
+            self._prune()
+            job = self._new_job(None, user_id, JOB_DONE)
+            job["started_at"] = job["finished_at"] = job["created_at"]
+            job["result"] = result.model_dump()
+            return self._view(job)
+
+    def get(self, job_id: str, user_id: int) -> Optional[Dict]:
+        """Widok zadania (None, jeśli nie istnieje albo należy do innego użytkownika)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or user_id not in job["user_ids"]:
+                return None
+            return self._view(job)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": len(self._waiting),
+                "running": len(self._running),
+                "jobs": len(self._jobs),
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "per_user_limit": self.per_user_limit,
+                "deduplicated": self._deduplicated,
+                "avg_duration_seconds": round(self._avg_duration, 2),
+            }
+
+    # ---- wewnętrzne (pod self._lock) ----
+
+    def _new_job(self, key: Optional[str], user_id: int, status: str) -> Dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "key": key,
+            "status": status,
+            "user_ids": {user_id},
+            "created_at": datetime.utcnow().isoformat(),
+            "created_monotonic": time.monotonic(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "error_code": None,
+        }
+        self._jobs[job["id"]] = job
+        return job
+
+    def _check_user_limit(self, user_id: int) -> None:
+        active = sum(
+            1 for job in self._jobs.values()
+            if job["status"] in ACTIVE_STATUSES and user_id in job["user_ids"]
+        )
+        if active >= self.per_user_limit:
+            raise exceptions.TooManyRequestsError(
+                f"Masz już {active} wyceny w toku (limit: {self.per_user_limit}). Poczekaj na ich zakończenie."
+            )
+
+    def _dispatch(self) -> None:
+        """Przekazuje oczekujące zadania do puli, dopóki są wolne workery."""
+        while self._waiting and len(self._running) < self.max_workers:
+            job = self._jobs[self._waiting.popleft()]
+            if self._executor is None:
+                self._executor = self._executor_factory(self.max_workers)
+            job["status"] = JOB_RUNNING
+            job["started_at"] = datetime.utcnow().isoformat()
+            self._running[job["id"]] = time.monotonic()
+            future = self._executor.submit(_run_valuation, job["database_url"], job["request"])
+            future.add_done_callback(lambda f, job_id=job["id"]: self._on_done(job_id, f))
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        try:
+            outcome = future.result()
+        except Exception as e:  # np. worker zabity przez system
+            outcome = {"ok": False, "error": f"Worker wyceny zakończył się błędem: {e}", "error_code": "MODEL_TRAINING_ERROR"}
+        with self._lock:
+            job = self._jobs.get(job_id)
+            started = self._running.pop(job_id, None)
+            if started is not None:
+                # Średnia krocząca czasu zadania - podstawa ETA
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            if job is not None:
+                job["finished_at"] = datetime.utcnow().isoformat()
+                if outcome["ok"]:
+                    job["status"] = JOB_DONE
+                    job["result"] = outcome["result"]
+                else:
+                    job["status"] = JOB_FAILED
+                    job["error"] = outcome["error"]
+                    job["error_code"] = outcome["error_code"]
+                job.pop("request", None)
+                job.pop("database_url", None)
+                if self._in_flight.get(job["key"]) == job_id:
+                    del self._in_flight[job["key"]]
+            self._dispatch()
+
+    def _prune(self) -> None:
+        """Usuwa zakończone zadania starsze niż job_ttl_seconds."""
+        deadline = time.monotonic() - self.job_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] not in ACTIVE_STATUSES and job["created_monotonic"] < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _view(self, job: Dict) -> Dict:
+        """Publiczny widok zadania z pozycją w kolejce i ETA."""
+        position = None
+        eta_seconds = None
+        if job["status"] == JOB_QUEUED:
+            position = self._waiting.index(job["id"]) + 1
+            # Zadanie ruszy, gdy zwolni się worker: pełne "rundy" przed nim + jego własny czas
+            rounds = (position - 1) // self.max_workers + 1
+            eta_seconds = rounds * self._avg_duration + self._avg_duration
+        elif job["status"] == JOB_RUNNING:
+            position = 0
+            elapsed = time.monotonic() - self._running.get(job["id"], time.monotonic())
+            eta_seconds = max(0.0, self._avg_duration - elapsed)
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "position": position,
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "result": job["result"],
+            "error": job["error"],
+            "error_code": job["error_code"],
+        }
+
+
+job_queue = ValuationJobQueue(
+    max_workers=int(os.getenv("VALUATION_JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("VALUATION_JOB_QUEUE_SIZE", "100")),
+    per_user_limit=int(os.getenv("VALUATION_JOB_USER_LIMIT", "2")),
+    job_ttl_seconds=int(os.getenv("VALUATION_JOB_TTL_SECONDS", "3600")),
+)
@@ -0,0 +1,90 @@
+"""
+Benchmark funkcji analitycznych crud: zapytania SQL vs kolumnowy snapshot.
+
+Importuje syntetyczny CSV (jak bench_import) do pustej bazy SQLite, buduje
+snapshot (app.columnar) i dla kilku zestawów filtrów mierzy medianę czasu
+każdej funkcji analitycznej liczonej w SQL i ze snapshotu.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_analytics --rows 1000000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.columnar import snapshot_store
+from app.db import Base
+from app.importer import import_csv
+from benchmarks.bench_import import make_csv
+
+SCENARIOS = {
+    "bez filtrów": {},
+    "marka": {"brand": "Toyota"},
+    "marka+model+rok": {"brand": "Toyota", "model": "Model 7", "year_min": 2010, "year_max": 2018},
+    "paliwo+przebieg": {"fuel_type": "Diesel", "mileage_max": 150_000},
+}
+
+FUNCTIONS = {
+    "analysis": lambda db, f: crud.get_analysis(db, **f),
+    "price-statistics": lambda db, f: crud.get_price_statistics(db, **f),
+    "trend-by-year": lambda db, f: crud.get_trend_by_year(db, **f),
+    "by-category": lambda db, f: crud.get_price_stats_by_category(db, **f),
+    "price-mileage": lambda db, f: crud.get_price_mileage_data(db, **f),
+}
+
+
+def _filters(scenario: dict) -> dict:
+    keys = ["brand", "model", "generation", "year_min", "year_max", "mileage_max",
+            "date_from", "date_to", "displacement_min", "displacement_max", "fuel_type"]
+    return {k: scenario.get(k) for k in keys}
+
+
+def _median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_path = tmp / "bench.csv"
+        make_csv(csv_path, args.rows)
+        engine = create_engine(f"sqlite:///{tmp / 'bench.sqlite'}")
+        Base.metadata.create_all(bind=engine)
+        import_csv(csv_path, engine)
+
+        snapshot_store.enabled = True
+        snapshot = snapshot_store.refresh(engine)
+        print(f"snapshot: {snapshot.n_rows} wierszy, {snapshot.nbytes / 1024 ** 2:.0f} MB, "
+              f"budowa {snapshot.build_seconds:.2f} s\n")
+
+        print(f"{'scenariusz':<18} {'funkcja':<17} {'SQL [ms]':>10} {'snapshot [ms]':>14}")
+        with Session(engine) as db:
+            for scenario, raw_filters in SCENARIOS.items():
+                filters = _filters(raw_filters)
+                for name, fn in FUNCTIONS.items():
+                    snapshot_store.enabled = False
+                    sql_ms = _median_ms(lambda: fn(db, filters), args.repeats)
+                    snapshot_store.enabled = True
+                    snapshot_ms = _median_ms(lambda: fn(db, filters), args.repeats)
+                    print(f"{scenario:<18} {name:<17} {sql_ms:>10.1f} {snapshot_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark importu CSV do tabeli listings.
+
+Generuje syntetyczny plik CSV, importuje go do pustej bazy SQLite
+(insert), a następnie ponownie (update) i wypisuje przepustowość w rekordach/s.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_import --rows 200000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from app.db import Base
+from app.importer import import_csv
+
+
+def make_csv(path: Path, rows: int, seed: int = 0) -> None:
+    """Zapisuje syntetyczny CSV w formacie car_sale_ads.csv."""
+    rng = np.random.default_rng(seed)
+    brands = np.array(["Toyota", "BMW", "Audi", "Opel", "Skoda", "Volkswagen"])
+    fuels = np.array(["Gasoline", "Diesel", "Hybrid"])
+    days = rng.integers(1, 29, rows)
+    months = rng.integers(1, 13, rows)
+    df = pd.DataFrame({
+        "ID": np.arange(1, rows + 1),
+        "Price": rng.integers(5_000, 300_000, rows),
+        "Currency": "PLN",
+        "Condition": "Used",
+        "Vehicle_brand": rng.choice(brands, rows),
+        "Vehicle_model": "Model " + pd.Series(rng.integers(1, 20, rows)).astype(str),
+        "Production_year": rng.integers(1995, 2024, rows),
+        "Mileage_km": pd.Series(rng.integers(0, 400_000, rows)).astype(str) + " km",
+        "Power_HP": pd.Series(rng.integers(60, 400, rows)).astype(str) + " KM",
+        "Displacement_cm3": pd.Series(rng.integers(900, 4000, rows)).astype(str) + " cm3",
+        "Fuel_type": rng.choice(fuels, rows),
+        "Transmission": rng.choice(np.array(["Manual", "Automatic"]), rows),
+        "First_owner": rng.choice(np.array(["Yes", "No"]), rows),
+        "Offer_publication_date": [f"{d:02d}.{m:02d}.2023" for d, m in zip(days, months)],
+    })
+    df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_path = tmp / "bench.csv"
+        make_csv(csv_path, args.rows)
+
+        engine = create_engine(f"sqlite:///{tmp / 'bench.sqlite'}")
+        Base.metadata.create_all(bind=engine)
+
+        for label in ("insert", "re-import (update)"):
+            start = time.perf_counter()
+            stats = import_csv(csv_path, engine)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<20} {args.rows:>8} rekordów  {elapsed:7.2f} s  {args.rows / elapsed:10.0f} rekordów/s  {stats}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
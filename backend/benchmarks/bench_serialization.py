@@ -0,0 +1,82 @@
+"""
+Benchmark serializacji odpowiedzi /analytics/price-mileage: czas i rozmiar JSON.
+
+Porównuje dla N punktów (cena, przebieg):
+- pydantic + json: dotychczasowa ścieżka FastAPI - model PriceMileagePoint dla
+  każdego punktu, PriceMileageResponse, jsonable_encoder i JSONResponse (json),
+- orjson (wiersze): słownik z crud prosto do ORJSONResponse,
+- orjson (kolumny): shape=columns - {"price_pln": [...], "mileage_km": [...]}.
+
+Czas obejmuje zamianę tablic NumPy na listy (jak w crud).
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_serialization --points 200000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import schemas
+from app.downsampling import points_columns, points_list
+from app.responses import ORJSONResponse
+
+FILTERS = {"brand": "Toyota", "model": None, "generation": None, "year_min": None, "year_max": None,
+           "mileage_max": None, "date_from": None, "date_to": None, "displacement_min": None, "displacement_max": None}
+
+
+def pydantic_json(prices: np.ndarray, mileages: np.ndarray) -> bytes:
+    points = points_list(prices, mileages)
+    response = schemas.PriceMileageResponse(
+        filters=FILTERS,
+        points=[schemas.PriceMileagePoint(**p) for p in points],
+        total=len(points),
+    )
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def orjson_rows(prices: np.ndarray, mileages: np.ndarray) -> bytes:
+    points = points_list(prices, mileages)
+    return ORJSONResponse({"filters": FILTERS, "points": points, "mode": "none", "shape": "rows",
+                           "total": len(points), "cells": None, "cell_size": None}).body
+
+
+def orjson_columns(prices: np.ndarray, mileages: np.ndarray) -> bytes:
+    return ORJSONResponse({"filters": FILTERS, "points": points_columns(prices, mileages), "mode": "none",
+                           "shape": "columns", "total": len(prices), "cells": None, "cell_size": None}).body
+
+
+VARIANTS = {
+    "pydantic + json": pydantic_json,
+    "orjson (wiersze)": orjson_rows,
+    "orjson (kolumny)": orjson_columns,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prices = rng.integers(5_000, 400_000, args.points).astype(float)
+    mileages = rng.integers(0, 400_000, args.points).astype(float)
+
+    print(f"{args.points} punktów\n")
+    print(f"{'wariant':<18} {'czas [ms]':>10} {'rozmiar [KB]':>13}")
+    for name, fn in VARIANTS.items():
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            body = fn(prices, mileages)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<18} {statistics.median(times):>10.1f} {len(body) / 1024:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
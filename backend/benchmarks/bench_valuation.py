@@ -0,0 +1,100 @@
+"""
+Benchmark modeli wyceny (train_custom_model).
+
+Generuje syntetyczny zbiór ofert o cechach jak w bazie (w tym kategorie
+o dużej liczności: model, generation) i dla każdego typu modelu mierzy czas
+treningu, szczytowe RSS procesu oraz R²/MAE na zbiorze testowym. Każdy model
+trenowany jest w osobnym procesie, więc szczytowe RSS nie miesza się między modelami.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_valuation --rows 50000
+    python -m benchmarks.bench_valuation --rows 20000 --models hist_gbm random_forest
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.valuation import (
+    DEFAULT_FEATURES_CATEGORICAL,
+    DEFAULT_FEATURES_NUMERIC,
+    MODEL_PARAMS,
+    train_custom_model,
+)
+
+
+def make_frame(rows: int, n_models: int = 300, n_generations: int = 1200, seed: int = 0) -> pd.DataFrame:
+    """Syntetyczne oferty: cena zależy od rocznika, przebiegu, pojemności i generacji."""
+    rng = np.random.default_rng(seed)
+    generation_ids = rng.integers(0, n_generations, rows)
+    model_ids = generation_ids % n_models
+    generation_premium = rng.normal(0, 15_000, n_generations)
+    year = rng.integers(1995, 2025, rows)
+    mileage = rng.integers(0, 400_000, rows)
+    engine = rng.integers(900, 4000, rows)
+    fuel = rng.choice(np.array(["Benzyna", "Diesel", "Hybryda"]), rows)
+    price = (
+        20_000
+        + (year - 1995) * 2_500
+        - mileage * 0.08
+        + engine * 6
+        + generation_premium[generation_ids]
+        + np.where(fuel == "Hybryda", 10_000, 0)
+        + rng.normal(0, 5_000, rows)
+    ).clip(1_000, 1_000_000)
+    return pd.DataFrame({
+        "brand": np.array(["Toyota", "BMW", "Audi", "Opel", "Skoda"])[model_ids % 5],
+        "model": pd.Series(model_ids).map(lambda i: f"Model {i}"),
+        "generation": pd.Series(generation_ids).map(lambda i: f"Gen {i}"),
+        "fuel_type": fuel,
+        "transmission": rng.choice(np.array(["Manualna", "Automatyczna"]), rows),
+        "year": year,
+        "mileage_km": mileage,
+        "engine_capacity_cm3": engine,
+        "price_pln": price,
+    })
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bajty
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_model(model_type: str, rows: int, queue) -> None:
+    df = make_frame(rows)
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    _, metrics = train_custom_model(
+        df, model_type, DEFAULT_FEATURES_NUMERIC, DEFAULT_FEATURES_CATEGORICAL,
+        **MODEL_PARAMS[model_type],
+    )
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, _peak_rss_mb(), _peak_rss_mb() - baseline, metrics))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--models", nargs="+", default=["random_forest", "hist_gbm", "ridge", "linear"],
+                        choices=sorted(MODEL_PARAMS))
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'model':<14} {'trening [s]':>11} {'RSS [MB]':>9} {'przyrost [MB]':>13} {'R²':>7} {'MAE [PLN]':>10}")
+    for model_type in args.models:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_model, args=(model_type, args.rows, queue))
+        process.start()
+        elapsed, peak, delta, metrics = queue.get()
+        process.join()
+        print(f"{model_type:<14} {elapsed:>11.2f} {peak:>9.0f} {delta:>13.0f} {metrics['r2']:>7.3f} {metrics['mae']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
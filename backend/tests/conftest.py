@@ -1,6 +1,11 @@
 """
 Konfiguracja pytest - wspólne fixtures dla wszystkich testów.
 """
+import os
+
+# Cache modeli wyceny tylko w pamięci - testy nie zapisują plików w backend/models/
+os.environ.setdefault("VALUATION_CACHE_PERSIST", "0")
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -24,6 +24,25 @@ def test_get_models(client, sample_listings):
     assert "Corolla" in models
 
 
+def test_get_facets(client, sample_listings):
+    """Test endpointu /facets - całe drzewo i poddrzewo jednej marki."""
+    response = client.get("/facets")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 3
+    assert [b["brand"] for b in data["brands"]] == ["BMW", "Toyota"]
+    assert data["fuel_types"] == ["Benzyna", "Diesel"]
+    corolla = data["brands"][1]["models"][0]
+    assert corolla == {
+        "model": "Corolla", "count": 2, "generations": [], "fuel_types": ["Benzyna"],
+        "transmissions": ["Manualna"], "displacements": [1800.0],
+    }
+
+    subtree = client.get("/facets", params={"brand": "Toyota"}).json()
+    assert [b["brand"] for b in subtree["brands"]] == ["Toyota"]
+    assert client.get("/facets", params={"brand": "Fiat"}).json()["brands"] == []
+
+
 def test_get_analysis_endpoint(client, sample_listings):
     """Test endpointu /analysis."""
     response = client.get("/analysis", params={"brand": "Toyota"})
@@ -52,6 +71,26 @@ def test_get_listings_filtered_endpoint(client, sample_listings):
     assert len(data["items"]) == 2
 
 
+def test_listings_filtered_cursor_pagination(client, sample_listings):
+    """Test /listings-filtered - kolejne strony przez next_cursor, błędny kursor to 400."""
+    first = client.get("/listings-filtered", params={"limit": 2, "sort_by": "price"}).json()
+    assert first["total"] == 3
+    assert first["next_cursor"]
+
+    second = client.get("/listings-filtered", params={
+        "limit": 2, "sort_by": "price", "cursor": first["next_cursor"], "include_total": False,
+    }).json()
+    assert second["total"] is None
+    assert second["next_cursor"] is None
+    prices = [item["price_pln"] for item in first["items"] + second["items"]]
+    assert prices == [120000, 90000, 80000]
+
+    response = client.get("/listings-filtered", params={"cursor": first["next_cursor"]})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.get("/listings-filtered", params={"sort_by": "price", "cursor": first["next_cursor"], "offset": 2})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 def test_get_trend_by_year(client, sample_listings):
     """Test endpointu /trend-by-year."""
     response = client.get("/trend-by-year", params={"brand": "Toyota"})
@@ -66,6 +105,107 @@ def test_get_trend_by_year(client, sample_listings):
         assert "avg_price" in point
 
 
+def test_analytics_dashboard_matches_single_endpoints(client, sample_listings):
+    """Test /analytics/dashboard - panele jak z osobnych endpointów, wybór przez fields."""
+    params = {"brand": "Toyota"}
+    response = client.get("/analytics/dashboard", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+
+    analysis = client.get("/analysis", params=params).json()
+    assert data["analysis"] == {k: analysis[k] for k in ("n_offers", "avg_price", "min_price", "max_price")}
+    price_stats = client.get("/analytics/price-statistics", params=params).json()
+    assert data["price_statistics"] == {k: v for k, v in price_stats.items() if k != "filters"}
+    assert data["trend"] == client.get("/trend-by-year", params=params).json()["points"]
+    by_category = client.get("/analytics/price-stats-by-category", params=params).json()
+    assert data["by_fuel_type"] == by_category["by_fuel_type"]
+    assert data["by_transmission"] == by_category["by_transmission"]
+    assert data["price_mileage"] == client.get("/analytics/price-mileage", params=params).json()["points"]
+
+    response = client.get("/analytics/dashboard", params={**params, "fields": "trend,analysis"})
+    data = response.json()
+    assert data["fields"] == ["trend", "analysis"]
+    assert data["analysis"]["n_offers"] == 2
+    assert data["price_statistics"] is None
+    assert data["price_mileage"] is None
+
+    response = client.get("/analytics/dashboard", params={"fields": "trend,histogram"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "histogram" in response.json()["detail"]
+
+
+def test_price_mileage_downsampling_modes(client, sample_listings):
+    """Test /analytics/price-mileage z trybem redukcji - prawdziwa liczba punktów w total."""
+    response = client.get("/analytics/price-mileage", params={"mode": "sample", "target": 10})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["mode"] == "sample"
+    assert data["total"] == len(data["points"])
+
+    data = client.get("/analytics/price-mileage", params={"mode": "grid", "bins": 5}).json()
+    assert data["points"] == []
+    assert sum(cell["count"] for cell in data["cells"]) == data["total"]
+
+    response = client.get("/analytics/price-mileage", params={"mode": "kde"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_fast_json_responses_match_schemas(client, db, sample_listings):
+    """Odpowiedzi budowane bez Pydantic (orjson) są zgodne ze schematami odpowiedzi."""
+    from app import schemas
+
+    data = client.get("/listings-filtered", params={"limit": 2}).json()
+    parsed = schemas.ListingsResponse.model_validate(data)
+    assert data["items"] == [item.model_dump() for item in parsed.items]
+    expected = schemas.Listing.model_validate(db.get(type(sample_listings[0]), data["items"][0]["id"]))
+    assert data["items"][0] == expected.model_dump()
+
+    rows = client.get("/analytics/price-mileage").json()
+    schemas.PriceMileageResponse.model_validate(rows)
+    columns = client.get("/analytics/price-mileage", params={"shape": "columns"}).json()
+    schemas.PriceMileageResponse.model_validate(columns)
+    assert columns["shape"] == "columns"
+    assert columns["points"] == {
+        "price_pln": [p["price_pln"] for p in rows["points"]],
+        "mileage_km": [p["mileage_km"] for p in rows["points"]],
+    }
+
+    grid = client.get("/analytics/price-mileage", params={"mode": "grid", "bins": 5, "shape": "columns"}).json()
+    assert sum(grid["cells"]["count"]) == grid["total"]
+    assert grid["points"] == {"price_pln": [], "mileage_km": []}
+    response = client.get("/analytics/price-mileage", params={"shape": "matrix"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    dashboard = client.get("/analytics/dashboard").json()
+    assert dashboard == schemas.DashboardResponse.model_validate(dashboard).model_dump()
+    assert dashboard["price_mileage_shape"] == "rows"
+    dashboard_columns = client.get("/analytics/dashboard", params={"fields": "price_mileage", "shape": "columns"}).json()
+    schemas.DashboardResponse.model_validate(dashboard_columns)
+    assert dashboard_columns["price_mileage"] == {
+        "price_pln": [p["price_pln"] for p in dashboard["price_mileage"]],
+        "mileage_km": [p["mileage_km"] for p in dashboard["price_mileage"]],
+    }
+    assert dashboard_columns["analysis"] is None
+    response = client.get("/analytics/dashboard", params={"shape": "matrix"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_compare_vehicles_downsamples_price_mileage(client, sample_listings):
+    """Test /compare/vehicles - punkty cena/przebieg po redukcji z liczbą wszystkich punktów."""
+    payload = {
+        "vehicle_a": {"brand": "Toyota", "model": "Corolla"},
+        "vehicle_b": {"brand": "BMW", "model": "Series 3"},
+        "price_mileage_mode": "sample",
+        "price_mileage_target": 10,
+    }
+    response = client.post("/compare/vehicles", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["price_mileage_mode"] == "sample"
+    assert data["price_mileage_total_a"] == len(data["price_mileage_a"])
+    assert data["metrics_a"]["n_offers"] >= data["price_mileage_total_a"]
+
+
 def test_valuation_endpoint_requires_data(client, db):
     """Test endpointu /valuation - wymaga danych w bazie."""
     # Upewnij się że tabele są utworzone
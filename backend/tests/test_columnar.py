@@ -0,0 +1,142 @@
+"""
+Testy kolumnowego snapshotu ofert (app.columnar) - wyniki jak ścieżka SQL.
+"""
+import numpy as np
+import pytest
+
+from app import columnar, crud
+from app.models import Listing
+
+
+@pytest.fixture
+def random_listings(db):
+    """Kilkaset ofert z brakami (NULL) w kolumnach opcjonalnych."""
+    rng = np.random.default_rng(7)
+    brands = {"Toyota": ["Corolla", "Yaris"], "BMW": ["Seria 3", "X5"], "Audi": ["A4"]}
+    listings = []
+    for i in range(400):
+        brand = list(brands)[i % 3]
+        models = brands[brand]
+        listings.append(Listing(
+            vehicle_brand=brand,
+            vehicle_model=models[int(rng.integers(len(models)))],
+            vehicle_generation=[None, "I", "II"][int(rng.integers(3))],
+            production_year=int(rng.integers(2005, 2024)),
+            mileage_km=None if i % 17 == 0 else float(rng.integers(0, 300_000)),
+            price_pln=float(rng.integers(10_000, 200_000)),
+            currency="PLN",
+            fuel_type=[None, "Benzyna", "Diesel"][int(rng.integers(3))],
+            transmission=["Manualna", "Automatyczna"][int(rng.integers(2))],
+            displacement_cm3=None if i % 13 == 0 else float(rng.integers(1000, 3000)),
+            offer_publication_date=None if i % 11 == 0 else f"{int(rng.integers(1, 28)):02d}.{int(rng.integers(1, 13)):02d}.2024",
+        ))
+    db.add_all(listings)
+    db.commit()
+    return listings
+
+
+FILTER_CASES = [
+    {},
+    {"brand": "Toyota"},
+    {"brand": "Toyota", "model": "Yaris"},
+    {"model": "X5"},
+    {"brand": "BMW", "model": "Corolla"},
+    {"brand": "Fiat"},
+    {"generation": "II", "fuel_type": "Diesel"},
+    {"year_min": 2010, "year_max": 2015, "mileage_max": 150_000},
+    {"displacement_min": 1500, "displacement_max": 2500},
+    {"date_from": "01.03.2024", "date_to": "30.06.2024"},
+    {"brand": "Audi", "year_min": 2030},
+]
+
+
+def _filters(case):
+    keys = ["brand", "model", "generation", "year_min", "year_max", "mileage_max",
+            "date_from", "date_to", "displacement_min", "displacement_max", "fuel_type"]
+    return {k: case.get(k) for k in keys}
+
+
+def _results(db):
+    out = []
+    for case in FILTER_CASES:
+        f = _filters(case)
+        out.append((
+            tuple(crud.get_analysis(db, **f)),
+            crud.get_price_statistics(db, **f),
+            crud.get_grouped_price_stats(db, ["year", "fuel_type", "generation", "model"], **f),
+            crud.get_price_mileage_data(db, **f, limit=10_000),
+        ))
+    return out
+
+
+def test_snapshot_matches_sql(db, random_listings, monkeypatch):
+    """Filtry i agregaty ze snapshotu dają te same wyniki co zapytania SQL."""
+    monkeypatch.setattr(columnar.snapshot_store, "enabled", True)
+    from_snapshot = _results(db)
+    assert columnar.snapshot_store.current(db).n_rows == 400
+
+    monkeypatch.setattr(columnar.snapshot_store, "enabled", False)
+    from_sql = _results(db)
+
+    for (analysis_s, stats_s, grouped_s, points_s), (analysis_q, stats_q, grouped_q, points_q) in zip(from_snapshot, from_sql):
+        assert analysis_s[0] == analysis_q[0]
+        assert analysis_s[1:] == pytest.approx(analysis_q[1:])
+        assert stats_s == pytest.approx(stats_q)
+        assert grouped_s == grouped_q
+        # Kolejność punktów zależy od kolejności skanu - porównujemy zbiory
+        key = lambda p: (p["price_pln"], p["mileage_km"])
+        assert sorted(points_s, key=key) == sorted(points_q, key=key)
+
+
+def test_dashboard_sql_and_snapshot_match_single_functions(db, random_listings, monkeypatch):
+    """get_dashboard (ścieżka SQL i snapshot) = wyniki funkcji pojedynczych paneli."""
+    for enabled in (False, True):
+        monkeypatch.setattr(columnar.snapshot_store, "enabled", enabled)
+        for case in FILTER_CASES:
+            f = _filters(case)
+            panels = crud.get_dashboard(db, list(crud.DASHBOARD_FIELDS), **f, price_mileage_limit=10_000)
+            assert panels["analysis"][0] == crud.get_analysis(db, **f)[0]
+            assert panels["analysis"][1:] == pytest.approx(tuple(crud.get_analysis(db, **f))[1:])
+            assert panels["price_statistics"] == pytest.approx(crud.get_price_statistics(db, **f))
+            assert panels["trend"] == crud.get_trend_by_year(db, **f)
+            assert panels["by_category"] == crud.get_price_stats_by_category(db, **f)
+            # Kolejność punktów zależy od planu zapytania (indeks lub tabela) - porównujemy zbiory
+            key = lambda p: (p["price_pln"], p["mileage_km"])
+            assert sorted(panels["price_mileage"]["points"], key=key) == \
+                sorted(crud.get_price_mileage_data(db, **f, limit=10_000), key=key)
+
+
+def test_snapshot_rebuilt_after_data_change(db, random_listings):
+    """Zmiana ofert zmienia wersję danych - kolejne żądanie dostaje nowy snapshot."""
+    store = columnar.SnapshotStore(enabled=True)
+    first = store.current(db)
+    assert store.current(db) is first
+
+    db.add(Listing(vehicle_brand="Fiat", vehicle_model="Panda", production_year=2015,
+                   price_pln=20000, currency="PLN"))
+    db.commit()
+
+    second = store.current(db)
+    assert second is not first
+    assert second.n_rows == first.n_rows + 1
+    assert second.analysis(second.select(brand="Fiat")) == (1, 20000.0, 20000.0, 20000.0)
+
+
+def test_grouped_stats_presorted_matches_lexsort():
+    """Grupowanie po posortowanych cenach (stabilne sortowanie kodów) = lexsort."""
+    from app.stats import grouped_stats_from_codes
+
+    rng = np.random.default_rng(1)
+    codes = rng.integers(-1, 5, 1000).astype(np.int16)
+    values = rng.normal(50_000, 10_000, 1000)
+    values[::50] = np.nan
+    labels = np.array(["a", "b", "c", "d", "e"], dtype=object)
+
+    order = np.argsort(values, kind="stable")
+    presorted = grouped_stats_from_codes(codes[order], labels, values[order], presorted=True)
+    regular = grouped_stats_from_codes(codes, labels, values)
+    assert [g["key"] for g in presorted] == [g["key"] for g in regular]
+    for a, b in zip(presorted, regular):
+        assert a["n"] == b["n"]
+        assert a["median"] == pytest.approx(b["median"])
+        assert a["quantiles"] == pytest.approx(b["quantiles"])
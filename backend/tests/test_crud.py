@@ -21,6 +21,38 @@ def test_get_models_by_brand(db, sample_listings):
     assert len(models) >= 1
 
 
+def test_facet_catalog_matches_distinct_queries(db, sample_listings):
+    """Listy z katalogu facet = SELECT DISTINCT po listings; nowa oferta przebudowuje katalog."""
+    from sqlalchemy import select
+    from app.facets import facet_store
+
+    db.add(Listing(vehicle_brand="Toyota", vehicle_model="Corolla", vehicle_generation="XII",
+                   production_year=2020, price_pln=85000, currency="PLN", fuel_type="Hybryda",
+                   displacement_cm3=1600))
+    db.commit()
+
+    def distinct(column, *where):
+        stmt = select(column).where(column.isnot(None), *where).distinct().order_by(column)
+        return db.execute(stmt).scalars().all()
+
+    corolla = (Listing.vehicle_brand == "Toyota", Listing.vehicle_model == "Corolla")
+    assert crud.get_brands(db) == distinct(Listing.vehicle_brand)
+    assert crud.get_models_by_brand(db, "BMW") == distinct(Listing.vehicle_model, Listing.vehicle_brand == "BMW")
+    assert crud.get_generations_by_brand_model(db, "Toyota", "Corolla") == ["XII"]
+    assert crud.get_fuel_types_by_brand_model(db, "Toyota", "Corolla") == distinct(Listing.fuel_type, *corolla)
+    assert crud.get_displacements_by_brand_model(db, "Toyota", "Corolla") == [1600.0, 1800.0]
+    assert crud.get_fuel_types(db) == distinct(Listing.fuel_type)
+    assert crud.get_transmissions(db) == distinct(Listing.transmission)
+    assert crud.get_models_by_brand(db, "Fiat") == []
+
+    first = facet_store.current(db)
+    assert facet_store.current(db) is first
+    db.delete(sample_listings[1])
+    db.commit()
+    assert facet_store.current(db) is not first
+    assert crud.get_brands(db) == ["Toyota"]
+
+
 def test_get_analysis(db, sample_listings):
     """Test funkcji get_analysis."""
     n_offers, avg_price, min_price, max_price = crud.get_analysis(
@@ -84,3 +116,181 @@ def test_parse_date():
     assert parse_date("") is None
     assert parse_date(None) is None
 
+
+
+def test_grouped_stats_matches_numpy():
+    """Test silnika statystyk grupowanych - mediana i kwartyle jak w NumPy."""
+    import numpy as np
+    from app.stats import grouped_stats
+
+    keys = [2020, 2019, 2020, 2020, None, 2019, 2021]
+    values = [100, 50, 300, 200, 999, 70, None]
+    groups = {g["key"]: g for g in grouped_stats(keys, values)}
+
+    assert sorted(groups) == [2019, 2020]
+    assert groups[2019]["n"] == 2
+    assert groups[2019]["median"] == 60
+    assert groups[2020]["mean"] == 200
+    assert groups[2020]["median"] == float(np.median([100, 300, 200]))
+    assert groups[2020]["quantiles"][0.25] == float(np.percentile([100, 300, 200], 25))
+
+
+def test_trend_and_category_stats(db, sample_listings):
+    """Test trendu wg roku i statystyk wg kategorii (jedno zapytanie)."""
+    trend = crud.get_trend_by_year(
+        db, brand="Toyota", model=None, generation=None,
+        year_min=None, year_max=None, mileage_max=None,
+    )
+    assert [p["year"] for p in trend] == [2020, 2021]
+    assert trend[0]["median_price"] == 80000
+    assert trend[1]["n_offers"] == 1
+
+    by_fuel, by_trans = crud.get_price_stats_by_category(
+        db, brand=None, model=None, generation=None,
+        year_min=None, year_max=None, mileage_max=None,
+    )
+    fuel = {item["category"]: item for item in by_fuel}
+    assert fuel["Benzyna"]["n_offers"] == 2
+    assert fuel["Benzyna"]["median_price"] == 85000
+    assert {item["category"] for item in by_trans} == {"Manualna", "Automatyczna"}
+
+
+def test_publication_date_filter_and_range(db, sample_listings):
+    """Test filtrowania po dacie publikacji (kolumna ISO) i zakresu dat."""
+    assert sample_listings[1].offer_publication_date_iso == "2024-02-15"
+
+    n_offers, _, _, _ = crud.get_analysis(
+        db, brand=None, model=None, generation=None,
+        year_min=None, year_max=None, mileage_max=None,
+        date_from="10.02.2024", date_to="31.03.2024",
+    )
+    assert n_offers == 2
+
+    assert crud.get_publication_date_range(db) == ("01.01.2024", "20.03.2024")
+
+
+def test_migration_backfills_publication_date_iso(tmp_path):
+    """Test migracji - dodanie kolumny ISO i uzupełnienie istniejących rekordów."""
+    from sqlalchemy import create_engine, inspect, text
+    from app.migrations import run_migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE listings (id INTEGER PRIMARY KEY, offer_publication_date VARCHAR)"))
+        conn.execute(text("INSERT INTO listings VALUES (1, '05.11.2023'), (2, 'brak'), (3, NULL), "
+                          "(4, '5.1.2024'), (5, '39.19.2024'), (6, '05.11.2023')"))
+
+    run_migrations(engine)
+    run_migrations(engine)  # idempotentne
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, offer_publication_date_iso FROM listings ORDER BY id")).all()
+    # Te same reguły co walidator modelu (publication_date_to_iso)
+    assert rows == [(1, "2023-11-05"), (2, None), (3, None), (4, "2024-01-05"), (5, None), (6, "2023-11-05")]
+    index_names = {ix["name"] for ix in inspect(engine).get_indexes("listings")}
+    assert "ix_listings_offer_publication_date_iso" in index_names
+
+
+def test_migration_replaces_single_column_indexes(tmp_path):
+    """Migracja tworzy indeksy złożone i usuwa zastąpione indeksy pojedynczych kolumn."""
+    from sqlalchemy import create_engine, inspect, text
+    from app.migrations import OBSOLETE_LISTING_INDEXES, run_migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE listings (id INTEGER PRIMARY KEY, price_pln FLOAT, vehicle_brand VARCHAR, "
+            "vehicle_model VARCHAR, vehicle_generation VARCHAR, production_year INTEGER, mileage_km FLOAT, "
+            "fuel_type VARCHAR, transmission VARCHAR, offer_publication_date VARCHAR)"
+        ))
+        for name, column in [("ix_listings_vehicle_brand", "vehicle_brand"),
+                             ("ix_listings_production_year", "production_year"),
+                             ("ix_listings_fuel_type", "fuel_type")]:
+            conn.execute(text(f"CREATE INDEX {name} ON listings ({column})"))
+
+    run_migrations(engine)
+    run_migrations(engine)  # idempotentne
+
+    index_names = {ix["name"] for ix in inspect(engine).get_indexes("listings")}
+    assert {ix.name for ix in Listing.__table__.indexes} <= index_names
+    assert not index_names & set(OBSOLETE_LISTING_INDEXES)
+
+
+PLAN_FILTERS = {"brand": "Toyota", "model": "Corolla", "generation": None,
+                "year_min": 2010, "year_max": 2022, "mileage_max": None}
+
+
+@pytest.mark.parametrize("query, index", [
+    (lambda db: crud.get_analysis(db, **PLAN_FILTERS), "ix_listings_brand_model_generation_year_price_mileage"),
+    (lambda db: crud.get_price_statistics(db, **PLAN_FILTERS), "ix_listings_brand_model_generation_year_price_mileage"),
+    (lambda db: crud.get_trend_by_year(db, **PLAN_FILTERS), "ix_listings_brand_model_generation_year_price_mileage"),
+    (lambda db: crud.get_price_mileage_data(db, **PLAN_FILTERS), "ix_listings_brand_model_generation_year_price_mileage"),
+    (lambda db: crud.get_trend_by_year(db, None, None, None, 2015, None, None), "ix_listings_year_price_mileage"),
+    (lambda db: crud.get_analysis(db, None, None, None, None, None, None, fuel_type="Diesel"),
+     "ix_listings_fuel_year_price_mileage"),
+])
+def test_crud_queries_use_covering_indexes(db, sample_listings, monkeypatch, query, index):
+    """EXPLAIN QUERY PLAN zapytań SQL crud: wyszukiwanie po indeksie złożonym bez odczytu wierszy tabeli."""
+    from sqlalchemy import event
+    from app import columnar
+
+    monkeypatch.setattr(columnar.snapshot_store, "enabled", False)
+    engine = db.get_bind()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM listings" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        query(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements
+    for statement, parameters in statements:
+        plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        details = " ".join(row[-1] for row in plan)
+        assert f"USING COVERING INDEX {index}" in details, details
+
+
+@pytest.mark.parametrize("sort_by", ["year", "mileage", "price", "brand", "model"])
+@pytest.mark.parametrize("sort_dir", ["asc", "desc"])
+def test_keyset_pages_match_offset_pages(db, sample_listings, sort_by, sort_dir):
+    """Strony z kursora = strony z offset; remisy i NULL-e przebiegu bez zgubionych i powtórzonych ofert."""
+    db.add_all([
+        Listing(vehicle_brand="Toyota", vehicle_model="Yaris", production_year=2020, mileage_km=None,
+                price_pln=80000, currency="PLN"),
+        Listing(vehicle_brand="Toyota", vehicle_model="Yaris", production_year=2020, mileage_km=None,
+                price_pln=45000, currency="PLN"),
+        Listing(vehicle_brand="BMW", vehicle_model="X5", production_year=2019, mileage_km=50000,
+                price_pln=120000, currency="PLN"),
+    ])
+    db.commit()
+    filters = [None] * 6
+
+    total, everything = crud.get_listings_filtered(db, *filters, limit=100, sort_by=sort_by, sort_dir=sort_dir)
+    assert total == 6
+
+    seen, cursor = [], None
+    while True:
+        page_total, items = crud.get_listings_filtered(db, *filters, limit=2, sort_by=sort_by, sort_dir=sort_dir,
+                                                       cursor=cursor, include_total=False)
+        assert page_total is None
+        if not items:
+            break
+        _, by_offset = crud.get_listings_filtered(db, *filters, limit=2, offset=len(seen), sort_by=sort_by, sort_dir=sort_dir)
+        assert [l.id for l in items] == [l.id for l in by_offset]
+        seen.extend(items)
+        cursor = crud.encode_listings_cursor(sort_by, sort_dir, items[-1])
+    assert [l.id for l in seen] == [l.id for l in everything]
+
+
+def test_listings_cursor_rejects_other_sort(db, sample_listings):
+    _, items = crud.get_listings_filtered(db, *[None] * 6, limit=1, sort_by="price")
+    cursor = crud.encode_listings_cursor("price", "desc", items[0])
+    with pytest.raises(ValueError):
+        crud.get_listings_filtered(db, *[None] * 6, sort_by="year", cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.get_listings_filtered(db, *[None] * 6, cursor="nie-kursor")
@@ -0,0 +1,63 @@
+"""
+Testy redukcji punktów cena vs przebieg (app.downsampling).
+"""
+import numpy as np
+import pytest
+
+from app import downsampling
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(3)
+    mileages = rng.uniform(0, 300_000, 20_000)
+    prices = 120_000 - mileages * 0.3 + rng.normal(0, 8_000, 20_000)
+    # Kilka odstających ofert w pustym rogu wykresu
+    mileages[:3] = [10, 20, 30]
+    prices[:3] = [900_000, 950_000, 1_000_000]
+    return prices, mileages
+
+
+@pytest.mark.parametrize("mode", ["sample", "stratified", "lttb"])
+def test_point_modes_return_target_points_and_total(points, mode):
+    prices, mileages = points
+    result = downsampling.downsample_price_mileage(prices, mileages, mode, target=500, bins=20)
+    assert result["total"] == 20_000
+    assert len(result["points"]) == 500
+    # Punkty pochodzą ze zbioru wejściowego, bez powtórzeń
+    pairs = {(p["price_pln"], p["mileage_km"]) for p in result["points"]}
+    assert len(pairs) == 500
+    assert pairs <= set(zip(prices.tolist(), mileages.tolist()))
+
+
+def test_stratified_and_lttb_keep_outliers(points):
+    prices, mileages = points
+    for mode in ("stratified", "lttb"):
+        result = downsampling.downsample_price_mileage(prices, mileages, mode, target=200, bins=20)
+        # Odstające oferty leżą w jednej komórce - co najmniej jedna zostaje w próbce
+        assert max(p["price_pln"] for p in result["points"]) >= 900_000
+
+
+@pytest.mark.parametrize("mode", ["grid", "hexbin"])
+def test_density_modes_count_every_point(points, mode):
+    prices, mileages = points
+    result = downsampling.downsample_price_mileage(prices, mileages, mode, bins=30)
+    assert result["points"] == []
+    assert sum(cell["count"] for cell in result["cells"]) == 20_000
+    assert result["cell_size"]["mileage_km"] > 0
+    for cell in result["cells"]:
+        assert mileages.min() - result["cell_size"]["mileage_km"] <= cell["mileage_km"] <= mileages.max() + result["cell_size"]["mileage_km"]
+
+
+def test_none_mode_limit_and_small_inputs(points):
+    prices, mileages = points
+    result = downsampling.downsample_price_mileage(prices, mileages, "none", limit=100)
+    assert len(result["points"]) == 100 and result["total"] == 20_000
+
+    empty = downsampling.downsample_price_mileage(np.empty(0), np.empty(0), "hexbin")
+    assert empty == {"mode": "hexbin", "total": 0, "points": [], "cells": [], "cell_size": None}
+    few = downsampling.downsample_price_mileage(prices[:5], mileages[:5], "lttb", target=50)
+    assert len(few["points"]) == 5
+
+    with pytest.raises(ValueError):
+        downsampling.downsample_price_mileage(prices, mileages, "kde")
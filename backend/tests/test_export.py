@@ -0,0 +1,52 @@
+"""
+Testy strumieniowego eksportu ofert (/listings/export, app.export).
+"""
+import csv
+import io
+import json
+
+import pytest
+from fastapi import status
+
+from app import export
+
+
+def test_export_ndjson_with_filters(client, sample_listings):
+    response = client.get("/listings/export", params={"brand": "Toyota"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["price_pln"] for row in rows] == [80000, 90000]
+    assert set(rows[0]) == set(export.EXPORT_COLUMNS)
+
+
+def test_export_csv_columns_projection(client, sample_listings):
+    response = client.get("/listings/export", params={"format": "csv", "columns": "vehicle_brand,price_pln"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "attachment" in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [["vehicle_brand", "price_pln"], ["Toyota", "80000.0"], ["BMW", "120000.0"], ["Toyota", "90000.0"]]
+
+
+def test_export_streams_in_batches(db, sample_listings):
+    """Każda paczka kursora to osobny fragment odpowiedzi."""
+    stmt = export.export_statement(["id"])
+    chunks = list(export.stream_ndjson(db.get_bind(), stmt, ["id"], batch_size=2))
+    assert len(chunks) == 2
+    assert b"".join(chunks).count(b"\n") == 3
+
+
+def test_export_rejects_unknown_format_and_columns(client, sample_listings, monkeypatch):
+    assert client.get("/listings/export", params={"format": "xlsx"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/listings/export", params={"columns": "price_pln,password"}).status_code == status.HTTP_400_BAD_REQUEST
+    monkeypatch.setattr(export, "PARQUET_AVAILABLE", False)
+    assert client.get("/listings/export", params={"format": "parquet"}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_parquet(client, sample_listings):
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/listings/export", params={"format": "parquet", "columns": "id,vehicle_brand,mileage_km"})
+    assert response.status_code == status.HTTP_200_OK
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == ["id", "vehicle_brand", "mileage_km"]
+    assert table.column("vehicle_brand").to_pylist() == ["Toyota", "BMW", "Toyota"]
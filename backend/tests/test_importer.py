@@ -0,0 +1,72 @@
+"""
+Testy importera CSV (app.importer).
+"""
+import pandas as pd
+
+from app.importer import count_csv_rows, import_csv, import_dataframe
+from app.models import Listing
+
+
+def _rows():
+    return [
+        {"ID": 1, "Price": 50000, "Currency": "PLN", "Marka pojazdu": "Toyota", "Model pojazdu": "Corolla",
+         "Rok produkcji": 2018, "Przebieg": "120 000 km", "Moc": "132 KM", "Pojemność skokowa": "1 598 cm3",
+         "Pierwszy właściciel": "Yes", "date": "05.11.2023"},
+        {"ID": 2, "Price": 80000, "Currency": "PLN", "Marka pojazdu": "BMW", "Model pojazdu": "X3",
+         "Rok produkcji": 2019, "Przebieg": "60 000 km", "Pierwszy właściciel": "No", "date": "01.02.2024"},
+        # Duplikat ID - zostaje ostatnie wystąpienie
+        {"ID": 2, "Price": 81000, "Currency": "PLN", "Marka pojazdu": "BMW", "Model pojazdu": "X3",
+         "Rok produkcji": 2019},
+        # Brak wymaganej marki - błąd
+        {"ID": 3, "Price": 10000, "Currency": "PLN", "Rok produkcji": 2010},
+        # Brak ceny - wiersz odrzucany bez liczenia jako błąd
+        {"ID": 4, "Currency": "PLN", "Marka pojazdu": "Opel", "Model pojazdu": "Astra", "Rok produkcji": 2012},
+    ]
+
+
+def test_import_dataframe_insert_and_update(db):
+    """Pierwszy import wstawia rekordy, ponowny aktualizuje istniejące."""
+    engine = db.get_bind()
+    stats = import_dataframe(pd.DataFrame(_rows()), engine)
+    assert stats == {"inserted": 2, "updated": 0, "skipped": 1, "errors": 1, "total_processed": 2}
+
+    toyota = db.get(Listing, 1)
+    assert toyota.mileage_km == 120000
+    assert toyota.power_hp == 132
+    assert toyota.displacement_cm3 == 1598
+    assert toyota.first_owner is True
+    assert toyota.offer_publication_date_iso == "2023-11-05"
+    assert db.get(Listing, 2).price_pln == 81000
+
+    rows = _rows()
+    rows[0]["Price"] = 48000
+    stats = import_dataframe(pd.DataFrame(rows), engine)
+    assert stats["inserted"] == 0
+    assert stats["updated"] == 2
+    db.expire_all()
+    assert db.get(Listing, 1).price_pln == 48000
+
+
+def test_import_csv_missing_file(tmp_path, db):
+    """Brak pliku CSV zgłasza FileNotFoundError."""
+    import pytest
+
+    with pytest.raises(FileNotFoundError):
+        import_csv(tmp_path / "brak.csv", db.get_bind())
+
+
+def test_import_csv_streaming_matches_full_read(tmp_path, db):
+    """Import strumieniowy (chunksize) zapisuje te same dane co odczyt całego pliku (ostatnie wystąpienie ID)."""
+    csv_path = tmp_path / "oferty.csv"
+    # Duplikat ID 2 trafia do innego kawałka niż pierwsze wystąpienie
+    pd.DataFrame(_rows()).to_csv(csv_path, index=False)
+    assert count_csv_rows(csv_path) == 5
+
+    progress = []
+    stats = import_csv(csv_path, db.get_bind(), chunksize=1,
+                       progress_callback=lambda n, s: progress.append((n, s["inserted"])))
+    # Duplikat z innego kawałka nadpisuje rekord przez ON CONFLICT - liczony jako updated
+    assert stats == {"inserted": 2, "updated": 1, "skipped": 0, "errors": 1, "total_processed": 3}
+    assert [n for n, _ in progress] == [1, 2, 3, 4, 5]
+    assert progress[-1][1] == 2
+    assert db.get(Listing, 2).price_pln == 81000
@@ -0,0 +1,136 @@
+"""
+Testy cache odpowiedzi (app.response_cache): LRU/TTL, ETag i unieważnianie po zmianie danych.
+"""
+import time
+
+from app.data_version import get_data_version
+from app.models import Listing
+from app.response_cache import ResponseCache, cache_key, etag_matches
+
+
+def test_cache_key_ignores_parameter_order():
+    """Kolejność parametrów w URL nie zmienia klucza."""
+    assert cache_key("/analysis", [("brand", "BMW"), ("year_min", "2010")]) == \
+        cache_key("/analysis", [("year_min", "2010"), ("brand", "BMW")])
+    assert cache_key("/analysis", [("brand", "BMW")]) != cache_key("/models", [("brand", "BMW")])
+
+
+def test_lru_eviction_ttl_and_version():
+    """Limit wpisów usuwa najdawniej używany wpis, TTL i nowa wersja danych unieważniają."""
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.sync_version("v1")
+    cache.put("a", b"A", {})
+    cache.put("b", b"B", {})
+    assert cache.get("a")["body"] == b"A"  # "a" ostatnio używany
+    cache.put("c", b"C", {})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    cache.sync_version("v2")
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["invalidations"] == 1
+    assert stats["hit_ratio"] == 0.6  # 3 trafienia na 5 odczytów
+
+    expiring = ResponseCache(ttl_seconds=0.01)
+    expiring.put("a", b"A", {})
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_put_skips_response_computed_for_old_version():
+    """Wersja zmieniona w trakcie liczenia odpowiedzi - nieaktualna treść nie trafia do cache."""
+    cache = ResponseCache()
+    cache.sync_version("v1")
+    # Równoległe żądanie zobaczyło nową wersję, zanim odpowiedź dla "v1" została zapisana
+    cache.sync_version("v2")
+    entry = cache.put("a", b"stale", {}, data_version="v1")
+    assert entry["body"] == b"stale"
+    assert cache.get("a") is None
+
+    cache.put("a", b"fresh", {}, data_version="v2")
+    assert cache.get("a")["body"] == b"fresh"
+
+
+def test_version_bump_during_request_is_not_cached(client, db, sample_listings):
+    """Zmiana danych między call_next a zapisem - odpowiedź wysłana, ale niezapisana."""
+    from app import response_cache as response_cache_module
+    from app.data_version import bump_data_version
+
+    cache = response_cache_module.response_cache
+    original_put = cache.put
+
+    def put_after_bump(*args, **kwargs):
+        with db.get_bind().begin() as conn:
+            bump_data_version(conn)
+        cache.sync_version(get_data_version(db.get_bind()))
+        return original_put(*args, **kwargs)
+
+    cache.put = put_after_bump
+    try:
+        response = client.get("/brands")
+    finally:
+        del cache.put
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    assert cache.stats()["entries"] == 0
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_second_request_served_from_cache_with_etag(client, sample_listings):
+    """Drugie identyczne żądanie pochodzi z cache; If-None-Match daje 304 bez treści."""
+    first = client.get("/analysis", params={"brand": "Toyota", "year_min": 2015})
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+    etag = first.headers["ETag"]
+
+    second = client.get("/analysis", params={"year_min": 2015, "brand": "Toyota"})
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["ETag"] == etag
+    assert second.json() == first.json()
+    # Nagłówki bezpieczeństwa także dla odpowiedzi z cache
+    assert second.headers["X-Content-Type-Options"] == "nosniff"
+
+    not_modified = client.get("/analysis", params={"brand": "Toyota", "year_min": 2015},
+                              headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_data_change_invalidates_cache(client, db, sample_listings):
+    """Nowa oferta zmienia wersję danych - odpowiedź liczona od nowa, stary ETag nie pasuje."""
+    first = client.get("/brands")
+    assert "Fiat" not in first.json()
+
+    db.add(Listing(vehicle_brand="Fiat", vehicle_model="Panda", production_year=2015,
+                   price_pln=20000, currency="PLN"))
+    db.commit()
+
+    response = client.get("/brands", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    assert "Fiat" in response.json()
+
+
+def test_errors_are_not_cached(client, sample_listings):
+    response = client.get("/analytics/dashboard", params={"fields": "unknown"})
+    assert response.status_code == 400
+    assert "X-Cache" not in response.headers
+
+
+def test_admin_cache_stats(client, admin_headers, sample_listings):
+    client.get("/brands")
+    client.get("/brands")
+    stats = client.get("/admin/analytics/cache", headers=admin_headers).json()
+    assert stats["hits"] >= 1
+    assert stats["hit_ratio"] is not None
+
+    assert client.delete("/admin/analytics/cache", headers=admin_headers).status_code == 200
+    assert client.get("/admin/analytics/cache", headers=admin_headers).json()["entries"] == 0
@@ -0,0 +1,64 @@
+"""
+Testy integracji ze scraperem (bez uruchamiania samego scrapera).
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+
+from app.models import Listing
+from app.scraper_integration import count_offers_scraped, export_known_ids
+
+
+def test_export_known_ids(db, sample_listings, tmp_path):
+    """Eksport ID ofert z bazy do pliku .npy dla trybu przyrostowego."""
+    path = tmp_path / "known_ids.npy"
+    n = export_known_ids(db.get_bind(), path)
+
+    ids = np.load(path)
+    assert n == len(ids) == db.query(Listing).count()
+    assert set(ids.tolist()) == {listing.id for listing in db.query(Listing).all()}
+    assert not (tmp_path / "known_ids.npy.tmp").exists()
+
+
+def test_import_progress_callback_updates_status(db, tmp_path, monkeypatch):
+    """Postęp importu CSV (per kawałek) trafia do statusu zapisywanego w JSON."""
+    import pandas as pd
+    from app import scraper_integration
+    from app.importer import import_csv
+
+    csv_path = tmp_path / "oferty.csv"
+    pd.DataFrame([
+        {"ID": i, "Price": 1000 * i, "Currency": "PLN", "Marka pojazdu": "Opel",
+         "Model pojazdu": "Astra", "Rok produkcji": 2015}
+        for i in range(1, 5)
+    ]).to_csv(csv_path, index=False)
+
+    saved = []
+    monkeypatch.setattr(scraper_integration, "save_status", lambda s: saved.append(dict(s)))
+    status = {"id": "x", "progress_percent": 0}
+    callback = scraper_integration.import_progress_callback(status, csv_path, 0, 100)
+    import_csv(csv_path, db.get_bind(), chunksize=2, progress_callback=callback)
+
+    assert [s["progress_percent"] for s in saved] == [50, 100]
+    assert saved[-1]["import_progress"]["rows_total"] == 4
+    assert saved[-1]["import_progress"]["stats"]["inserted"] == 4
+
+
+def test_count_offers_scraped_from_checkpoints(tmp_path):
+    """Liczone są tylko oferty dopisane w tym uruchomieniu (rows_written_run), nie cały CSV marki."""
+    started = datetime(2026, 3, 1, 12, 0, 0)  # second == 0 - tolerancja nie może rzucić ValueError
+
+    def checkpoint(brand, updated_at, rows_written, rows_written_run):
+        (tmp_path / f"{brand}.checkpoint.json").write_text(json.dumps({
+            "brand": brand, "rows_written": rows_written, "rows_written_run": rows_written_run,
+            "completed": True, "updated_at": updated_at.isoformat(),
+        }), encoding="utf-8")
+        # Plik CSV z wierszami z wcześniejszych uruchomień nie wpływa na wynik
+        (tmp_path / f"{brand}.csv").write_text("ID\n" + "1\n" * rows_written, encoding="utf-8")
+
+    checkpoint("toyota", datetime(2026, 3, 1, 14, 0), rows_written=300, rows_written_run=100)  # wznowiona
+    checkpoint("bmw", datetime(2026, 3, 1, 11, 59, 59, 500000), rows_written=50, rows_written_run=50)  # w tolerancji
+    checkpoint("audi", datetime(2026, 2, 27, 9, 0), rows_written=200, rows_written_run=200)  # ukończona wcześniej
+
+    assert count_offers_scraped(tmp_path, ["toyota", "bmw", "audi", "opel"], started) == 150
@@ -0,0 +1,318 @@
+"""
+Testy wyceny: cache modeli (app.model_cache), wersja danych (app.data_version)
+i endpoint /valuation.
+"""
+import pandas as pd
+import pytest
+from fastapi import status
+
+from app import valuation as valuation_engine
+from app.data_version import get_data_version
+from app.importer import import_dataframe
+from app.model_cache import ModelCache
+from app.models import Listing
+
+
+def _trainer(calls, model="model"):
+    def train():
+        calls.append(model)
+        return model, {"r2": 1.0}
+    return train
+
+
+def test_model_cache_hit_and_miss():
+    cache = ModelCache(max_entries=4)
+    calls = []
+
+    entry, from_cache = cache.get_or_train("k", "v1", _trainer(calls))
+    assert not from_cache and entry["model"] == "model"
+    entry, from_cache = cache.get_or_train("k", "v1", _trainer(calls))
+    assert from_cache and entry["metrics"] == {"r2": 1.0}
+
+    assert calls == ["model"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_model_cache_lru_eviction():
+    cache = ModelCache(max_entries=2)
+    cache.put("a", "v1", "A", {})
+    cache.put("b", "v1", "B", {})
+    assert cache.get("a", "v1") is not None  # "a" staje się najświeższe
+    cache.put("c", "v1", "C", {})
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_model_cache_new_data_version_invalidates():
+    cache = ModelCache()
+    calls = []
+    cache.get_or_train("k", "v1", _trainer(calls, "old"))
+    entry, from_cache = cache.get_or_train("k", "v2", _trainer(calls, "new"))
+
+    assert not from_cache and entry["model"] == "new"
+    assert cache.get("k", "v1") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_model_cache_persists_to_disk(tmp_path):
+    ModelCache(persist_dir=tmp_path).put("k", "v1", {"coef": [1, 2]}, {"r2": 0.9})
+
+    # Nowa instancja (np. po restarcie) odczytuje model z dysku
+    cache = ModelCache(persist_dir=tmp_path)
+    entry = cache.get("k", "v1")
+    assert entry["model"] == {"coef": [1, 2]}
+    assert cache.stats()["disk_hits"] == 1
+
+    # Model z nowej wersji danych usuwa pliki starej
+    cache.put("k", "v2", "new", {})
+    assert [p.name for p in tmp_path.iterdir()] == ["v2__k.joblib"]
+
+
+def test_model_cache_training_error_not_cached():
+    cache = ModelCache()
+
+    def failing():
+        raise ValueError("za mało danych")
+
+    with pytest.raises(ValueError):
+        cache.get_or_train("k", "v1", failing)
+    entry, from_cache = cache.get_or_train("k", "v1", _trainer([]))
+    assert not from_cache and entry["model"] == "model"
+
+
+def test_data_version_bumps_on_import_and_delete(db):
+    engine = db.get_bind()
+    v0 = get_data_version(engine)
+    assert get_data_version(engine) == v0
+
+    import_dataframe(pd.DataFrame([
+        {"ID": 1, "Price": 50000, "Currency": "PLN", "Marka pojazdu": "Opel",
+         "Model pojazdu": "Astra", "Rok produkcji": 2015},
+    ]), engine)
+    v1 = get_data_version(engine)
+    assert v1 != v0
+
+    db.delete(db.get(Listing, 1))
+    db.commit()
+    assert get_data_version(engine) not in (v0, v1)
+
+
+def test_model_config_normalization_ignores_irrelevant_params():
+    from app.schemas import ValuationModelConfig
+
+    plain = valuation_engine.normalize_model_config(ValuationModelConfig(model_type="linear"))
+    with_alpha = valuation_engine.normalize_model_config(ValuationModelConfig(model_type="linear", alpha=5))
+    assert plain == with_alpha
+    assert valuation_engine.normalize_model_config(None)["n_estimators"] == 200
+
+
+@pytest.fixture
+def corolla_listings(db):
+    """Oferty wystarczające do treningu modelu dla Toyota Corolla."""
+    for i in range(30):
+        db.add(Listing(
+            vehicle_brand="Toyota",
+            vehicle_model="Corolla",
+            production_year=2010 + i % 12,
+            mileage_km=20000 + i * 7000,
+            price_pln=30000 + (i % 12) * 5000 - i * 300,
+            currency="PLN",
+            fuel_type="Benzyna",
+            transmission="Manualna",
+            displacement_cm3=1600 + (i % 3) * 200,
+        ))
+    db.commit()
+
+
+def test_valuation_second_request_uses_cached_model(client, corolla_listings):
+    valuation_engine.model_cache.clear()
+    payload = {
+        "brand": "Toyota",
+        "model": "Corolla",
+        "year": 2018,
+        "mileage_km": 90000,
+        "fuel_type": "Benzyna",
+        "transmission": "Manualna",
+        "engine_capacity_cm3": 1800,
+        "valuation_model_config": {"model_type": "random_forest", "n_estimators": 10},
+    }
+
+    first = client.post("/valuation", json=payload)
+    assert first.status_code == status.HTTP_200_OK
+    assert first.json()["from_cache"] is False
+    data = first.json()
+    assert data["interval_method"] == "tree_quantiles"
+    assert data["price_p10"] <= data["predicted_price"] <= data["price_p90"]
+
+    second = client.post("/valuation", json={**payload, "mileage_km": 120000})
+    assert second.status_code == status.HTTP_200_OK
+    assert second.json()["from_cache"] is True
+    assert valuation_engine.model_cache.stats()["hits"] == 1
+
+
+def test_valuation_cache_admin_endpoints(client, admin_headers):
+    response = client.get("/admin/valuation/cache", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert "hit_ratio" in response.json()
+
+    response = client.delete("/admin/valuation/cache", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert valuation_engine.model_cache.stats()["entries"] == 0
+
+
+def test_pretrain_segment_models(db, corolla_listings, tmp_path, monkeypatch):
+    """Pretrening zapisuje model segmentu pod kluczem domyślnej wyceny."""
+    from app.pretraining import MANIFEST_FILE, pretrain_segment_models, segment_cache_key
+
+    db.add(Listing(vehicle_brand="Fiat", vehicle_model="Panda", production_year=2015, mileage_km=90000,
+                   price_pln=20000, currency="PLN", fuel_type="Benzyna", transmission="Manualna",
+                   displacement_cm3=1200))
+    db.commit()
+    monkeypatch.setattr(valuation_engine, "model_cache", ModelCache(persist_dir=tmp_path))
+    progress = []
+
+    summary = pretrain_segment_models(
+        db.get_bind(), min_samples=20, max_workers=1, progress_callback=lambda s: progress.append(dict(s))
+    )
+
+    assert (summary["segments_total"], summary["segments_done"], summary["segments_failed"]) == (1, 1, 0)
+    assert [p["segments_done"] for p in progress] == [0, 1]
+    version = get_data_version(db.get_bind())
+    entry = valuation_engine.model_cache.get(segment_cache_key("Toyota", "Corolla"), version)
+    assert entry is not None and entry["metrics"]["n_samples"] == 30
+    manifest = (tmp_path / MANIFEST_FILE).read_text(encoding="utf-8")
+    assert "Corolla" in manifest and "Panda" not in manifest
+
+
+def test_valuation_job_endpoints(client, corolla_listings, auth_headers, monkeypatch):
+    """Zadanie wyceny trenuje model poza wątkiem żądania; powtórka trafia w cache."""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app import valuation_jobs
+
+    valuation_engine.model_cache.clear()
+    monkeypatch.setattr(valuation_jobs, "job_queue", valuation_jobs.ValuationJobQueue(
+        max_workers=1, executor_factory=lambda n: ThreadPoolExecutor(n),
+    ))
+    payload = {
+        "brand": "Toyota", "model": "Corolla", "year": 2018, "mileage_km": 90000,
+        "fuel_type": "Benzyna", "transmission": "Manualna", "engine_capacity_cm3": 1800,
+        "valuation_model_config": {"model_type": "random_forest", "n_estimators": 10},
+    }
+
+    response = client.post("/valuation/jobs", json=payload, headers=auth_headers)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+
+    for _ in range(100):
+        job = client.get(f"/valuation/jobs/{job_id}", headers=auth_headers).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done", job
+    assert job["result"]["predicted_price"] > 0
+
+    cached = client.post("/valuation/jobs", json=payload, headers=auth_headers).json()
+    assert cached["status"] == "done" and cached["result"]["from_cache"] is True
+
+    assert client.get("/valuation/jobs/missing", headers=auth_headers).status_code == status.HTTP_404_NOT_FOUND
+    assert client.post("/valuation/jobs", json=payload).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_valuation_batch_groups_by_segment(client, corolla_listings, auth_headers):
+    valuation_engine.model_cache.clear()
+    vehicle = {
+        "brand": "Toyota", "model": "Corolla", "year": 2018, "mileage_km": 90000,
+        "fuel_type": "Benzyna", "transmission": "Manualna", "engine_capacity_cm3": 1800,
+        "valuation_model_config": {"model_type": "linear"},
+    }
+    vehicles = [{**vehicle, "mileage_km": 30000 * (i + 1)} for i in range(3)]
+    vehicles.append({**vehicle, "brand": "Fiat", "model": "Panda"})  # brak danych treningowych
+
+    response = client.post("/valuation/batch", json={"vehicles": vehicles}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+
+    assert (data["n_vehicles"], data["n_failed"]) == (4, 1)
+    # Jeden trening dla trzech Corolli + nieudana próba dla Fiata
+    assert sorted(seg["n_vehicles"] for seg in data["segments"]) == [1, 3]
+    assert valuation_engine.model_cache.stats()["misses"] == 2
+    prices = [r["predicted_price"] for r in data["results"][:3]]
+    assert all(p is not None for p in prices) and len(set(prices)) == 3
+    assert data["results"][3]["predicted_price"] is None and data["results"][3]["error"]
+
+
+def test_valuation_batch_csv(client, corolla_listings, auth_headers):
+    import io
+
+    csv_in = (
+        "brand,model,generation,year,mileage_km,fuel_type,transmission,engine_capacity_cm3\n"
+        "Toyota,Corolla,,2018,90000,Benzyna,Manualna,1800\n"
+        "Toyota,Corolla,,2016,150000,Benzyna,Manualna,1600\n"
+        "Toyota,Corolla,,1800,150000,Benzyna,Manualna,1600\n"
+    )
+    response = client.post(
+        "/valuation/batch/csv",
+        files={"file": ("flota.csv", csv_in, "text/csv")},
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    result = pd.read_csv(io.StringIO(response.text))
+    assert list(result.columns[-2:]) == ["predicted_price", "error"]
+    assert result["predicted_price"].notna().tolist() == [True, True, False]
+    assert "year" in result.loc[2, "error"]
+
+
+@pytest.mark.parametrize("model_type", ["hist_gbm", "ridge"])
+def test_train_custom_model_types(model_type):
+    """hist_gbm (natywne kategorie) i modele liniowe (rzadki one-hot) przewidują także nieznane kategorie."""
+    from benchmarks.bench_valuation import make_frame
+
+    df = make_frame(400, n_models=20, n_generations=60)
+    model, metrics = valuation_engine.train_custom_model(
+        df, model_type,
+        valuation_engine.DEFAULT_FEATURES_NUMERIC, valuation_engine.DEFAULT_FEATURES_CATEGORICAL,
+        **valuation_engine.MODEL_PARAMS[model_type],
+    )
+    assert metrics["r2"] > 0.5
+
+    unseen = df.head(2).assign(model="Nowy model", generation="Nowa generacja")
+    assert model.predict(unseen).shape == (2,)
+
+
+def test_prediction_interval_from_residuals():
+    """Modele inne niż las losowy: przedział z kwantyli reszt zbioru testowego."""
+    from benchmarks.bench_valuation import make_frame
+
+    df = make_frame(300, n_models=10, n_generations=30)
+    model, metrics = valuation_engine.train_custom_model(
+        df, "hist_gbm",
+        valuation_engine.DEFAULT_FEATURES_NUMERIC, valuation_engine.DEFAULT_FEATURES_CATEGORICAL,
+    )
+    assert metrics["residual_p10"] < 0 < metrics["residual_p90"]
+
+    predictions, low, high, method = valuation_engine.predict_with_interval(model, metrics, df.head(5))
+    assert method == "residual_quantiles"
+    assert (low < predictions).all() and (predictions < high).all()
+
+
+def test_saved_valuation_keeps_price_range(client, auth_headers):
+    metrics = {
+        "r2": 0.9, "rmse": 5000, "mae": 4000, "n_samples": 100, "test_size": 0.2,
+        "features_numeric": ["year"], "features_categorical": ["brand"], "target": "price_pln",
+    }
+    payload = {
+        "title": "Corolla", "brand": "Toyota", "model": "Corolla", "year": 2018, "mileage_km": 90000,
+        "fuel_type": "Benzyna", "transmission": "Manualna", "engine_capacity_cm3": 1800,
+        "predicted_price": 60000, "price_p10": 52000, "price_p90": 67000,
+        "interval_method": "tree_quantiles", "model_metrics": metrics,
+    }
+    assert client.post("/saved/valuations", json=payload, headers=auth_headers).status_code == status.HTTP_200_OK
+
+    saved = client.get("/saved/valuations", headers=auth_headers).json()[0]
+    assert (saved["price_p10"], saved["price_p90"], saved["interval_method"]) == (52000, 67000, "tree_quantiles")
@@ -0,0 +1,89 @@
+"""
+Testy kolejki zadań wyceny (app.valuation_jobs) - bez uruchamiania puli procesów.
+"""
+from concurrent.futures import Executor, Future
+
+import pytest
+
+from app import exceptions
+from app.schemas import ValuationRequest
+from app.valuation_jobs import ValuationJobQueue
+
+
+class PendingExecutor(Executor):
+    """Executor, który przyjmuje zadania, ale kończy je dopiero na żądanie testu."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def _request(mileage=50000):
+    return ValuationRequest(
+        brand="Toyota", model="Corolla", year=2018, mileage_km=mileage,
+        fuel_type="Benzyna", transmission="Manualna", engine_capacity_cm3=1800,
+    )
+
+
+@pytest.fixture
+def queue():
+    executor = PendingExecutor()
+    queue = ValuationJobQueue(
+        max_workers=1, max_queued=2, per_user_limit=3,
+        initial_duration_seconds=10, executor_factory=lambda n: executor,
+    )
+    queue.executor = executor
+    return queue
+
+
+def test_jobs_get_queue_position_and_eta(queue):
+    running, _ = queue.submit(_request(1), user_id=1, database_url="sqlite://", data_version="v1")
+    queued, _ = queue.submit(_request(2), user_id=1, database_url="sqlite://", data_version="v1")
+
+    assert (running["status"], running["position"]) == ("running", 0)
+    assert (queued["status"], queued["position"]) == ("queued", 1)
+    assert queued["eta_seconds"] > running["eta_seconds"]
+    assert len(queue.executor.futures) == 1  # drugie zadanie czeka na wolny worker
+
+    queue.executor.futures[0].set_result({"ok": True, "result": {"predicted_price": 1.0}})
+    assert queue.get(running["job_id"], 1)["status"] == "done"
+    assert queue.get(queued["job_id"], 1)["status"] == "running"
+
+
+def test_identical_jobs_are_deduplicated(queue):
+    first, dedup_first = queue.submit(_request(), user_id=1, database_url="sqlite://", data_version="v1")
+    second, dedup_second = queue.submit(_request(), user_id=2, database_url="sqlite://", data_version="v1")
+    other_version, _ = queue.submit(_request(), user_id=2, database_url="sqlite://", data_version="v2")
+
+    assert not dedup_first and dedup_second
+    assert second["job_id"] == first["job_id"]
+    assert other_version["job_id"] != first["job_id"]
+    assert queue.get(first["job_id"], 2) is not None
+    assert queue.get(first["job_id"], 3) is None  # cudze zadanie niewidoczne
+    assert len(queue.executor.futures) == 1
+
+
+def test_per_user_limit_and_full_queue(queue):
+    for mileage in range(3):
+        queue.submit(_request(mileage), user_id=1, database_url="sqlite://", data_version="v1")
+    with pytest.raises(exceptions.TooManyRequestsError):
+        queue.submit(_request(99), user_id=1, database_url="sqlite://", data_version="v1")
+
+    # 1 zadanie w toku + 2 oczekujące = pełna kolejka
+    with pytest.raises(exceptions.TooManyRequestsError):
+        queue.submit(_request(100), user_id=2, database_url="sqlite://", data_version="v1")
+
+
+def test_failed_job_reports_error(queue):
+    job, _ = queue.submit(_request(), user_id=1, database_url="sqlite://", data_version="v1")
+    queue.executor.futures[0].set_result({"ok": False, "error": "Za mało danych", "error_code": "VALIDATION_ERROR"})
+
+    job = queue.get(job["job_id"], 1)
+    assert (job["status"], job["error_code"]) == ("failed", "VALIDATION_ERROR")
+    # Po zakończeniu identyczne żądanie tworzy nowe zadanie
+    again, deduplicated = queue.submit(_request(), user_id=1, database_url="sqlite://", data_version="v1")
+    assert not deduplicated and again["job_id"] != job["job_id"]
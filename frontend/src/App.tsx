@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import {
   Chart as ChartJS,
@@ -27,10 +27,11 @@ import type {
   Listing,
   ListingsResponse,
   TrendPoint,
-  TrendResponse,
   PriceMileagePoint,
-  PriceMileageResponse,
   PriceStatsByCategoryResponse,
+  DashboardResponse,
+  FacetModel,
+  FacetsResponse,
 } from "./types";
 
 ChartJS.register(
@@ -52,6 +53,7 @@ const PAGE_SIZE = 50;
 
 const App: React.FC = () => {
   // filtry (sidebar)
+  const [facets, setFacets] = useState<FacetsResponse | null>(null);
   const [brands, setBrands] = useState<string[]>([]);
   const [models, setModels] = useState<string[]>([]);
   const [generations, setGenerations] = useState<string[]>([]);
@@ -78,6 +80,7 @@ const App: React.FC = () => {
 
   // dane do analiz zaawansowanych
   const [priceMileageData, setPriceMileageData] = useState<PriceMileagePoint[]>([]);
+  const [priceMileageTotal, setPriceMileageTotal] = useState<number | null>(null);
   const [priceStatsByCategory, setPriceStatsByCategory] = useState<PriceStatsByCategoryResponse | null>(null);
   const [priceStatistics, setPriceStatistics] = useState<PriceStatistics | null>(null);
 
@@ -197,19 +200,18 @@ const App: React.FC = () => {
 
   // ================== POBIERANIE DANYCH ==================
 
-  // 1. Pobierz listę marek, paliw, skrzyń i zakres dat przy starcie
+  // 1. Pobierz katalog filtrów (marki -> modele -> generacje/paliwa/pojemności) i zakres dat przy starcie
   useEffect(() => {
     const fetchInitial = async () => {
       try {
-        const [brandsRes, fuelRes, transRes, dateRangeRes] = await Promise.all([
-          axios.get<string[]>(`${API_URL}/brands`),
-          axios.get<string[]>(`${API_URL}/fuel-types`),
-          axios.get<string[]>(`${API_URL}/transmissions`),
+        const [facetsRes, dateRangeRes] = await Promise.all([
+          axios.get<FacetsResponse>(`${API_URL}/facets`),
           axios.get<{ min_date: string | null; max_date: string | null }>(`${API_URL}/publication-date-range`),
         ]);
-        setBrands(brandsRes.data);
-        setFuelTypes(fuelRes.data);
-        setTransmissions(transRes.data);
+        setFacets(facetsRes.data);
+        setBrands(facetsRes.data.brands.map((b) => b.brand));
+        setFuelTypes(facetsRes.data.fuel_types);
+        setTransmissions(facetsRes.data.transmissions);
         setDateRange(dateRangeRes.data);
       } catch (err) {
         console.error(err);
@@ -222,119 +224,74 @@ const App: React.FC = () => {
     fetchInitial();
   }, []);
 
-  // 2. Pobierz listę modeli do sidebaru, gdy zmieni się marka (filtry)
-  useEffect(() => {
-    const fetchModels = async () => {
-      if (!selectedBrand) {
-        setModels([]);
-        setSelectedModel("");
-        setGenerations([]);
-        setSelectedGeneration("");
-        return;
-      }
-      try {
-        const res = await axios.get<string[]>(`${API_URL}/models`, {
-          params: { brand: selectedBrand },
-        });
-        setModels(res.data);
-        setGenerations([]);
-        setSelectedGeneration("");
-      } catch (err) {
-        console.error(err);
-        setErrorMsg("Nie udało się pobrać listy modeli.");
-      }
-    };
-
-    fetchModels();
-  }, [selectedBrand]);
+  // Wpis katalogu dla wybranej marki i modelu (listy zależne liczone lokalnie, bez zapytań do API)
+  const selectedFacetModel: FacetModel | undefined = facets?.brands
+    .find((b) => b.brand === selectedBrand)
+    ?.models.find((m) => m.model === selectedModel);
 
-
-  // 2b. Pobierz listę wersji, gdy zmieni się marka lub model
+  // 2. Lista modeli do sidebaru, gdy zmieni się marka (filtry)
   useEffect(() => {
-    const fetchVersions = async () => {
-      if (!selectedBrand || !selectedModel) {
-        setGenerations([]);
-        setSelectedGeneration("");
-        return;
-      }
-      try {
-        const res = await axios.get<string[]>(`${API_URL}/generations`, {
-          params: { brand: selectedBrand, model: selectedModel },
-        });
-        setGenerations(res.data);
-        // Jeśli wybrana generacja nie jest już dostępna, wyczyść ją
-        if (selectedGeneration && !res.data.includes(selectedGeneration)) {
-          setSelectedGeneration("");
-        }
-      } catch (err) {
-        console.error(err);
-        setGenerations([]);
-        setSelectedGeneration("");
-      }
-    };
+    if (!selectedBrand) {
+      setModels([]);
+      setSelectedModel("");
+      setGenerations([]);
+      setSelectedGeneration("");
+      return;
+    }
+    const brandFacet = facets?.brands.find((b) => b.brand === selectedBrand);
+    setModels(brandFacet ? brandFacet.models.map((m) => m.model) : []);
+    setGenerations([]);
+    setSelectedGeneration("");
+  }, [selectedBrand, facets]);
 
-    fetchVersions();
-  }, [selectedBrand, selectedModel, selectedGeneration]);
 
-  // 2c. Pobierz listę pojemności, gdy zmieni się marka lub model
+  // 2b. Lista wersji, gdy zmieni się marka lub model
   useEffect(() => {
-    const fetchDisplacements = async () => {
-      if (!selectedBrand || !selectedModel) {
-        setDisplacements([]);
-        setDisplacementMin("");
-        setDisplacementMax("");
-        return;
-      }
-      try {
-        const res = await axios.get<number[]>(`${API_URL}/displacements`, {
-          params: { brand: selectedBrand, model: selectedModel },
-        });
-        setDisplacements(res.data);
-        // Jeśli wybrane pojemności nie są już dostępne, wyczyść je
-        if (displacementMin && !res.data.includes(Number(displacementMin))) {
-          setDisplacementMin("");
-        }
-        if (displacementMax && !res.data.includes(Number(displacementMax))) {
-          setDisplacementMax("");
-        }
-      } catch (err) {
-        console.error(err);
-        setDisplacements([]);
-        setDisplacementMin("");
-        setDisplacementMax("");
-      }
-    };
+    const available = selectedFacetModel?.generations ?? [];
+    setGenerations(available);
+    // Jeśli wybrana generacja nie jest już dostępna, wyczyść ją
+    if (selectedGeneration && !available.includes(selectedGeneration)) {
+      setSelectedGeneration("");
+    }
+  }, [selectedFacetModel, selectedGeneration]);
 
-    fetchDisplacements();
-  }, [selectedBrand, selectedModel, displacementMin, displacementMax]);
+  // 2c. Lista pojemności, gdy zmieni się marka lub model
+  useEffect(() => {
+    if (!selectedFacetModel) {
+      setDisplacements([]);
+      setDisplacementMin("");
+      setDisplacementMax("");
+      return;
+    }
+    const available = selectedFacetModel.displacements;
+    setDisplacements(available);
+    // Jeśli wybrane pojemności nie są już dostępne, wyczyść je
+    if (displacementMin && !available.includes(Number(displacementMin))) {
+      setDisplacementMin("");
+    }
+    if (displacementMax && !available.includes(Number(displacementMax))) {
+      setDisplacementMax("");
+    }
+  }, [selectedFacetModel, displacementMin, displacementMax]);
 
-  // 2d. Pobierz listę typów paliwa, gdy zmieni się marka lub model
+  // 2d. Lista typów paliwa, gdy zmieni się marka lub model
   useEffect(() => {
-    const fetchFuelTypes = async () => {
-      if (!selectedBrand || !selectedModel) {
-        setFuelTypesByModel([]);
-        setSelectedFuelType("");
-        return;
-      }
-      try {
-        const res = await axios.get<string[]>(`${API_URL}/fuel-types-by-model`, {
-          params: { brand: selectedBrand, model: selectedModel },
-        });
-        setFuelTypesByModel(res.data);
-        // Jeśli wybrany typ paliwa nie jest już dostępny, wyczyść go
-        if (selectedFuelType && !res.data.includes(selectedFuelType)) {
-          setSelectedFuelType("");
-        }
-      } catch (err) {
-        console.error(err);
-        setFuelTypesByModel([]);
-        setSelectedFuelType("");
-      }
-    };
+    if (!selectedFacetModel) {
+      setFuelTypesByModel([]);
+      setSelectedFuelType("");
+      return;
+    }
+    const available = selectedFacetModel.fuel_types;
+    setFuelTypesByModel(available);
+    // Jeśli wybrany typ paliwa nie jest już dostępny, wyczyść go
+    if (selectedFuelType && !available.includes(selectedFuelType)) {
+      setSelectedFuelType("");
+    }
+  }, [selectedFacetModel, selectedFuelType]);
 
-    fetchFuelTypes();
-  }, [selectedBrand, selectedModel, selectedFuelType]);
 
+  // Kursor strony następującej po ostatnio pobranej (dla tych samych filtrów i sortowania)
+  const nextPageCursor = useRef<{ key: string; page: number; cursor: string } | null>(null);
 
   // 4. Pobierz statystyki, trend i listę ofert dla filtrów z sidebaru + konkretnej strony
   const fetchData = async (
@@ -369,19 +326,32 @@ const App: React.FC = () => {
     if (sortByParam) params.sort_by = sortByParam;
     if (sortDirParam) params.sort_dir = sortDirParam;
 
-    const [analysisRes, trendRes, listingsRes] = await Promise.all([
-      axios.get<AnalysisResult>(`${API_URL}/analysis`, { params }),
-      axios.get<TrendResponse>(`${API_URL}/trend-by-year`, { params }),
+    const listKey = JSON.stringify(params);
+    const cursor =
+      nextPageCursor.current?.key === listKey && nextPageCursor.current.page === currentPage
+        ? nextPageCursor.current.cursor
+        : null;
+
+    // Statystyki i trend z jednego zapytania (jeden wybór przefiltrowanych ofert)
+    const [dashboardRes, listingsRes] = await Promise.all([
+      axios.get<DashboardResponse>(`${API_URL}/analytics/dashboard`, {
+        params: { ...params, fields: "analysis,trend" },
+      }),
       axios.get<ListingsResponse>(`${API_URL}/listings-filtered`, {
-        params: { ...params, limit: PAGE_SIZE, offset },
+        // Następna strona tej samej listy przez kursor (bez pomijania offset wierszy)
+        params: { ...params, limit: PAGE_SIZE, ...(cursor ? { cursor } : { offset }) },
       }),
     ]);
 
-    setAnalysis(analysisRes.data);
-    setTrend(trendRes.data.points);
+    const dashboard = dashboardRes.data;
+    setAnalysis(dashboard.analysis ? { filters: dashboard.filters, ...dashboard.analysis } : null);
+    setTrend(dashboard.trend ?? []);
     setListings(listingsRes.data.items);
+    nextPageCursor.current = listingsRes.data.next_cursor
+      ? { key: listKey, page: currentPage + 1, cursor: listingsRes.data.next_cursor }
+      : null;
 
-    setTotalListings(listingsRes.data.total);
+    setTotalListings(listingsRes.data.total ?? 0);
     setPage(currentPage);
 
     // Scroll do tabeli jest teraz obsługiwany w komponencie OverviewTab
@@ -403,6 +373,7 @@ const App: React.FC = () => {
         // Resetuj dane gdy nie jesteśmy w zakładce analytics
         if (isMounted) {
           setPriceMileageData([]);
+          setPriceMileageTotal(null);
           setPriceStatsByCategory(null);
           setPriceStatistics(null);
         }
@@ -437,33 +408,26 @@ const App: React.FC = () => {
           signal: abortController.signal
         };
 
-        const [priceMileageRes, priceStatsRes, priceStatsRes2] = await Promise.all([
-          axios.get<PriceMileageResponse>(`${API_URL}/analytics/price-mileage`, { 
-            params: { ...params, limit: 50000 }, // Zmniejszono z 200000 do 50000 dla lepszej wydajności
-            ...axiosConfig
-          }),
-          axios.get<PriceStatsByCategoryResponse>(`${API_URL}/analytics/price-stats-by-category`, { 
-            params,
-            ...axiosConfig
-          }),
-          axios.get<PriceStatistics>(`${API_URL}/analytics/price-statistics`, { 
-            params,
-            ...axiosConfig
-          }),
-        ]);
+        // Wszystkie panele z jednego zapytania zamiast trzech osobnych skanów
+        const dashboardRes = await axios.get<DashboardResponse>(`${API_URL}/analytics/dashboard`, {
+          // Próbka warstwowa liczona na serwerze - zachowuje odstające oferty, total = wszystkie punkty
+          params: { ...params, fields: "price_mileage,by_category,price_statistics", mode: "stratified", target: 3000 },
+          ...axiosConfig
+        });
 
         // Sprawdź czy komponent jest nadal zamontowany przed ustawieniem stanu
         if (isMounted && activeTab === "analytics") {
-          const points = priceMileageRes.data?.points || [];
-          
-          // Jeśli mamy więcej niż 50000 punktów, wyświetl ostrzeżenie
-          if (points.length > 50000) {
-            console.warn(`Otrzymano ${points.length} punktów. Wykresy będą wyświetlać próbkę danych dla lepszej wydajności.`);
-          }
-          
-          setPriceMileageData(points);
-          setPriceStatsByCategory(priceStatsRes.data || null);
-          setPriceStatistics(priceStatsRes2.data || null);
+          const dashboard = dashboardRes.data;
+          setPriceMileageData(dashboard.price_mileage || []);
+          setPriceMileageTotal(dashboard.price_mileage_total);
+          setPriceStatsByCategory({
+            filters: dashboard.filters,
+            by_fuel_type: dashboard.by_fuel_type || [],
+            by_transmission: dashboard.by_transmission || [],
+          });
+          setPriceStatistics(
+            dashboard.price_statistics ? { filters: dashboard.filters, ...dashboard.price_statistics } : null
+          );
         }
       } catch (err: any) {
         // Ignoruj błędy związane z anulowaniem requestu
@@ -745,6 +709,7 @@ const handleSort = (column: "year" | "mileage" | "price" | "brand" | "model") =>
         {activeTab === "analytics" && (
           <AnalyticsTab
             priceMileageData={priceMileageData}
+            priceMileageTotal={priceMileageTotal}
             priceStatsByCategory={priceStatsByCategory}
             priceStatistics={priceStatistics}
             loading={loading}
@@ -38,6 +38,7 @@ export const DatabaseUpdate: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string>("");
   const [selectedOption, setSelectedOption] = useState<string>("scraping_and_update"); // "scraping_and_update" | "scraping_only" | "update_only"
+  const [resumeScraping, setResumeScraping] = useState(false); // Wznów przerwane scrapowanie od checkpointów
   const [showModal, setShowModal] = useState<{type: 'start' | 'cancel' | 'reset' | 'delete_history' | null, message?: string, recordId?: string}>({type: null});
   const [showHistory, setShowHistory] = useState(false);
   const [importFile, setImportFile] = useState<File | null>(null);
@@ -236,7 +237,8 @@ export const DatabaseUpdate: React.FC = () => {
         
         await axios.post(`${API_URL}/admin/database/full-update`, {
           start_step: "scraping",
-          steps_to_run: stepsToRun.length > 0 ? stepsToRun : undefined
+          steps_to_run: stepsToRun.length > 0 ? stepsToRun : undefined,
+          resume: resumeScraping
         }, {
           headers: { Authorization: `Bearer ${token}` }
         });
@@ -284,6 +286,7 @@ export const DatabaseUpdate: React.FC = () => {
       scraping: "Scrapowanie otomoto.pl",
       processing: "Przetwarzanie danych", // Ukryte w UI, ale nadal wykonywane
       database_update: "Aktualizacja bazy danych",
+      model_pretraining: "Pretrening modeli wyceny",
     };
     return names[step || ""] || step || "Oczekiwanie...";
   };
@@ -642,6 +645,16 @@ export const DatabaseUpdate: React.FC = () => {
       )}
 
       {/* Przyciski - uproszczone */}
+      {status.status !== "running" && selectedOption !== "update_only" && (
+        <label className="flex items-center gap-2 text-sm mb-2">
+          <input
+            type="checkbox"
+            checked={resumeScraping}
+            onChange={(e) => setResumeScraping(e.target.checked)}
+          />
+          Wznów przerwane scrapowanie (pomija ukończone marki, kontynuuje od ostatniej strony)
+        </label>
+      )}
       <div className="flex flex-wrap gap-2">
         {status.status !== "running" && selectedOption !== "update_only" && (
           <button
@@ -6,10 +6,11 @@ import API_URL from "../../config/api";
 interface ScraperConfig {
   max_workers: number;
   request_timeout: number;
-  delay_between_offers_min: number;
-  delay_between_offers_max: number;
-  delay_between_pages_min: number;
-  delay_between_pages_max: number;
+  max_concurrency: number;
+  requests_per_second: number;
+  rate_limit_burst: number;
+  incremental: boolean;
+  stop_after_known_offers: number;
   max_offers_per_brand: number | null;
   brands_to_scrape: string[];
   date_from: string | null;
@@ -28,6 +29,7 @@ interface ScraperStats {
     date_from: string | null;
     date_to: string | null;
     max_workers: number;
+    requests_per_second?: number;
     max_offers_per_brand?: number | null;  // Opcjonalne, dla kompatybilności wstecznej
   };
 }
@@ -373,70 +375,80 @@ export const ScraperConfig: React.FC = () => {
           />
         </div>
 
-        {/* DELAY_BETWEEN_OFFERS */}
+        {/* MAX_CONCURRENCY */}
         <div>
           <label className="block text-sm font-medium mb-2">
-            Opóźnienie między ofertami (sekundy)
+            Maksymalna liczba równoczesnych żądań
           </label>
-          <div className="grid grid-cols-2 gap-2">
-            <div>
-              <label className="text-xs text-slate-400 mb-1 block">Min</label>
-              <input
-                type="number"
-                step="0.1"
-                min="0.1"
-                max="5.0"
-                value={config.delay_between_offers_min}
-                onChange={(e) => setConfig({ ...config, delay_between_offers_min: parseFloat(e.target.value) || 0.4 })}
-                className="w-full px-3 py-2 bg-slate-700 rounded text-sm"
-              />
-            </div>
-            <div>
-              <label className="text-xs text-slate-400 mb-1 block">Max</label>
-              <input
-                type="number"
-                step="0.1"
-                min="0.1"
-                max="5.0"
-                value={config.delay_between_offers_max}
-                onChange={(e) => setConfig({ ...config, delay_between_offers_max: parseFloat(e.target.value) || 0.8 })}
-                className="w-full px-3 py-2 bg-slate-700 rounded text-sm"
-              />
-            </div>
-          </div>
+          <input
+            type="number"
+            min="1"
+            max="64"
+            value={config.max_concurrency}
+            onChange={(e) => setConfig({ ...config, max_concurrency: parseInt(e.target.value) || 1 })}
+            className="w-full px-3 py-2 bg-slate-700 rounded text-sm"
+          />
+          <p className="text-xs text-slate-400 mt-1">
+            Wspólny limit dla wszystkich marek - oferty z jednej strony pobierane są równolegle
+          </p>
         </div>
 
-        {/* DELAY_BETWEEN_PAGES */}
+        {/* REQUESTS_PER_SECOND / RATE_LIMIT_BURST */}
         <div>
           <label className="block text-sm font-medium mb-2">
-            Opóźnienie między stronami (sekundy)
+            Limit tempa żądań (na host)
           </label>
           <div className="grid grid-cols-2 gap-2">
             <div>
-              <label className="text-xs text-slate-400 mb-1 block">Min</label>
+              <label className="text-xs text-slate-400 mb-1 block">Żądań na sekundę</label>
               <input
                 type="number"
                 step="0.1"
-                min="0.5"
-                max="10.0"
-                value={config.delay_between_pages_min}
-                onChange={(e) => setConfig({ ...config, delay_between_pages_min: parseFloat(e.target.value) || 1.0 })}
+                min="0.1"
+                max="50"
+                value={config.requests_per_second}
+                onChange={(e) => setConfig({ ...config, requests_per_second: parseFloat(e.target.value) || 2.0 })}
                 className="w-full px-3 py-2 bg-slate-700 rounded text-sm"
               />
             </div>
             <div>
-              <label className="text-xs text-slate-400 mb-1 block">Max</label>
+              <label className="text-xs text-slate-400 mb-1 block">Burst</label>
               <input
                 type="number"
-                step="0.1"
-                min="0.5"
-                max="10.0"
-                value={config.delay_between_pages_max}
-                onChange={(e) => setConfig({ ...config, delay_between_pages_max: parseFloat(e.target.value) || 2.0 })}
+                min="1"
+                max="100"
+                value={config.rate_limit_burst}
+                onChange={(e) => setConfig({ ...config, rate_limit_burst: parseInt(e.target.value) || 1 })}
                 className="w-full px-3 py-2 bg-slate-700 rounded text-sm"
               />
             </div>
           </div>
+          <p className="text-xs text-slate-400 mt-1">
+            Zastępuje stałe opóźnienia między ofertami i stronami
+          </p>
+        </div>
+
+        {/* INCREMENTAL */}
+        <div>
+          <label className="flex items-center gap-2 text-sm font-medium mb-2">
+            <input
+              type="checkbox"
+              checked={config.incremental}
+              onChange={(e) => setConfig({ ...config, incremental: e.target.checked })}
+            />
+            Tryb przyrostowy (pomijaj oferty, które już są w bazie)
+          </label>
+          <input
+            type="number"
+            min="1"
+            value={config.stop_after_known_offers}
+            disabled={!config.incremental}
+            onChange={(e) => setConfig({ ...config, stop_after_known_offers: parseInt(e.target.value) || 1 })}
+            className="w-full px-3 py-2 bg-slate-700 rounded text-sm disabled:opacity-50"
+          />
+          <p className="text-xs text-slate-400 mt-1">
+            Zakończ markę po tylu kolejnych ofertach, które już są w bazie (listing jest od najnowszych)
+          </p>
         </div>
 
         {/* MAX_OFFERS_PER_BRAND */}
@@ -49,6 +49,9 @@ export const SaveValuationButton: React.FC<{
           transmission: valuationForm.transmission,
           engine_capacity_cm3: valuationForm.engine_capacity_cm3,
           predicted_price: valuationResult.predicted_price,
+          price_p10: valuationResult.price_p10 ?? null,
+          price_p90: valuationResult.price_p90 ?? null,
+          interval_method: valuationResult.interval_method ?? null,
           model_metrics: valuationResult.model_metrics,
         },
         {
@@ -141,6 +141,12 @@ export const SavedTab: React.FC<{ token: string }> = ({ token }) => {
                     <span className="text-slate-400">Cena:</span>{" "}
                     {v.predicted_price.toLocaleString()} PLN
                   </div>
+                  {v.price_p10 != null && v.price_p90 != null && (
+                    <div>
+                      <span className="text-slate-400">Przedział (P10–P90):</span>{" "}
+                      {Math.round(v.price_p10).toLocaleString()} – {Math.round(v.price_p90).toLocaleString()} PLN
+                    </div>
+                  )}
                 </div>
                 <div className="text-xs text-slate-500 mt-2">
                   Zapisano: {new Date(v.created_at).toLocaleString("pl-PL")}
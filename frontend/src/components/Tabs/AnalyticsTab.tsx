@@ -10,6 +10,8 @@ import type {
 
 type AnalyticsTabProps = {
   priceMileageData: PriceMileagePoint[];
+  // Liczba wszystkich punktów spełniających filtry (serwer zwraca próbkę)
+  priceMileageTotal?: number | null;
   priceStatsByCategory: PriceStatsByCategoryResponse | null;
   priceStatistics: PriceStatistics | null;
   loading: boolean;
@@ -18,6 +20,7 @@ type AnalyticsTabProps = {
 
 export const AnalyticsTab: React.FC<AnalyticsTabProps> = ({
   priceMileageData,
+  priceMileageTotal,
   priceStatsByCategory,
   priceStatistics,
   loading,
@@ -75,7 +78,7 @@ export const AnalyticsTab: React.FC<AnalyticsTabProps> = ({
                     const MAX_SCATTER_POINTS = 3000;
                     
                     // Ostrzeżenie jeśli mamy dużo danych
-                    const dataCount = priceMileageData.length;
+                    const dataCount = priceMileageTotal ?? priceMileageData.length;
                     const showWarning = dataCount > 10000;
                     
                     // Próbkowanie danych dla wykresu scatter (zachowaj wszystkie dane dla obliczenia średniej)
@@ -117,7 +120,7 @@ export const AnalyticsTab: React.FC<AnalyticsTabProps> = ({
                         <p className="font-semibold mb-1">⚠️ Duży zbiór danych ({dataCount.toLocaleString('pl-PL')} punktów)</p>
                         <p className="text-xs">
                           Wykres wyświetla próbkę {scatterData.length.toLocaleString('pl-PL')} punktów dla lepszej wydajności. 
-                          Linia średniej jest obliczana na podstawie wszystkich {dataCount.toLocaleString('pl-PL')} punktów.
+                          Próbka jest warstwowa (wg przebiegu i ceny), więc zachowuje rozkład i odstające oferty.
                         </p>
                         <p className="text-xs mt-2 text-yellow-400">
                           💡 Wskazówka: Zawęź filtry (np. wybierz konkretną markę/model) dla szybszego działania i pełnych danych.
@@ -187,7 +190,7 @@ export const AnalyticsTab: React.FC<AnalyticsTabProps> = ({
                       
                       if (validScatterPoints.length > 0) {
                         datasets.push({
-                          label: `Oferty${priceMileageData.length > MAX_SCATTER_POINTS ? ` (próbka ${scatterData.length.toLocaleString('pl-PL')} z ${priceMileageData.length.toLocaleString('pl-PL')})` : ''}`,
+                          label: `Oferty${dataCount > scatterData.length ? ` (próbka ${scatterData.length.toLocaleString('pl-PL')} z ${dataCount.toLocaleString('pl-PL')})` : ''}`,
                           data: validScatterPoints,
                           backgroundColor: "rgba(59, 130, 246, 0.5)",
                           borderColor: "rgba(59, 130, 246, 1)",
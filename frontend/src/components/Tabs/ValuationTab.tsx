@@ -840,6 +840,11 @@ export const ValuationTab: React.FC<ValuationTabProps> = ({
                 Szacowana cena
               </div>
               <div className="text-2xl md:text-3xl font-semibold">{formatPrice(valuationResult.predicted_price)}</div>
+              {valuationResult.price_p10 != null && valuationResult.price_p90 != null && (
+                <div className="text-xs text-slate-400 mt-1">
+                  Przedział (P10–P90): {formatPrice(valuationResult.price_p10)} – {formatPrice(valuationResult.price_p90)}
+                </div>
+              )}
             </div>
 
             {/* Metryki w kafelkach */}
@@ -51,8 +51,9 @@ export type ListingsResponse = {
   filters: Record<string, unknown>;
   limit: number;
   offset: number;
-  total: number;
+  total: number | null;
   items: Listing[];
+  next_cursor: string | null;
 };
 
 export type TrendPoint = {
@@ -93,7 +94,7 @@ export type ValuationRequestPayload = {
   };
   // Konfiguracja modelu
   valuation_model_config: {
-    model_type: "linear" | "ridge" | "lasso" | "random_forest";
+    model_type: "linear" | "ridge" | "lasso" | "random_forest" | "hist_gbm";
     features_numeric?: string[];
     features_categorical?: string[];
     alpha?: number;
@@ -119,7 +120,12 @@ export type ValuationModelMetrics = {
 
 export type ValuationResponse = {
   predicted_price: number;
+  // Przedział ceny P10-P90 (z tego samego modelu)
+  price_p10?: number | null;
+  price_p90?: number | null;
+  interval_method?: string | null;
   model_metrics: ValuationModelMetrics;
+  from_cache?: boolean;
 };
 
 // ====== Typy do analiz zaawansowanych ======
@@ -128,9 +134,21 @@ export type PriceMileagePoint = {
   mileage_km: number;
 };
 
+export type DownsamplingMode = "none" | "sample" | "stratified" | "lttb" | "grid" | "hexbin";
+
+export type PriceMileageCell = {
+  price_pln: number;
+  mileage_km: number;
+  count: number;
+};
+
 export type PriceMileageResponse = {
   filters: Record<string, unknown>;
   points: PriceMileagePoint[];
+  mode: DownsamplingMode;
+  total: number | null;
+  cells: PriceMileageCell[] | null;
+  cell_size: { price_pln: number; mileage_km: number } | null;
 };
 
 export type PriceStatsByCategory = {
@@ -146,6 +164,47 @@ export type PriceStatsByCategoryResponse = {
   by_transmission: PriceStatsByCategory[];
 };
 
+export type DashboardField =
+  | "analysis"
+  | "price_statistics"
+  | "trend"
+  | "by_category"
+  | "price_mileage";
+
+// Panele zakładki analiz z jednego zapytania (niewybrane panele = null)
+export type FacetModel = {
+  model: string;
+  count: number;
+  generations: string[];
+  fuel_types: string[];
+  transmissions: string[];
+  displacements: number[];
+};
+
+export type FacetsResponse = {
+  data_version: string;
+  total: number;
+  fuel_types: string[];
+  transmissions: string[];
+  brands: { brand: string; count: number; models: FacetModel[] }[];
+};
+
+export type DashboardResponse = {
+  filters: Record<string, unknown>;
+  fields: DashboardField[];
+  analysis: Omit<AnalysisResult, "filters"> | null;
+  price_statistics: Omit<PriceStatistics, "filters"> | null;
+  trend: TrendPoint[] | null;
+  by_fuel_type: PriceStatsByCategory[] | null;
+  by_transmission: PriceStatsByCategory[] | null;
+  price_mileage: PriceMileagePoint[] | null;
+  price_mileage_mode: DownsamplingMode | null;
+  price_mileage_shape: "rows" | "columns" | null;
+  price_mileage_total: number | null;
+  price_mileage_cells: PriceMileageCell[] | null;
+  price_mileage_cell_size: { price_pln: number; mileage_km: number } | null;
+};
+
 // ====== Typy do porównań ======
 export type VehicleComparisonData = {
   vehicle_a_label: string;
@@ -179,5 +238,8 @@ export type VehicleComparisonData = {
   }>;
   price_mileage_a: PriceMileagePoint[];
   price_mileage_b: PriceMileagePoint[];
+  price_mileage_total_a?: number | null;
+  price_mileage_total_b?: number | null;
+  price_mileage_mode?: DownsamplingMode;
 };
 
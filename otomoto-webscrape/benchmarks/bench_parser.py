@@ -0,0 +1,100 @@
+"""
+Microbenchmark parserów HTML scrapera (BeautifulSoup vs lxml).
+
+Dla każdego pliku z benchmarks/fixtures/ (offer_*.html - strony ofert,
+listing_*.html - strony listingu) sprawdza zgodność wyników obu parserów
+pole w pole, a następnie mierzy średni czas parsowania jednej strony.
+Do katalogu fixtures można dorzucić zapisane prawdziwe strony otomoto.
+
+Uruchomienie (z katalogu otomoto-webscrape/):
+    python benchmarks/bench_parser.py --repeat 50
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrape_otomoto  # noqa: E402
+from offer_parser import LXML_AVAILABLE, parse_offer_html_lxml, get_offer_urls_from_listing_lxml  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def parse_offer_bs4(html: str, url: str):
+    # parse_offer_html_bs4 wypisuje [SKIP] dla uszkodzonych aut - nie mieszamy tego z wynikami
+    with contextlib.redirect_stdout(io.StringIO()):
+        return scrape_otomoto.parse_offer_html_bs4(html, url)
+
+
+def parse_offer_lxml(html: str, url: str):
+    return parse_offer_html_lxml(html, url, "", scrape_otomoto.OFFER_COLUMNS, scrape_otomoto.parse_polish_date)
+
+
+def check_parity(name: str, expected, actual) -> int:
+    """Porównuje wyniki pole w pole. Zwraca liczbę różnic."""
+    if expected is None or actual is None or not isinstance(expected, dict):
+        if expected != actual:
+            print(f"  [DIFF] {name}: {expected!r} != {actual!r}")
+            return 1
+        return 0
+    diffs = 0
+    for key in expected:
+        if expected[key] != actual.get(key):
+            print(f"  [DIFF] {name}.{key}: {expected[key]!r} != {actual.get(key)!r}")
+            diffs += 1
+    return diffs
+
+
+def timeit(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not LXML_AVAILABLE:
+        print("lxml nie jest zainstalowane - brak czego porównywać (pip install lxml)")
+        return 1
+
+    fixtures = sorted(FIXTURES_DIR.glob("*.html"))
+    total_diffs = 0
+    totals = {"bs4": 0.0, "lxml": 0.0}
+    print(f"{'plik':<32} {'bs4 [ms]':>10} {'lxml [ms]':>10} {'x':>6}")
+    for path in fixtures:
+        html = path.read_text(encoding="utf-8")
+        if path.name.startswith("listing_"):
+            bs4_func = lambda: scrape_otomoto.get_offer_urls_from_listing_bs4(html)  # noqa: E731
+            lxml_func = lambda: get_offer_urls_from_listing_lxml(html)  # noqa: E731
+        else:
+            # URL bez ID - wymusza też ścieżkę szukania ID w HTML
+            url = f"https://www.otomoto.pl/osobowe/oferta/{path.stem}.html"
+            bs4_func = lambda: parse_offer_bs4(html, url)  # noqa: E731
+            lxml_func = lambda: parse_offer_lxml(html, url)  # noqa: E731
+
+        total_diffs += check_parity(path.name, bs4_func(), lxml_func())
+        t_bs4 = timeit(bs4_func, args.repeat)
+        t_lxml = timeit(lxml_func, args.repeat)
+        totals["bs4"] += t_bs4
+        totals["lxml"] += t_lxml
+        print(f"{path.name:<32} {t_bs4 * 1000:10.2f} {t_lxml * 1000:10.2f} {t_bs4 / t_lxml:6.1f}")
+
+    if fixtures:
+        n = len(fixtures)
+        print(f"{'średnio na stronę':<32} {totals['bs4'] / n * 1000:10.2f} {totals['lxml'] / n * 1000:10.2f} "
+              f"{totals['bs4'] / totals['lxml']:6.1f}")
+    print("Zgodność pól: OK" if total_diffs == 0 else f"Zgodność pól: {total_diffs} różnic")
+    return 0 if total_diffs == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
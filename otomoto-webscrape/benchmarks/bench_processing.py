@@ -0,0 +1,94 @@
+"""
+Benchmark etapu przetwarzania (main.py): łączenie plików marek + cleanup.
+
+Generuje syntetyczne pliki scraped_data/{marka}.csv w katalogu tymczasowym
+i porównuje poprzednią implementację (pd.concat w pętli + list comprehension)
+z obecną (jeden pd.concat + wektorowe konwersje).
+
+Uruchomienie (z katalogu otomoto-webscrape/):
+    python benchmarks/bench_processing.py --rows 200000
+"""
+
+import argparse
+import glob
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main as processing  # noqa: E402
+
+BRANDS = ["audi", "bmw", "fiat", "ford", "kia", "opel", "skoda", "toyota", "volkswagen", "volvo"]
+
+
+def make_brand_files(folder: Path, rows: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    per_brand = rows // len(BRANDS)
+    for i, brand in enumerate(BRANDS):
+        n = per_brand
+        df = pd.DataFrame({
+            "ID": np.arange(i * per_brand, i * per_brand + n),
+            "Price": rng.integers(5_000, 300_000, n),
+            "Marka pojazdu": brand,
+            "Przebieg": [f"{v:,} km".replace(",", " ") for v in rng.integers(0, 400_000, n)],
+            "Moc": [f"{v} KM" for v in rng.integers(60, 400, n)],
+            "Pojemność skokowa": [f"{v:,} cm3".replace(",", " ") for v in rng.integers(900, 4000, n)],
+            "Emisja CO2": [f"{v} g/km" for v in rng.integers(90, 250, n)],
+            "Liczba drzwi": rng.integers(2, 6, n),
+        })
+        df.to_csv(folder / f"{brand}.csv", index=False)
+
+
+def legacy_concat(scraped_folder):
+    all_offers = pd.DataFrame()
+    for path in glob.glob(f"{scraped_folder}/*.csv"):
+        all_offers = pd.concat([all_offers, pd.read_csv(path)])
+    all_offers.reset_index(drop=True, inplace=True)
+    return all_offers
+
+
+def legacy_cleanup(ds):
+    ds['Przebieg'] = [None if str(v) == 'nan' else int(v.replace("km", "").replace(" ", "")) for v in ds['Przebieg']]
+    ds['Moc'] = [None if str(v) == 'nan' else int(v.replace("KM", "").replace(" ", "")) for v in ds['Moc']]
+    ds['Pojemność skokowa'] = [None if str(v) == 'nan' else int(v.replace("cm3", "").replace(" ", "")) for v in ds['Pojemność skokowa']]
+    ds['Emisja CO2'] = [None if str(v) == 'nan' else int(v.replace("g/km", "").replace(" ", "")) for v in ds['Emisja CO2']]
+    ds['Liczba drzwi'] = [None if str(v) == 'nan' else int(v) for v in ds['Liczba drzwi']]
+    return ds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_brand_files(Path(tmp), args.rows)
+
+        start = time.perf_counter()
+        legacy = legacy_cleanup(legacy_concat(tmp))
+        t_legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        current = processing.cleanup(processing.concat_scraped_data(tmp, workers=args.workers))
+        t_current = time.perf_counter() - start
+
+    legacy = legacy.sort_values("ID").reset_index(drop=True)
+    current = current.sort_values("ID").reset_index(drop=True)
+    same = all(
+        (legacy[col].astype("Int64") == current[col]).all()
+        for col in processing.NUMERIC_COLUMNS
+    )
+    print(f"wiersze: {len(current)}")
+    print(f"poprzednio: {t_legacy:8.2f} s")
+    print(f"obecnie:    {t_current:8.2f} s  ({t_legacy / t_current:.1f}x)")
+    print("Zgodność wartości: OK" if same else "Zgodność wartości: RÓŻNICE")
+
+
+if __name__ == "__main__":
+    main()
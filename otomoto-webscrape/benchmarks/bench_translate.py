@@ -0,0 +1,84 @@
+"""
+Benchmark tłumaczenia PL -> EN (translate.py).
+
+Porównuje poprzednią implementację (pickle wczytywany w każdym wierszu
+.apply + regex i słownik dla każdej cechy) z obecną (słowniki z cache,
+wektorowe explode -> map -> złożenie list) na syntetycznych danych.
+
+Uruchomienie (z katalogu otomoto-webscrape/):
+    python benchmarks/bench_translate.py --rows 200000
+"""
+
+import argparse
+import pickle
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import translate  # noqa: E402
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    translations = translate.load_translations()
+    # kilka cech spoza słownika - muszą zostać bez zmian
+    features = list(translations["car_features"]) + ["Cecha spoza słownika", "Hak"]
+    colours = list(translations["colour"])
+
+    feature_values = []
+    for n in rng.integers(0, 25, rows):
+        picked = rng.choice(len(features), size=n, replace=False)
+        feature_values.append(str([features[i] for i in picked]))
+    feature_series = pd.Series(feature_values, dtype=object)
+    feature_series[rng.random(rows) < 0.05] = None
+
+    return pd.DataFrame({
+        "Kolor": rng.choice(colours, rows),
+        "Pierwszy właściciel": rng.choice(["Tak", "Nie"], rows),
+        "Features": feature_series,
+    })
+
+
+def legacy_translate_car_features(features_string):
+    with open(str(translate.TRANSLATION_DIR / "car_features_translation.pkl"), "rb") as f:
+        car_features_translation = pickle.load(f)
+    if pd.isna(features_string):
+        return []
+    translated_features = []
+    for feature in re.findall(r"'(.*?)'", str(features_string)):
+        if not feature:
+            continue
+        translated_features.append(car_features_translation.get(feature, feature))
+    return translated_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows)
+
+    start = time.perf_counter()
+    legacy = frame["Features"].apply(legacy_translate_car_features)
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = translate.translate_pol_eng(frame)
+    t_current = time.perf_counter() - start
+
+    same = legacy.tolist() == current["Features"].tolist()
+    print(f"wiersze: {len(frame)}")
+    print(f"poprzednio (Features):         {t_legacy:8.2f} s")
+    print(f"obecnie (translate_pol_eng):   {t_current:8.2f} s  ({t_legacy / t_current:.1f}x)")
+    print("Zgodność Features: OK" if same else "Zgodność Features: RÓŻNICE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Asynchroniczny silnik pobierania stron dla scrapera otomoto.
+
+- jeden współdzielony klient httpx.AsyncClient (pula połączeń keep-alive,
+  bez nowego handshake TCP+TLS dla każdej oferty),
+- globalny limit równoległych żądań (asyncio.Semaphore),
+- limiter token-bucket per host (zastępuje stałe opóźnienia random.uniform),
+- proste ponawianie z rosnącym odstępem.
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# Domyślne wartości (nadpisywane przez scraper_config.json)
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_RATE_LIMIT_BURST = 4
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 1.0  # sekundy; przed kolejną próbą czekamy backoff * (nr_próby + 1)
+
+
+class TokenBucket:
+    """
+    Limiter token-bucket: średnio `rate` żądań na sekundę,
+    chwilowo do `burst` żądań bez czekania.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """Czeka, aż będzie dostępny token, i go zużywa."""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1.0:
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1.0
+
+
+class AsyncFetcher:
+    """
+    Współdzielony klient HTTP dla wszystkich marek.
+
+    Użycie:
+        async with AsyncFetcher(headers=HEADERS, timeout=15) as fetcher:
+            html = await fetcher.get_text(url)
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        burst: int = DEFAULT_RATE_LIMIT_BURST,
+        retries: int = DEFAULT_RETRIES,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.retries = max(1, int(retries))
+        self.retry_backoff = max(0.0, float(retry_backoff))
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            transport=self._transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.requests_per_second, self.burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def get_text(self, url: str) -> Optional[str]:
+        """GET z limitem równoległości, limitem per host i ponawianiem. None przy porażce."""
+        if self._client is None:
+            raise RuntimeError("AsyncFetcher must be used as 'async with'")
+        bucket = self._bucket(url)
+        for attempt in range(self.retries):
+            await bucket.acquire()
+            request_start = time.monotonic()
+            try:
+                async with self._semaphore:
+                    resp = await self._client.get(url)
+                self.stats["requests"] += 1
+                request_time = time.monotonic() - request_start
+                if resp.status_code == 200:
+                    self.stats["bytes"] += len(resp.content)
+                    if request_time > 3.0:  # Loguj tylko wolne requesty
+                        print(f"[SLOW] Request {url} trwał {request_time:.2f}s")
+                    return resp.text
+                print(f"[WARN] {url} -> HTTP {resp.status_code} (próba {attempt+1})")
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                print(f"[ERROR] GET {url}, próba {attempt+1}: {e}")
+            if attempt < self.retries - 1:  # Nie czekaj po ostatniej próbie
+                await asyncio.sleep(self.retry_backoff * (attempt + 1))
+        return None
@@ -1,23 +1,66 @@
+import numpy as np
 import pandas as pd
 import glob
 import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
 from scrape_otomoto import scrape_otomoto
 from translate import translate_pol_eng
 
 
-def concat_scraped_data(scraped_folder):
+# Kolumny liczbowe zapisywane przez scraper jako tekst z jednostką, np. "120 000 km"
+NUMERIC_COLUMNS = {
+    "Przebieg": "km",
+    "Moc": "KM",
+    "Pojemność skokowa": "cm3",
+    "Emisja CO2": "g/km",
+    "Liczba drzwi": None,
+}
+
+
+def read_scraped_file(path):
+    """Wczytuje jeden plik marki."""
+    return pd.read_csv(path)
+
+
+def concat_scraped_data(scraped_folder, workers=1):
     """
     concat scraped files into single dataframe
+    (jeden pd.concat na końcu; przy workers > 1 pliki marek czytane są równolegle)
     """
     print("Concating scraped files..")
-    scraped_paths = glob.glob(f"{scraped_folder}/*")
-    all_offers = pd.DataFrame()
-    for path in scraped_paths:
-        curr_file = pd.read_csv(path)
-        all_offers = pd.concat([all_offers, curr_file])
+    # Tylko pliki CSV - w katalogu leżą też checkpointy scrapera (*.checkpoint.json)
+    scraped_paths = sorted(glob.glob(f"{scraped_folder}/*.csv"))
+    if not scraped_paths:
+        return pd.DataFrame()
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(read_scraped_file, scraped_paths))
+    else:
+        frames = [read_scraped_file(path) for path in scraped_paths]
 
-    all_offers.reset_index(drop=True, inplace=True)
-    return all_offers
+    return pd.concat(frames, ignore_index=True)
+
+
+def to_int_column(series, unit=None):
+    """
+    '1 598 cm3' -> 1598 (Int64, <NA> dla pustych i niepoprawnych wartości).
+
+    Tekst czyścimy tylko dla unikalnych wartości (pd.factorize), a wynik
+    rozkładamy z powrotem po kodach - moc, pojemność czy liczba drzwi
+    mają kilkaset różnych wartości na setki tysięcy wierszy.
+    """
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(uniques, dtype=object).astype(str)
+    if unit:
+        text = text.str.replace(unit, "", regex=False)
+    text = text.str.replace(r"\s+", "", regex=True)
+    values = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+    converted = np.full(len(codes), np.nan)
+    known = codes >= 0
+    converted[known] = values[codes[known]]
+    return pd.Series(converted, index=series.index).round().astype("Int64")
 
 
 def cleanup(ds):
@@ -27,17 +70,9 @@ def cleanup(ds):
         ds = ds.drop(columns=['URL'])
 
     # remove unit names and convert to numerical values
-    ds['Przebieg'] = [None if str(mileage) == 'nan'
-                        else int(mileage.replace("km", "").replace(" ", "")) for mileage in ds['Przebieg']]
-    ds['Moc'] = [None if str(power) == 'nan'
-                        else int(power.replace("KM", "").replace(" ", "")) for power in ds['Moc']]
-    ds['Pojemność skokowa'] = [None if str(displacement) == 'nan'
-                        else int(displacement.replace("cm3", "").replace(" ", "")) for displacement in ds['Pojemność skokowa']]
-    ds['Emisja CO2'] = [None if str(emission) == 'nan'
-                        else int(emission.replace("g/km", "").replace(" ", "")) for emission in ds['Emisja CO2']]
-
-                        
-    ds['Liczba drzwi'] = [None if str(door_num) == 'nan' else int(door_num) for door_num in ds['Liczba drzwi']]
+    for column, unit in NUMERIC_COLUMNS.items():
+        if column in ds.columns:
+            ds[column] = to_int_column(ds[column], unit)
     return ds 
 
 
@@ -49,15 +84,19 @@ if __name__ == "__main__":
                         help='Translate the file.')
     parser.add_argument('--translate', default=True, type=bool,
                         help='Translate and save the file.')
+    parser.add_argument('--workers', default=4, type=int,
+                        help='Number of threads reading brand files in parallel.')
     args = parser.parse_args()
 
+    start = time.perf_counter()
     if not args.scraped_data:
         scrape_otomoto()
-        offers = concat_scraped_data("./scraped_data")
+        offers = concat_scraped_data("./scraped_data", workers=args.workers)
     else:
-        offers = concat_scraped_data(args.scraped_data)
+        offers = concat_scraped_data(args.scraped_data, workers=args.workers)
 
     offers = cleanup(offers)
+    print(f"Loaded and cleaned {len(offers)} offers in {time.perf_counter() - start:.2f}s")
 
     if args.save_file:
         print("Saving to car_sale_ads_pol.csv")
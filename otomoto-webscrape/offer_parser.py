@@ -0,0 +1,257 @@
+"""
+Szybki parser stron otomoto oparty o lxml (opcjonalna zależność).
+
+Zamiast budować drzewo BeautifulSoup i przeszukiwać je ~25 razy
+(soup.find dla każdego data-testid), przechodzimy drzewo lxml raz,
+zbierając wszystkie potrzebne elementy, a pola wyciągamy z małych poddrzew.
+Wynik jest identyczny (pole w pole) z parse_offer_html / get_offer_urls_from_listing
+ze scrape_otomoto.py - sprawdza to benchmarks/bench_parser.py.
+
+Jeśli lxml nie jest zainstalowane, LXML_AVAILABLE = False i scraper
+używa parsera BeautifulSoup.
+"""
+
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:  # pragma: no cover - zależy od środowiska
+    LXML_AVAILABLE = False
+
+# Tagi, których tekst BeautifulSoup pomija w get_text()
+_SKIP_TEXT_TAGS = {"script", "style", "template"}
+
+# data-testid pól w szczegółach oferty -> kolumna CSV (jak w parse_offer_html)
+TESTID_FIELDS = {
+    "make": "Marka pojazdu",
+    "model": "Model pojazdu",
+    "color": "Kolor",
+    "door_count": "Liczba drzwi",
+    "year": "Rok produkcji",
+    "fuel_type": "Rodzaj paliwa",
+    "engine_capacity": "Pojemność skokowa",
+    "engine_power": "Moc",
+    "body_type": "Typ",
+    "gearbox": "Skrzynia biegów",
+    "mileage": "Przebieg",
+    "new_used": "Stan",
+    "co2_emission": "Emisja CO2",
+    "drive": "Napęd",
+    "origin_country": "Kraj pochodzenia",
+    "first_owner": "Pierwszy właściciel",
+    "first_registration": "Pierwsza rejestracja",
+    "version": "Wersja",
+    "generation": "Generacja",
+}
+
+_ID_RE = re.compile(r"ID[:\s]+(\d+)")
+_URL_ID_RE = re.compile(r"-(\d+)\.html")
+
+
+def _iter_text(el) -> Iterator[str]:
+    """Fragmenty tekstu poddrzewa w kolejności dokumentu (bez komentarzy i skryptów)."""
+    if not isinstance(el.tag, str) or el.tag in _SKIP_TEXT_TAGS:
+        return
+    if el.text:
+        yield el.text
+    for child in el:
+        yield from _iter_text(child)
+        if child.tail:
+            yield child.tail
+
+
+def _get_text(el, separator: str = "") -> str:
+    """Odpowiednik BeautifulSoup get_text(separator, strip=True)."""
+    return separator.join(t.strip() for t in _iter_text(el) if t.strip())
+
+
+def _single_string(el) -> Optional[str]:
+    """Odpowiednik BeautifulSoup Tag.string (tekst jedynego dziecka, rekurencyjnie)."""
+    children = list(el)
+    if not children:
+        return el.text
+    if len(children) == 1 and not el.text and not children[0].tail and isinstance(children[0].tag, str):
+        return _single_string(children[0])
+    return None
+
+
+def _has_class(el, name: str) -> bool:
+    classes = el.get("class")
+    return bool(classes) and name in classes.split()
+
+
+def _find_first(el, tag: str) -> Optional["etree._Element"]:
+    """Pierwszy potomek o danym tagu (jak soup.find(tag))."""
+    return next(el.iter(tag), None) if el is not None else None
+
+
+def _parse_html(html: str):
+    """
+    lxml.html.fromstring odporne na odpowiedzi, które BeautifulSoup przyjmuje bez błędu:
+    - pusta / sama biała odpowiedź (ParserError "Document is empty") -> pusty dokument,
+    - str z deklaracją <?xml ... encoding=...?> (ValueError) -> parsowanie bajtów UTF-8.
+    """
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        try:
+            return lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+        except etree.ParserError:
+            return lxml.html.fromstring("<html></html>")
+    except etree.ParserError:
+        return lxml.html.fromstring("<html></html>")
+
+
+def extract_id_from_url(url: str) -> str:
+    match = _URL_ID_RE.search(url)
+    return match.group(1) if match else ""
+
+
+def _index_offer_page(root) -> Dict:
+    """
+    Jedno przejście po drzewie: zbiera pierwsze wystąpienia wszystkich
+    elementów, z których parser wyciąga pola.
+    """
+    index = {
+        "testids": {},
+        "price": None,
+        "currency": None,
+        "date": None,
+        "location": None,
+        "features": [],
+        "buttons": [],
+    }
+    testids = index["testids"]
+    for el in root.iter(tag=etree.Element):
+        tag = el.tag
+        if tag == "div":
+            testid = el.get("data-testid")
+            if testid is not None and testid not in testids:
+                testids[testid] = el
+            if index["date"] is None and _has_class(el, "ooa-vtq6wn"):
+                index["date"] = el
+        elif tag == "span":
+            if index["price"] is None and _has_class(el, "offer-price__number"):
+                index["price"] = el
+            if index["currency"] is None and _has_class(el, "offer-price__currency"):
+                index["currency"] = el
+        elif tag == "a":
+            if index["location"] is None and (el.get("href") or "").endswith("#map"):
+                index["location"] = el
+        elif tag == "li":
+            if _has_class(el, "offer-features__item"):
+                index["features"].append(el)
+        elif tag == "button":
+            index["buttons"].append(el)
+    return index
+
+
+def _value_by_testid(index: Dict, testid: str) -> str:
+    """Ostatni <p> wewnątrz <div data-testid=...> (jak extract_value_by_testid)."""
+    div = index["testids"].get(testid)
+    if div is None:
+        return ""
+    ps = list(div.iter("p"))
+    if not ps:
+        return ""
+    return _get_text(ps[-1])
+
+
+def parse_offer_html_lxml(
+    html: str,
+    url: str,
+    offer_id: str = "",
+    columns: Optional[List[str]] = None,
+    parse_polish_date=None,
+) -> Optional[Dict]:
+    """
+    Parsuje stronę oferty (lxml, jedno przejście). Zwraca None dla uszkodzonych aut.
+
+    Args:
+        columns: kolejność kolumn wyniku (OFFER_COLUMNS ze scrape_otomoto)
+        parse_polish_date: funkcja zamieniająca '2 grudnia 2025 13:26' na '02.12.2025'
+    """
+    root = _parse_html(html)
+    index = _index_offer_page(root)
+
+    # 1) Pomijamy uszkodzone
+    damaged = index["testids"].get("damaged")
+    if damaged is not None and "tak" in _get_text(damaged, " ").lower():
+        return None
+
+    row: Dict = {}
+
+    # ID ogłoszenia (priorytet: przekazane ID, potem z URL, potem z HTML)
+    if offer_id:
+        row["ID"] = offer_id
+    else:
+        row["ID"] = extract_id_from_url(url)
+        if not row["ID"]:
+            id_text = ""
+            id_button = next(
+                (b for b in index["buttons"] if "ID" in (_single_string(b) or "")), None
+            )
+            if id_button is not None:
+                id_text = _get_text(id_button, " ")
+            else:
+                m = _ID_RE.search(_get_text(root, " "))
+                if m:
+                    id_text = "ID: " + m.group(1)
+            m = _ID_RE.search(id_text)
+            row["ID"] = m.group(1) if m else ""
+
+    # Cena
+    row["Price"] = ""
+    if index["price"] is not None:
+        try:
+            row["Price"] = int(_get_text(index["price"]).replace(" ", "").replace("\xa0", ""))
+        except Exception:
+            row["Price"] = ""
+    row["Currency"] = _get_text(index["currency"]) if index["currency"] is not None else "PLN"
+
+    # Data publikacji
+    pub_date_text = ""
+    p = _find_first(index["date"], "p")
+    if p is not None:
+        pub_date_text = _get_text(p)
+    row["date"] = (parse_polish_date(pub_date_text) if parse_polish_date else pub_date_text) if pub_date_text else ""
+
+    # Lokalizacja
+    loc_text = ""
+    loc_p = _find_first(index["location"], "p")
+    if loc_p is not None:
+        loc_text = _get_text(loc_p, " ")
+    row["Location"] = loc_text
+
+    for testid, column in TESTID_FIELDS.items():
+        row[column] = _value_by_testid(index, testid)
+
+    features_list = [txt for txt in (_get_text(li) for li in index["features"]) if txt]
+    row["Features"] = str(features_list)
+
+    if columns is None:
+        return row
+    return {k: row.get(k, "") for k in columns}
+
+
+def get_offer_urls_from_listing_lxml(html: str) -> List[Tuple[str, str]]:
+    """Lista (url, id) ofert ze strony listingu - jak get_offer_urls_from_listing."""
+    root = _parse_html(html)
+    urls_with_ids = []
+    for art in root.iter("article"):
+        if art.get("data-id") is None:
+            continue
+        offer_id = art.get("data-id", "")
+        a_tag = next((a for a in art.iter("a") if a.get("href") is not None), None)
+        if a_tag is None:
+            continue
+        href = a_tag.get("href")
+        if "/osobowe/oferta/" in href:
+            full_url = href if href.startswith("http") else "https://www.otomoto.pl" + href
+            if not offer_id:
+                offer_id = extract_id_from_url(full_url)
+            urls_with_ids.append((full_url, offer_id))
+    return urls_with_ids
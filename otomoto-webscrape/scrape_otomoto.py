@@ -1,16 +1,23 @@
 import os
 import sys
 import time
-import random
 import json
+import asyncio
 from typing import List, Dict, Optional
 from pathlib import Path
 from datetime import datetime
 
-import requests
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from offer_parser import LXML_AVAILABLE, parse_offer_html_lxml, get_offer_urls_from_listing_lxml
+from fetch_engine import (
+    AsyncFetcher,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_RATE_LIMIT_BURST,
+)
 
 # Wymuś natychmiastowe wypisywanie (unbuffered)
 try:
@@ -42,18 +49,58 @@ HEADERS = {
 # ile marek jednocześnie – docelowo ok. 2 dni przy ~200k ofert
 MAX_WORKERS = 2
 
+# Silnik async: globalny limit równoległych żądań i limit tempa per host (token bucket)
+MAX_CONCURRENCY = DEFAULT_MAX_CONCURRENCY
+REQUESTS_PER_SECOND = DEFAULT_REQUESTS_PER_SECOND
+RATE_LIMIT_BURST = DEFAULT_RATE_LIMIT_BURST
+
 # Bezpieczne timeouty
 REQUEST_TIMEOUT = 10  # Zmniejszone dla szybszego wykrywania problemów
 
-# Opóźnienia – kompromis między czasem a bezpieczeństwem
-# Uwaga: Domyślne wartości są ustawiane przez backend w scraper_config.json
-DELAY_BETWEEN_OFFERS_MIN = 0.4
-DELAY_BETWEEN_OFFERS_MAX = 0.8
+OUTPUT_DIR = "scraped_data"
+
+# Parser HTML: "lxml" (szybki, jedno przejście - offer_parser.py) lub "bs4" (BeautifulSoup)
+PARSER_BACKEND = "lxml" if LXML_AVAILABLE else "bs4"
+
+# Kolumny CSV z ofertami (format jak stary CSV, tylko ID zamiast Index)
+OFFER_COLUMNS = [
+    "ID",  # Zamiast "Index" - teraz zawiera rzeczywiste ID ogłoszenia
+    "Price",
+    "Currency",
+    "Stan",
+    "Marka pojazdu",
+    "Model pojazdu",
+    "Wersja",
+    "Generacja",
+    "Rok produkcji",
+    "Przebieg",
+    "Moc",
+    "Pojemność skokowa",
+    "Rodzaj paliwa",
+    "Emisja CO2",
+    "Napęd",
+    "Skrzynia biegów",
+    "Typ",
+    "Liczba drzwi",
+    "Kolor",
+    "Kraj pochodzenia",
+    "Pierwszy właściciel",
+    "Pierwsza rejestracja",
+    "date",
+    "Location",
+    "Features",
+    # URL nie jest zapisywane - format identyczny ze starym CSV
+]
 
-DELAY_BETWEEN_PAGES_MIN = 1.0
-DELAY_BETWEEN_PAGES_MAX = 2.0
+# Tryb przyrostowy: pomijamy oferty, których ID są już w bazie (plik eksportowany przez backend)
+INCREMENTAL = False
+KNOWN_IDS_FILE = "known_ids.npy"
+# Listing jest posortowany od najnowszych - po tylu kolejnych znanych ofertach kończymy markę
+STOP_AFTER_KNOWN_OFFERS = 50
+KNOWN_IDS: set = set()
 
-OUTPUT_DIR = "scraped_data"
+# Wznowienie: pomiń marki ukończone wg checkpointów, resztę kontynuuj od ostatniej strony
+RESUME = False
 
 # Limit ofert do testów (ustaw None dla pełnego scrapowania)
 MAX_OFFERS_PER_BRAND = 50  # Pełne scrapowanie - brak limitu
@@ -144,9 +191,8 @@ def load_config():
                 
                 # Aktualizuj globalne zmienne
                 global MAX_WORKERS, REQUEST_TIMEOUT
-                global DELAY_BETWEEN_OFFERS_MIN, DELAY_BETWEEN_OFFERS_MAX
-                global DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX
                 global MAX_OFFERS_PER_BRAND, BRANDS_TO_SCRAPE
+                global MAX_CONCURRENCY, REQUESTS_PER_SECOND, RATE_LIMIT_BURST
                 
                 old_max_offers = MAX_OFFERS_PER_BRAND
                 old_brands = BRANDS_TO_SCRAPE.copy() if isinstance(BRANDS_TO_SCRAPE, list) else BRANDS_TO_SCRAPE
@@ -156,12 +202,11 @@ def load_config():
                 
                 MAX_WORKERS = config.get("max_workers", MAX_WORKERS)
                 REQUEST_TIMEOUT = config.get("request_timeout", REQUEST_TIMEOUT)
-                DELAY_BETWEEN_OFFERS_MIN = config.get("delay_between_offers_min", DELAY_BETWEEN_OFFERS_MIN)
-                DELAY_BETWEEN_OFFERS_MAX = config.get("delay_between_offers_max", DELAY_BETWEEN_OFFERS_MAX)
-                DELAY_BETWEEN_PAGES_MIN = config.get("delay_between_pages_min", DELAY_BETWEEN_PAGES_MIN)
-                DELAY_BETWEEN_PAGES_MAX = config.get("delay_between_pages_max", DELAY_BETWEEN_PAGES_MAX)
                 MAX_OFFERS_PER_BRAND = config.get("max_offers_per_brand", MAX_OFFERS_PER_BRAND)
                 BRANDS_TO_SCRAPE = config.get("brands_to_scrape", BRANDS_TO_SCRAPE)
+                MAX_CONCURRENCY = config.get("max_concurrency", MAX_CONCURRENCY)
+                REQUESTS_PER_SECOND = config.get("requests_per_second", REQUESTS_PER_SECOND)
+                RATE_LIMIT_BURST = config.get("rate_limit_burst", RATE_LIMIT_BURST)
                 
                 print(f"[CONFIG] ✓ Zaktualizowano zmienne globalne", flush=True)
                 print(f"[CONFIG] PO aktualizacji: BRANDS_TO_SCRAPE = {BRANDS_TO_SCRAPE}", flush=True)
@@ -224,26 +269,6 @@ def filter_by_date(row: Dict, date_from: Optional[str], date_to: Optional[str])
 # ================== POMOCNICZE ==================
 
 
-def safe_get(url: str) -> Optional[requests.Response]:
-    """Bezpieczny GET z timeoutem i prostym retry."""
-    request_start = time.time()
-    for attempt in range(3):
-        try:
-            resp = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-            request_time = time.time() - request_start
-            if resp.status_code == 200:
-                if request_time > 3.0:  # Loguj tylko wolne requesty
-                    print(f"[SLOW] Request {url} trwał {request_time:.2f}s")
-                return resp
-            else:
-                print(f"[WARN] {url} -> HTTP {resp.status_code} (próba {attempt+1})")
-        except Exception as e:
-            print(f"[ERROR] GET {url}, próba {attempt+1}: {e}")
-        if attempt < 2:  # Nie czekaj po ostatniej próbie
-            time.sleep(1.0 + attempt)
-    return None
-
-
 def parse_polish_date(date_text: str) -> str:
     """
     Wejście np.: '2 grudnia 2025 13:26'
@@ -318,11 +343,36 @@ def extract_id_from_url(url: str) -> str:
     return ""
 
 
+def load_known_ids(path: str) -> set:
+    """Wczytuje zbiór znanych ID ofert z pliku .npy (pusty zbiór, jeśli pliku brak)."""
+    if not os.path.exists(path):
+        print(f"[INCREMENTAL] Brak pliku {path} - pobieram wszystkie oferty")
+        return set()
+    ids = np.load(path)
+    print(f"[INCREMENTAL] Wczytano {len(ids)} znanych ID z {path}")
+    return set(ids.tolist())
+
+
+def is_known_offer(offer_id: str) -> bool:
+    """Czy oferta o danym ID jest już w bazie (tylko w trybie przyrostowym)."""
+    return INCREMENTAL and offer_id.isdigit() and int(offer_id) in KNOWN_IDS
+
+
 def get_offer_urls_from_listing(html: str) -> List[tuple[str, str]]:
     """
-    Wyciąga URL-e ofert z listingu wraz z ID.
+    Wyciąga URL-e ofert z listingu wraz z ID (parserem PARSER_BACKEND).
     Zwraca listę tupli (url, id).
     """
+    if PARSER_BACKEND == "lxml":
+        try:
+            return get_offer_urls_from_listing_lxml(html)
+        except Exception as e:
+            print(f"[WARN] Parser lxml nie poradził sobie z listingiem ({e}) - używam BeautifulSoup")
+    return get_offer_urls_from_listing_bs4(html)
+
+
+def get_offer_urls_from_listing_bs4(html: str) -> List[tuple[str, str]]:
+    """Wersja get_offer_urls_from_listing na BeautifulSoup."""
     soup = BeautifulSoup(html, "html.parser")
     urls_with_ids = []
 
@@ -352,19 +402,45 @@ def get_offer_urls_from_listing(html: str) -> List[tuple[str, str]]:
     return urls_with_ids
 
 
-def parse_offer_details(url: str, offer_id: str = "") -> Optional[Dict]:
+async def fetch_offer_details(fetcher: AsyncFetcher, url: str, offer_id: str = "") -> Optional[Dict]:
     """
-    Parsuje pojedynczą ofertę:
-    - pomija uszkodzone auta
-    - wyciąga pola w formacie jak stara baza (PL)
-    - przyjmuje offer_id jako parametr (jeśli już znane)
+    Pobiera ofertę przez współdzielony AsyncFetcher i parsuje ją w wątku
+    (parsowanie HTML nie blokuje pętli zdarzeń, gdy czekają inne żądania).
     """
-    resp = safe_get(url)
-    if resp is None:
+    html = await fetcher.get_text(url)
+    if html is None:
         print(f"[ERROR] Nie udało się pobrać oferty: {url}")
         return None
+    try:
+        return await asyncio.to_thread(parse_offer_html, html, url, offer_id)
+    except Exception as e:
+        # Błąd parsowania jednej oferty nie może przerwać całej strony (asyncio.gather)
+        print(f"[ERROR] Nie udało się sparsować oferty {url}: {e}")
+        return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def parse_offer_html(html: str, url: str, offer_id: str = "") -> Optional[Dict]:
+    """Parsuje pojedynczą ofertę parserem PARSER_BACKEND (patrz parse_offer_html_bs4)."""
+    if PARSER_BACKEND == "lxml":
+        try:
+            row = parse_offer_html_lxml(html, url, offer_id, OFFER_COLUMNS, parse_polish_date)
+        except Exception as e:
+            print(f"[WARN] Parser lxml nie poradził sobie z {url} ({e}) - używam BeautifulSoup")
+            return parse_offer_html_bs4(html, url, offer_id)
+        if row is None:
+            print(f"[SKIP] Uszkodzone auto: {url}")
+        return row
+    return parse_offer_html_bs4(html, url, offer_id)
+
+
+def parse_offer_html_bs4(html: str, url: str, offer_id: str = "") -> Optional[Dict]:
+    """
+    Parsuje pojedynczą ofertę (BeautifulSoup):
+    - pomija uszkodzone auta
+    - wyciąga pola w formacie jak stara baza (PL)
+    - przyjmuje offer_id jako parametr (jeśli już znane)
+    """
+    soup = BeautifulSoup(html, "html.parser")
 
     # 1) Pomijamy uszkodzone
     if is_damaged(soup):
@@ -482,141 +558,221 @@ def parse_offer_details(url: str, offer_id: str = "") -> Optional[Dict]:
     row["Features"] = str(features_list)
 
     # finalny słownik w kolejności starych kluczy (identyczny format jak stary CSV, tylko ID zamiast Index)
-    final_keys = [
-        "ID",  # Zamiast "Index" - teraz zawiera rzeczywiste ID ogłoszenia
-        "Price",
-        "Currency",
-        "Stan",
-        "Marka pojazdu",
-        "Model pojazdu",
-        "Wersja",
-        "Generacja",
-        "Rok produkcji",
-        "Przebieg",
-        "Moc",
-        "Pojemność skokowa",
-        "Rodzaj paliwa",
-        "Emisja CO2",
-        "Napęd",
-        "Skrzynia biegów",
-        "Typ",
-        "Liczba drzwi",
-        "Kolor",
-        "Kraj pochodzenia",
-        "Pierwszy właściciel",
-        "Pierwsza rejestracja",
-        "date",
-        "Location",
-        "Features",
-        # URL nie jest zapisywane - format identyczny ze starym CSV
-    ]
-
-    return {k: row.get(k, "") for k in final_keys}
+    return {k: row.get(k, "") for k in OFFER_COLUMNS}
 
 
 # ================== SCRAPOWANIE MARKI ==================
 
 
-def scrape_brand(brand: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> None:
+def create_fetcher() -> AsyncFetcher:
+    """Tworzy współdzielony klient HTTP wg bieżącej konfiguracji."""
+    return AsyncFetcher(
+        headers=HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_second=REQUESTS_PER_SECOND,
+        burst=RATE_LIMIT_BURST,
+    )
+
+
+def brand_csv_path(brand: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{brand}.csv")
+
+
+def checkpoint_path(brand: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{brand}.checkpoint.json")
+
+
+def load_checkpoint(brand: str) -> Optional[Dict]:
+    """Wczytuje checkpoint marki (None, jeśli brak lub plik uszkodzony)."""
+    path = checkpoint_path(brand)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[{brand}] ⚠ Nie udało się wczytać checkpointu {path}: {e}")
+        return None
+
+
+def save_checkpoint(brand: str, checkpoint: Dict) -> None:
+    """Zapisuje checkpoint atomowo (plik tymczasowy + podmiana)."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    checkpoint["updated_at"] = datetime.now().isoformat()
+    path = checkpoint_path(brand)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def append_rows_csv(path: str, rows: List[Dict]) -> None:
+    """Dopisuje wiersze do CSV marki (nagłówek tylko dla nowego pliku). Plik jest zamykany = zapisany."""
+    if not rows:
+        return
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    pd.DataFrame(rows, columns=OFFER_COLUMNS).to_csv(path, mode="a", header=write_header, index=False)
+
+
+async def scrape_brand_async(
+    brand: str,
+    fetcher: AsyncFetcher,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> None:
     """
     Scrapuje wszystkie strony dla danej marki.
+    Oferty z jednej strony listingu pobierane są równolegle (w ramach limitów fetchera).
     Filtruje oferty po dacie publikacji jeśli podano zakres dat.
-    Zapisuje wynik do scraped_data/{brand}.csv
+    Po każdej stronie dopisuje oferty do scraped_data/{brand}.csv i zapisuje
+    checkpoint (scraped_data/{brand}.checkpoint.json), więc przerwane
+    scrapowanie można wznowić (RESUME) od następnej strony.
     """
     start_time = time.time()
     
     print(f"\n===== SCRAPING BRAND: {brand} =====")
     print(f"[{brand}] MAX_OFFERS_PER_BRAND = {MAX_OFFERS_PER_BRAND}")
-    print(f"[{brand}] Opóźnienia: {DELAY_BETWEEN_OFFERS_MIN}-{DELAY_BETWEEN_OFFERS_MAX}s między ofertami, {DELAY_BETWEEN_PAGES_MIN}-{DELAY_BETWEEN_PAGES_MAX}s między stronami")
+    print(f"[{brand}] Limity: {fetcher.max_concurrency} równoległych żądań, {fetcher.requests_per_second} żądań/s na host (burst {fetcher.burst})")
     
     if date_from or date_to:
         print(f"[{brand}] Filtrowanie: od {date_from or 'początku'} do {date_to or 'końca'}")
     
-    all_rows: List[Dict] = []
-    page = 1
+    out_path = brand_csv_path(brand)
+    checkpoint = load_checkpoint(brand) if RESUME else None
+    if checkpoint and checkpoint.get("completed"):
+        print(f"[{brand}] ✓ Marka ukończona w poprzednim uruchomieniu ({checkpoint.get('rows_written', 0)} ofert), pomijam.")
+        return
+    if checkpoint is None:
+        # Nowe scrapowanie marki - usuń wyniki poprzedniego uruchomienia
+        for path in (out_path, checkpoint_path(brand)):
+            if os.path.exists(path):
+                os.remove(path)
+        checkpoint = {"brand": brand, "last_page": 0, "last_offer_id": None, "rows_written": 0,
+                      "processed": 0, "known_run": 0, "completed": False}
+    else:
+        print(f"[{brand}] ↻ Wznawiam od strony {checkpoint['last_page'] + 1} ({checkpoint['rows_written']} ofert już zapisanych)")
+
+    rows_written = checkpoint["rows_written"]
+    run_start_rows = rows_written  # rows_written_run = oferty dopisane w tym uruchomieniu
+    page = checkpoint["last_page"] + 1
     max_offers = MAX_OFFERS_PER_BRAND
     filtered_count = 0
-    processed_count = 0  # Licznik wszystkich przetworzonych ofert (w tym odrzuconych)
-    
-    # Dla małych limitów zmniejsz opóźnienia, żeby było szybciej
-    delay_offers_min = DELAY_BETWEEN_OFFERS_MIN
-    delay_offers_max = DELAY_BETWEEN_OFFERS_MAX
-    if max_offers and max_offers <= 50:
-        delay_offers_min = max(0.1, DELAY_BETWEEN_OFFERS_MIN * 0.5)
-        delay_offers_max = max(0.2, DELAY_BETWEEN_OFFERS_MAX * 0.5)
-        print(f"[{brand}] ⚡ Tryb szybki: opóźnienia zmniejszone do {delay_offers_min:.2f}-{delay_offers_max:.2f}s")
+    processed_count = checkpoint["processed"]  # Licznik wszystkich przetworzonych ofert (w tym odrzuconych)
+    ids_count = 0
+    known_count = 0  # Tryb przyrostowy: pominięte oferty, które już są w bazie
+    known_run = checkpoint.get("known_run", 0)  # Tryb przyrostowy: liczba kolejnych znanych ofert
+    stop_brand = False
+    completed = False
     
     print(f"[{brand}] Limit ofert: {max_offers}")
+    if INCREMENTAL:
+        print(f"[{brand}] Tryb przyrostowy: {len(KNOWN_IDS)} znanych ofert, stop po {STOP_AFTER_KNOWN_OFFERS} kolejnych znanych")
 
     while True:
         # Sprawdź limit ofert
-        if max_offers is not None and len(all_rows) >= max_offers:
+        if max_offers is not None and rows_written >= max_offers:
             elapsed = time.time() - start_time
             print(f"[{brand}] ✓ Osiągnięto limit {max_offers} ofert w {elapsed:.1f}s, kończę.")
+            completed = True
             break
 
         listing_url = BASE_LISTING_URL.format(brand=brand, page=page)
         print(f"[{brand}] 📄 Strona {page}: {listing_url}")
 
-        resp = safe_get(listing_url)
-        if resp is None:
+        html = await fetcher.get_text(listing_url)
+        if html is None:
+            # Marka nieukończona - przy wznowieniu zaczniemy od tej strony
             print(f"[{brand}] Brak odpowiedzi dla strony {page}, kończę markę.")
             break
 
-        offer_urls_with_ids = get_offer_urls_from_listing(resp.text)
+        offer_urls_with_ids = get_offer_urls_from_listing(html)
         if not offer_urls_with_ids:
             print(f"[{brand}] Brak ofert na stronie {page}, kończę.")
+            completed = True
             break
 
         print(f"[{brand}] Znaleziono {len(offer_urls_with_ids)} ofert na stronie {page}")
 
-        # szczegóły ofert
+        # Tryb przyrostowy: nie pobieraj szczegółów ofert, które już są w bazie.
+        # Listing jest od najnowszych, więc długa seria znanych ofert oznacza, że dalej są już tylko stare.
+        pending = []
         for offer_url, offer_id in offer_urls_with_ids:
-            # Sprawdź limit PRZED przetwarzaniem - oszczędzamy czas
-            if max_offers is not None and len(all_rows) >= max_offers:
-                elapsed = time.time() - start_time
-                print(f"[{brand}] ✓ Osiągnięto limit {max_offers} ofert w {elapsed:.1f}s, kończę.")
+            if is_known_offer(offer_id):
+                known_count += 1
+                known_run += 1
+                if known_run >= STOP_AFTER_KNOWN_OFFERS:
+                    print(f"[{brand}] ⏹ {known_run} kolejnych znanych ofert - kończę markę po tej stronie")
+                    stop_brand = True
+                    break
+            else:
+                known_run = 0
+                pending.append((offer_url, offer_id))
+
+        # szczegóły ofert - równolegle, w porcjach nie większych niż brakująca liczba ofert
+        page_rows: List[Dict] = []
+        last_offer_id = None
+        while pending:
+            if max_offers is not None and rows_written + len(page_rows) >= max_offers:
                 break
 
-            processed_count += 1
-            offer_start = time.time()
-            print(f"[{brand}] 🔍 Przetwarzam ofertę {processed_count}: {offer_id or 'bez ID'}")
-            details = parse_offer_details(offer_url, offer_id)
-            offer_time = time.time() - offer_start
-            print(f"[{brand}] ⏱️  Oferta {offer_id or 'bez ID'} przetworzona w {offer_time:.2f}s")
-            
-            if details is not None:
+            n_batch = len(pending) if max_offers is None else min(len(pending), max_offers - rows_written - len(page_rows))
+            batch, pending = pending[:n_batch], pending[n_batch:]
+            processed_count += len(batch)
+
+            batch_start = time.time()
+            results = await asyncio.gather(
+                *(fetch_offer_details(fetcher, offer_url, offer_id) for offer_url, offer_id in batch)
+            )
+            print(f"[{brand}] ⏱️  {len(batch)} ofert pobranych w {time.time() - batch_start:.2f}s")
+
+            for (offer_url, offer_id), details in zip(batch, results):
+                last_offer_id = offer_id or last_offer_id
+                if details is None:
+                    print(f"[{brand}] ⚠ Nie udało się pobrać szczegółów oferty: {offer_id or offer_url}")
+                    continue
                 # FILTROWANIE PO DATACH
                 if filter_by_date(details, date_from, date_to):
-                    all_rows.append(details)
-                    elapsed = time.time() - start_time
-                    print(f"[{brand}] ✓ Pobrano {len(all_rows)}/{max_offers if max_offers else '∞'} ofert (czas: {elapsed:.1f}s)")
+                    page_rows.append(details)
+                    if str(details.get("ID", "")).strip():
+                        ids_count += 1
                 else:
                     filtered_count += 1
-                    print(f"[{brand}] ⚠ Pominięto ofertę poza zakresem dat (aktualnie: {len(all_rows)}/{max_offers if max_offers else '∞'}, przetworzono: {processed_count})")
                 # Logowanie dla ofert bez ID
                 if not offer_id:
                     print(f"[{brand}] ⚠ UWAGA: Pobrano ofertę bez ID: {offer_url}")
-            else:
-                print(f"[{brand}] ⚠ Nie udało się pobrać szczegółów oferty: {offer_id or offer_url}")
-
-            # opóźnienie między ofertami (użyj zoptymalizowanych wartości dla małych limitów)
-            delay = random.uniform(delay_offers_min, delay_offers_max)
-            if max_offers and max_offers <= 20:  # Dla bardzo małych limitów loguj opóźnienia
-                print(f"[{brand}] ⏸️  Opóźnienie {delay:.2f}s...")
-            time.sleep(delay)
 
-        # Jeśli osiągnięto limit, przerwij pętlę stron
-        if max_offers is not None and len(all_rows) >= max_offers:
+        # Dopisz stronę do CSV i zapisz checkpoint (najpierw dane, potem checkpoint -
+        # po awarii między nimi strona zostanie pobrana ponownie, a duplikaty ID odrzuci import)
+        append_rows_csv(out_path, page_rows)
+        rows_written += len(page_rows)
+        checkpoint.update({
+            "last_page": page,
+            "last_offer_id": last_offer_id,
+            "rows_written": rows_written,
+            "rows_written_run": rows_written - run_start_rows,
+            "processed": processed_count,
+            "known_run": known_run,
+        })
+        save_checkpoint(brand, checkpoint)
+
+        elapsed = time.time() - start_time
+        print(f"[{brand}] ✓ Pobrano {rows_written}/{max_offers if max_offers else '∞'} ofert (przetworzono: {processed_count}, czas: {elapsed:.1f}s)")
+
+        # Jeśli osiągnięto limit lub serię znanych ofert, przerwij pętlę stron
+        if stop_brand or (max_offers is not None and rows_written >= max_offers):
+            if not stop_brand:
+                print(f"[{brand}] ✓ Osiągnięto limit {max_offers} ofert w {elapsed:.1f}s, kończę.")
+            completed = True
             break
 
-        # kolejna strona
+        # kolejna strona (tempo kontroluje limiter fetchera - bez stałego opóźnienia)
         page += 1
 
-        # opóźnienie między listingami
-        time.sleep(
-            random.uniform(DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX)
-        )
+    checkpoint["completed"] = completed
+    checkpoint["rows_written_run"] = rows_written - run_start_rows
+    save_checkpoint(brand, checkpoint)
 
     elapsed_total = time.time() - start_time
     
@@ -624,33 +780,55 @@ def scrape_brand(brand: str, date_from: Optional[str] = None, date_to: Optional[
         print(f"[{brand}] ⚠ Pominięto łącznie {filtered_count} ofert poza zakresem dat")
     
     print(f"[{brand}] 📊 Statystyki:")
-    print(f"[{brand}]   - Pobrano: {len(all_rows)} ofert")
+    print(f"[{brand}]   - Pobrano: {rows_written} ofert")
     print(f"[{brand}]   - Przetworzono: {processed_count} ofert")
     print(f"[{brand}]   - Odrzucono: {filtered_count} ofert")
+    if INCREMENTAL:
+        print(f"[{brand}]   - Pominięto znanych: {known_count} ofert")
     print(f"[{brand}]   - Czas: {elapsed_total:.1f}s ({elapsed_total/60:.1f} min)")
-    if len(all_rows) > 0:
-        print(f"[{brand}]   - Średnio: {elapsed_total/len(all_rows):.2f}s na ofertę")
-    
-    # zapis CSV dla marki
-    if all_rows:
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        df = pd.DataFrame(all_rows)
-        out_path = os.path.join(OUTPUT_DIR, f"{brand}.csv")
-        df.to_csv(out_path, index=False)
-        print(f"[{brand}] Saved {len(all_rows)} rows to {out_path}")
-        # Sprawdź ile ofert ma ID
-        ids_count = df["ID"].astype(str).str.strip().ne("").sum()
-        print(f"[{brand}] Ofert z ID: {ids_count}/{len(all_rows)}")
+    if rows_written > 0:
+        print(f"[{brand}]   - Średnio: {elapsed_total/rows_written:.2f}s na ofertę")
+        print(f"[{brand}] Zapisano {rows_written} wierszy do {out_path} (ofert z ID w tym uruchomieniu: {ids_count})")
     else:
         print(f"[{brand}] Brak danych do zapisania.")
 
 
+async def scrape_all_brands(
+    brands: List[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    max_workers: int,
+) -> None:
+    """
+    Scrapuje marki w jednej pętli zdarzeń: max_workers marek naraz,
+    wszystkie dzielą jeden klient HTTP (wspólne limity równoległości i tempa).
+    """
+    brand_semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async with create_fetcher() as fetcher:
+        async def run_brand(brand: str) -> None:
+            async with brand_semaphore:
+                try:
+                    await scrape_brand_async(brand, fetcher, date_from, date_to)
+                    print(f"[MAIN] ✓ Marka {brand} zakończona", flush=True)
+                except Exception as e:
+                    # Nie kończ całego procesu - kontynuuj z innymi markami
+                    print(f"[MAIN] [ERROR] Brand {brand} zakończył się wyjątkiem: {e}", flush=True)
+                    import traceback
+                    traceback.print_exc(file=sys.stderr)
+
+        await asyncio.gather(*(run_brand(b) for b in brands))
+        print(f"[MAIN] Statystyki HTTP: {fetcher.stats}", flush=True)
+
+
 # ================== GŁÓWNA FUNKCJA ==================
 
 
 def main():
     # Deklaracja zmiennych globalnych na początku funkcji
     global MAX_OFFERS_PER_BRAND
+    global MAX_CONCURRENCY, REQUESTS_PER_SECOND, RATE_LIMIT_BURST, REQUEST_TIMEOUT
+    global INCREMENTAL, STOP_AFTER_KNOWN_OFFERS, KNOWN_IDS, RESUME, PARSER_BACKEND
     
     # PROSTE ROZWIĄZANIE: WCZYTAJ KONFIGURACJĘ Z PLIKU NA SAMYM POCZĄTKU
     print("=" * 60, flush=True)
@@ -806,6 +984,18 @@ def main():
             date_to = config.get("date_to")
             max_workers = config.get("max_workers", MAX_WORKERS)
             
+            MAX_CONCURRENCY = config.get("max_concurrency", MAX_CONCURRENCY)
+            REQUESTS_PER_SECOND = config.get("requests_per_second", REQUESTS_PER_SECOND)
+            RATE_LIMIT_BURST = config.get("rate_limit_burst", RATE_LIMIT_BURST)
+            REQUEST_TIMEOUT = config.get("request_timeout", REQUEST_TIMEOUT)
+            INCREMENTAL = bool(config.get("incremental", INCREMENTAL))
+            STOP_AFTER_KNOWN_OFFERS = config.get("stop_after_known_offers", STOP_AFTER_KNOWN_OFFERS)
+            RESUME = bool(config.get("resume", RESUME))
+            PARSER_BACKEND = config.get("parser_backend", PARSER_BACKEND)
+            if PARSER_BACKEND == "lxml" and not LXML_AVAILABLE:
+                print("[MAIN] ⚠ lxml nie jest zainstalowane - używam parsera BeautifulSoup", flush=True)
+                PARSER_BACKEND = "bs4"
+            
             print(f"[MAIN] ✓✓✓ FINALNE WARTOŚCI:", flush=True)
             print(f"[MAIN] ✓✓✓ brands = {brands}", flush=True)
             print(f"[MAIN] ✓✓✓ max_offers = {max_offers}", flush=True)
@@ -856,26 +1046,20 @@ def main():
             print(f"[MAIN] Date filter: {date_from or 'początek'} - {date_to or 'koniec'}", flush=True)
 
         print(f"[MAIN] Uruchamiam scrapowanie dla {len(brands)} marek...", flush=True)
-        print(f"[MAIN] Max workers: {max_workers}", flush=True)
+        print(f"[MAIN] Max workers (marki równolegle): {max_workers}", flush=True)
+        print(f"[MAIN] Parser HTML: {PARSER_BACKEND}", flush=True)
+        print(f"[MAIN] Max concurrency: {MAX_CONCURRENCY}, {REQUESTS_PER_SECOND} req/s na host (burst {RATE_LIMIT_BURST})", flush=True)
+        
+        if RESUME:
+            print("[MAIN] Tryb wznowienia: kontynuuję od checkpointów w scraped_data/", flush=True)
+        if INCREMENTAL:
+            KNOWN_IDS = load_known_ids(str(Path(__file__).resolve().parent / KNOWN_IDS_FILE))
         
         # Tymczasowo zaktualizuj zmienne globalne dla funkcji scrape_brand
         old_max_offers = MAX_OFFERS_PER_BRAND
         MAX_OFFERS_PER_BRAND = max_offers
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(scrape_brand, b, date_from, date_to): b for b in brands}
-            for future in as_completed(futures):
-                brand = futures[future]
-                try:
-                    future.result()
-                    print(f"[MAIN] ✓ Marka {brand} zakończona", flush=True)
-                except Exception as e:
-                    print(f"[MAIN] [ERROR] Brand {brand} zakończył się wyjątkiem: {e}", flush=True)
-                    import traceback
-                    traceback.print_exc(file=sys.stderr)
-                    print(f"[MAIN] [ERROR] Traceback dla {brand}:", flush=True)
-                    traceback.print_exc()
-                    # Nie kończ całego procesu - kontynuuj z innymi markami
+        asyncio.run(scrape_all_brands(brands, date_from, date_to, max_workers))
         
         # Przywróć oryginalną wartość
         MAX_OFFERS_PER_BRAND = old_max_offers
@@ -0,0 +1,7 @@
+"""
+Konfiguracja pytest dla scrapera - moduły scrapera leżą w katalogu nadrzędnym.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,79 @@
+"""
+Testy silnika pobierania (fetch_engine) na httpx.MockTransport - bez sieci.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from fetch_engine import AsyncFetcher, TokenBucket
+
+
+def _fetch(handler, url="https://www.otomoto.pl/oferta-1.html", **kwargs):
+    async def run():
+        async with AsyncFetcher(transport=httpx.MockTransport(handler), retry_backoff=0, **kwargs) as fetcher:
+            return await fetcher.get_text(url), fetcher.stats
+    return asyncio.run(run())
+
+
+def test_get_text_retries_after_non_200():
+    """Odpowiedź inna niż 200 jest ponawiana, a pierwsza udana zwracana."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, text="<html>ok</html>")
+
+    text, stats = _fetch(handler, retries=3)
+    assert text == "<html>ok</html>"
+    assert len(calls) == 3
+    assert stats["requests"] == 3
+
+
+def test_get_text_returns_none_after_failed_retries():
+    """Po wyczerpaniu prób (HTTP i błędy połączenia) wynikiem jest None."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(404)
+
+    text, stats = _fetch(handler, retries=3)
+    assert text is None
+    assert len(calls) == 3
+    assert stats["errors"] == 1
+
+
+def test_get_text_requires_context_manager():
+    async def run():
+        await AsyncFetcher().get_text("https://www.otomoto.pl/")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+def test_token_bucket_limits_rate():
+    """Po wyczerpaniu burst kolejne tokeny wydawane są w tempie `rate` na sekundę."""
+    rate, burst, n = 20.0, 2, 8
+
+    async def run():
+        bucket = TokenBucket(rate, burst)
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    # burst idzie od razu, pozostałe n - burst czekają po 1/rate
+    assert elapsed >= (n - burst) / rate * 0.9
+    assert elapsed < (n - burst) / rate + 0.5
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0, 1)
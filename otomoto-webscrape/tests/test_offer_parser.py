@@ -0,0 +1,51 @@
+"""
+Testy parsera lxml (offer_parser) - zgodność z parserem BeautifulSoup.
+"""
+import contextlib
+import io
+from pathlib import Path
+
+import pytest
+
+import scrape_otomoto
+from offer_parser import LXML_AVAILABLE, get_offer_urls_from_listing_lxml, parse_offer_html_lxml
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures"
+
+pytestmark = pytest.mark.skipif(not LXML_AVAILABLE, reason="lxml nie jest zainstalowane")
+
+
+@pytest.mark.parametrize("html", ["", "  \n\t"])
+def test_empty_offer_page_matches_bs4(html):
+    """Pusta odpowiedź HTTP 200 nie rzuca wyjątku (lxml: "Document is empty")."""
+    url = "https://www.otomoto.pl/osobowe/oferta/auto-6123456789.html"
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = scrape_otomoto.parse_offer_html_bs4(html, url)
+    actual = parse_offer_html_lxml(html, url, "", scrape_otomoto.OFFER_COLUMNS, scrape_otomoto.parse_polish_date)
+    assert actual == expected
+    assert actual["ID"] == "6123456789"
+    assert get_offer_urls_from_listing_lxml(html) == []
+
+
+def test_xml_declaration_matches_bs4():
+    """Dokument z deklaracją <?xml encoding=...?> (ValueError w lxml dla str) parsuje się jak w bs4."""
+    html = FIXTURES_DIR.joinpath("offer_xml_declaration.html").read_text(encoding="utf-8")
+    url = "https://www.otomoto.pl/osobowe/oferta/offer_xml_declaration.html"
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = scrape_otomoto.parse_offer_html_bs4(html, url)
+    actual = parse_offer_html_lxml(html, url, "", scrape_otomoto.OFFER_COLUMNS, scrape_otomoto.parse_polish_date)
+    assert actual == expected
+    assert actual["Marka pojazdu"]
+
+
+def test_parse_offer_html_falls_back_to_bs4(monkeypatch):
+    """Nieoczekiwany błąd parsera lxml -> wynik z parsera BeautifulSoup zamiast wyjątku."""
+    def broken(*args, **kwargs):
+        raise RuntimeError("lxml error")
+
+    monkeypatch.setattr(scrape_otomoto, "PARSER_BACKEND", "lxml")
+    monkeypatch.setattr(scrape_otomoto, "parse_offer_html_lxml", broken)
+    html = FIXTURES_DIR.joinpath("offer_toyota.html").read_text(encoding="utf-8")
+    url = "https://www.otomoto.pl/osobowe/oferta/toyota-6100000001.html"
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert scrape_otomoto.parse_offer_html(html, url) == scrape_otomoto.parse_offer_html_bs4(html, url)
@@ -0,0 +1,178 @@
+"""
+Testy logiki scrapera (bez sieci - strony podawane przez httpx.MockTransport).
+"""
+import asyncio
+
+import httpx
+import pandas as pd
+import pytest
+
+import scrape_otomoto
+from fetch_engine import AsyncFetcher
+
+
+def _run_with_fetcher(handler, coro_factory):
+    async def run():
+        async with AsyncFetcher(transport=httpx.MockTransport(handler), retry_backoff=0,
+                                requests_per_second=1000, burst=1000) as fetcher:
+            return await coro_factory(fetcher)
+    return asyncio.run(run())
+
+
+def test_fetch_offer_details_returns_none_on_parse_error(monkeypatch):
+    """Wyjątek parsera jednej oferty nie przerywa strony - wynikiem jest None."""
+    def broken_parser(html, url, offer_id=""):
+        raise ValueError("zepsuty HTML")
+
+    monkeypatch.setattr(scrape_otomoto, "parse_offer_html", broken_parser)
+    result = _run_with_fetcher(
+        lambda request: httpx.Response(200, text="<html></html>"),
+        lambda fetcher: scrape_otomoto.fetch_offer_details(fetcher, "https://www.otomoto.pl/oferta-1.html", "1"),
+    )
+    assert result is None
+
+
+# ---- scrape_brand_async: checkpointy i wznawianie ----
+
+BRAND = "kia"
+N_PAGES = 3  # strona N_PAGES + 1 jest pusta (koniec listingu)
+OFFERS_PER_PAGE = 2
+
+
+def _offer_id(page, i):
+    return f"{page}{i}"
+
+
+class FakeSite:
+    """Serwer otomoto w pamięci - zapamiętuje, które strony listingu i oferty pobrano."""
+
+    def __init__(self):
+        self.listing_pages = []
+        self.offers = []
+
+    def handler(self, request):
+        url = str(request.url)
+        if "page=" in url:
+            page = int(request.url.params["page"])
+            self.listing_pages.append(page)
+            return httpx.Response(200, text=f"listing:{page}")
+        self.offers.append(url.rsplit("-", 1)[1].removesuffix(".html"))
+        return httpx.Response(200, text="offer")
+
+
+def _fake_listing(html):
+    page = int(html.split(":")[1])
+    if page > N_PAGES:
+        return []
+    return [
+        (f"https://www.otomoto.pl/osobowe/oferta/auto-{_offer_id(page, i)}.html", _offer_id(page, i))
+        for i in range(OFFERS_PER_PAGE)
+    ]
+
+
+def _fake_offer(html, url, offer_id=""):
+    row = {col: "" for col in scrape_otomoto.OFFER_COLUMNS}
+    row["ID"] = offer_id
+    return row
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    """scrape_otomoto z katalogiem wyników w tmp_path i stronami z FakeSite."""
+    monkeypatch.setattr(scrape_otomoto, "OUTPUT_DIR", str(tmp_path / "scraped_data"))
+    monkeypatch.setattr(scrape_otomoto, "MAX_OFFERS_PER_BRAND", None)
+    monkeypatch.setattr(scrape_otomoto, "RESUME", False)
+    monkeypatch.setattr(scrape_otomoto, "INCREMENTAL", False)
+    monkeypatch.setattr(scrape_otomoto, "get_offer_urls_from_listing", _fake_listing)
+    monkeypatch.setattr(scrape_otomoto, "parse_offer_html", _fake_offer)
+    return scrape_otomoto
+
+
+def _scrape(site):
+    return _run_with_fetcher(site.handler, lambda fetcher: scrape_otomoto.scrape_brand_async(BRAND, fetcher))
+
+
+def _written_ids():
+    return pd.read_csv(scrape_otomoto.brand_csv_path(BRAND), dtype=str)["ID"].tolist()
+
+
+def test_scrape_brand_writes_pages_and_checkpoint(scraper):
+    site = FakeSite()
+    _scrape(site)
+
+    assert site.listing_pages == [1, 2, 3, 4]
+    assert _written_ids() == [_offer_id(p, i) for p in range(1, 4) for i in range(OFFERS_PER_PAGE)]
+    checkpoint = scraper.load_checkpoint(BRAND)
+    assert checkpoint["completed"] is True
+    assert checkpoint["last_page"] == N_PAGES
+    assert checkpoint["rows_written"] == N_PAGES * OFFERS_PER_PAGE
+    assert checkpoint["last_offer_id"] == _offer_id(N_PAGES, OFFERS_PER_PAGE - 1)
+
+
+def _interrupted_after_page(scraper, last_page):
+    """Stan po przerwaniu: CSV z ofertami stron 1..last_page i nieukończony checkpoint."""
+    rows = [_fake_offer("", "", _offer_id(p, i)) for p in range(1, last_page + 1) for i in range(OFFERS_PER_PAGE)]
+    scraper.append_rows_csv(scraper.brand_csv_path(BRAND), rows)
+    scraper.save_checkpoint(BRAND, {
+        "brand": BRAND, "last_page": last_page, "last_offer_id": rows[-1]["ID"],
+        "rows_written": len(rows), "processed": len(rows), "known_run": 0, "completed": False,
+    })
+
+
+def test_resume_continues_from_next_page(scraper, monkeypatch):
+    _interrupted_after_page(scraper, 2)
+    monkeypatch.setattr(scraper, "RESUME", True)
+
+    site = FakeSite()
+    _scrape(site)
+
+    assert site.listing_pages == [3, 4]
+    assert site.offers == [_offer_id(3, i) for i in range(OFFERS_PER_PAGE)]
+    assert _written_ids() == [_offer_id(p, i) for p in range(1, 4) for i in range(OFFERS_PER_PAGE)]
+    checkpoint = scraper.load_checkpoint(BRAND)
+    assert checkpoint["completed"] is True
+    # Oferty dopisane w tym uruchomieniu - bez stron z przerwanego
+    assert checkpoint["rows_written_run"] == OFFERS_PER_PAGE
+    assert checkpoint["rows_written"] == N_PAGES * OFFERS_PER_PAGE
+
+
+def test_resume_skips_completed_brand(scraper, monkeypatch):
+    _scrape(FakeSite())
+    monkeypatch.setattr(scraper, "RESUME", True)
+
+    site = FakeSite()
+    _scrape(site)
+
+    assert site.listing_pages == []
+    assert len(_written_ids()) == N_PAGES * OFFERS_PER_PAGE
+
+
+def test_without_resume_brand_starts_over(scraper):
+    _interrupted_after_page(scraper, 2)
+
+    site = FakeSite()
+    _scrape(site)
+
+    assert site.listing_pages == [1, 2, 3, 4]
+    # Stary CSV zastąpiony - bez zdublowanych ofert stron 1-2
+    assert _written_ids() == [_offer_id(p, i) for p in range(1, 4) for i in range(OFFERS_PER_PAGE)]
+
+
+# ---- tryb przyrostowy ----
+
+def test_incremental_skips_known_offers_and_stops_after_run(scraper, monkeypatch):
+    """Znane oferty nie są pobierane; seria STOP_AFTER_KNOWN_OFFERS znanych kończy markę."""
+    known = {int(_offer_id(p, i)) for p in (2, 3) for i in range(OFFERS_PER_PAGE)}
+    known.add(int(_offer_id(1, 0)))
+    monkeypatch.setattr(scraper, "INCREMENTAL", True)
+    monkeypatch.setattr(scraper, "KNOWN_IDS", known)
+    monkeypatch.setattr(scraper, "STOP_AFTER_KNOWN_OFFERS", OFFERS_PER_PAGE)
+
+    site = FakeSite()
+    _scrape(site)
+
+    # Strona 2 ma same znane oferty -> koniec marki bez pobierania strony 3
+    assert site.listing_pages == [1, 2]
+    assert site.offers == [_offer_id(1, 1)]
+    assert _written_ids() == [_offer_id(1, 1)]
+    assert scraper.load_checkpoint(BRAND)["completed"] is True
@@ -1,32 +1,118 @@
-import pandas as pd
+"""
+Tłumaczenie danych otomoto PL -> EN.
+
+Słowniki (.pkl z translation_files/) wczytywane są raz i trzymane w pamięci;
+ponowne wczytanie następuje tylko, gdy zmieni się mtime pliku. Kolumna
+Features tłumaczona jest wektorowo: explode -> map -> złożenie z powrotem
+w listy (benchmarks/bench_translate.py).
+"""
+
+import os
 import pickle
 import re
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+TRANSLATION_DIR = Path(__file__).resolve().parent / "translation_files"
+
+# nazwa słownika -> kolumna (po zmianie nazw), której wartości tłumaczy
+VALUE_TRANSLATIONS = {
+    "colour": "Colour",
+    "condition": "Condition",
+    "drive": "Drive",
+    "fuel_type": "Fuel_type",
+    "transmission": "Transmission",
+    "type": "Type",
+    "origin_country": "Origin_country",
+}
+
+# oczekujemy stringa w stylu: "['ABS', 'Airbag']"
+_FEATURE_RE = re.compile(r"'(.*?)'")
+
+# ścieżka -> (mtime, słownik)
+_PKL_CACHE: Dict[str, Tuple[float, dict]] = {}
 
 
 def load_pkl(name):
-    with open(name + ".pkl", "rb") as f:
-        return pickle.load(f)
+    """Wczytuje name + '.pkl' (z pamięci, jeśli plik nie zmienił się od ostatniego odczytu)."""
+    path = os.path.abspath(str(name) + ".pkl")
+    mtime = os.stat(path).st_mtime
+    cached = _PKL_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    _PKL_CACHE[path] = (mtime, data)
+    return data
+
+
+def load_translations(directory=TRANSLATION_DIR) -> Dict[str, dict]:
+    """Wszystkie słowniki tłumaczeń: {'colour': {...}, ..., 'car_features': {...}}."""
+    names = list(VALUE_TRANSLATIONS) + ["car_features"]
+    return {name: load_pkl(Path(directory) / f"{name}_translation") for name in names}
 
 
 def translate_car_features(features_string):
-    car_features_translation = load_pkl(
-        "./translation_files/car_features_translation"
-    )
+    """Tłumaczy pojedynczą wartość Features (np. "['ABS', 'Airbag']") na listę."""
     if pd.isna(features_string):
         return []
+    car_features_translation = load_pkl(TRANSLATION_DIR / "car_features_translation")
+    # na wszelki wypadek zabezpieczenie, gdyby czegoś nie było w słowniku
+    return [
+        car_features_translation.get(feature, feature)
+        for feature in _FEATURE_RE.findall(str(features_string))
+        if feature
+    ]
+
+
+def _split_features(features_string: str) -> list:
+    """
+    "['ABS', 'Airbag']" -> ['ABS', 'Airbag'] (bez pustych).
 
-    # oczekujemy stringa w stylu: "['ABS', 'Airbag']"
-    features = re.findall(r"'(.*?)'", str(features_string))
+    Typowy zapis str(list) dzielimy zwykłym split; regex zostaje dla wartości
+    z cudzysłowami lub znakami ucieczki (cechy z apostrofem).
+    """
+    if (
+        features_string.startswith("['")
+        and features_string.endswith("']")
+        and '"' not in features_string
+        and "\\" not in features_string
+    ):
+        features = features_string[2:-2].split("', '")
+    else:
+        features = _FEATURE_RE.findall(features_string)
+    return [feature for feature in features if feature]
+
+
+def translate_features_column(features: pd.Series, translation: dict) -> pd.Series:
+    """
+    Wektorowy odpowiednik features.apply(translate_car_features).
+
+    Wszystkie cechy rozwijamy do jednej kolumny (explode), tłumaczymy je
+    przez unikalne wartości (pd.factorize + słownik) i składamy z powrotem
+    w listy według pozycji wiersza.
+    """
+    values = features.to_numpy(dtype=object)
+    found = [_split_features(v) if isinstance(v, str) else [] for v in values]
 
-    translated_features = []
-    for feature in features:
-        if not feature:
-            continue
-        # na wszelki wypadek zabezpieczenie, gdyby czegoś nie było w słowniku
-        translation = car_features_translation.get(feature, feature)
-        translated_features.append(translation)
+    # explode: jedna płaska kolumna wszystkich cech (długości list zapamiętane)
+    lengths = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+    flat = pd.Series(list(chain.from_iterable(found)), dtype=object)
 
-    return translated_features
+    # map: tłumaczymy tylko unikalne cechy, resztę rozkładamy po kodach
+    codes, uniques = pd.factorize(flat)
+    translated_uniques = np.array([translation.get(f, f) for f in uniques], dtype=object)
+    translated = translated_uniques[codes].tolist()
+
+    # regroup: listy odtwarzamy z przesunięć wynikających z długości
+    ends = np.cumsum(lengths).tolist()
+    starts = [0] + ends[:-1]
+    lists = [translated[a:b] for a, b in zip(starts, ends)]
+    return pd.Series(lists, index=features.index, dtype=object)
 
 
 def translate_pol_eng(dataframe: pd.DataFrame) -> pd.DataFrame:
@@ -67,55 +153,28 @@ def translate_pol_eng(dataframe: pd.DataFrame) -> pd.DataFrame:
 
     dataframe = dataframe.rename(columns=column_mapping)
 
-    # --- 2. ZAŁADOWANIE SŁOWNIKÓW DO TŁUMACZENIA WARTOŚCI ---
+    # --- 2. SŁOWNIKI DO TŁUMACZENIA WARTOŚCI (wczytane raz, z cache) ---
 
-    colour_translation = load_pkl("./translation_files/colour_translation")
-    condition_translation = load_pkl("./translation_files/condition_translation")
-    drive_translation = load_pkl("./translation_files/drive_translation")
-    fuel_type_translation = load_pkl("./translation_files/fuel_type_translation")
-    transmission_translation = load_pkl("./translation_files/transmission_translation")
-    type_translation = load_pkl("./translation_files/type_translation")
-    origin_country_translation = load_pkl(
-        "./translation_files/origin_country_translation"
-    )
+    translations = load_translations()
 
     # --- 3. TŁUMACZENIE WARTOŚCI W KOLUMNACH (jeśli istnieją) ---
 
-    if "Colour" in dataframe.columns:
-        dataframe["Colour"].replace(colour_translation, inplace=True)
-
-    if "Condition" in dataframe.columns:
-        dataframe["Condition"].replace(condition_translation, inplace=True)
-
-    if "Drive" in dataframe.columns:
-        dataframe["Drive"].replace(drive_translation, inplace=True)
+    for name, column in VALUE_TRANSLATIONS.items():
+        if column in dataframe.columns:
+            dataframe[column] = dataframe[column].replace(translations[name])
 
-    if "Fuel_type" in dataframe.columns:
-        dataframe["Fuel_type"].replace(fuel_type_translation, inplace=True)
-
-    if "Vehicle_model" in dataframe.columns:
-        dataframe["Vehicle_model"].replace({"Inny": "Other"}, inplace=True)
-
-    if "Vehicle_version" in dataframe.columns:
-        dataframe["Vehicle_version"].replace({"Inny": "Other"}, inplace=True)
+    for column in ("Vehicle_model", "Vehicle_version"):
+        if column in dataframe.columns:
+            dataframe[column] = dataframe[column].replace({"Inny": "Other"})
 
     if "First_owner" in dataframe.columns:
-        dataframe["First_owner"].replace({"Tak": "Yes", "Nie": "No"}, inplace=True)
-
-    if "Transmission" in dataframe.columns:
-        dataframe["Transmission"].replace(transmission_translation, inplace=True)
-
-    if "Type" in dataframe.columns:
-        dataframe["Type"].replace(type_translation, inplace=True)
-
-    if "Origin_country" in dataframe.columns:
-        dataframe["Origin_country"].replace(
-            origin_country_translation, inplace=True
-        )
+        dataframe["First_owner"] = dataframe["First_owner"].replace({"Tak": "Yes", "Nie": "No"})
 
     # --- 4. Features -> lista przetłumaczonych cech ---
 
     if "Features" in dataframe.columns:
-        dataframe["Features"] = dataframe["Features"].apply(translate_car_features)
+        dataframe["Features"] = translate_features_column(
+            dataframe["Features"], translations["car_features"]
+        )
 
     return dataframe